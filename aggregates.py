@@ -0,0 +1,237 @@
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Denormalized per-member attendance summary and lifetime stats stored on the users doc
+SUMMARY_FIELD = "attendance_summary"
+
+# Per-month leaderboard docs: leaderboards/{YYYY-MM} -> counts.{uid}.{present,late}
+LEADERBOARD_COLLECTION = "leaderboards"
+RANKED_STATUSES = ("present", "late")
+
+# Data versions (for ETags): each month's leaderboard doc carries a version
+# bumped by every attendance write in that month; MEMBERS_VERSION is bumped
+# by users doc writes that can change what rankings show.
+MEMBERS_VERSION = "members"
+VERSIONS_COLLECTION = "versions"
+
+# Writes per atomic batch (Firestore's limit, also used to chunk the other backends)
+BATCH_LIMIT = 500
+
+
+def empty_summary():
+    return {
+        "last_date": "",
+        "last_status": "",
+        "total": 0,
+        "late": 0,
+        "points": 0,
+        "current_streak": 0,   # consecutive attended weeks ending at last_date's week
+        "longest_streak": 0,
+        "streak_date": "",     # last date of the most recent longest streak
+    }
+
+
+def get_summary(user_data: dict) -> dict:
+    """Return the attendance summary of a users doc, filling missing keys."""
+    summary = empty_summary()
+    summary.update(user_data.get(SUMMARY_FIELD) or {})
+    return summary
+
+
+def _week_start(date_str: str):
+    d = datetime.strptime(date_str, "%Y-%m-%d").date()
+    return d - timedelta(days=d.weekday())
+
+
+def _append(summary: dict, date_str: str, status: str, point: int = 0):
+    """Add a record dated on or after last_date, advancing the weekly streak."""
+    last_date = summary["last_date"]
+    if last_date and _week_start(date_str) == _week_start(last_date):
+        pass  # same week, streak unchanged
+    elif last_date and (_week_start(date_str) - _week_start(last_date)).days == 7:
+        summary["current_streak"] += 1
+    else:
+        summary["current_streak"] = 1
+
+    if summary["current_streak"] >= summary["longest_streak"]:
+        summary["longest_streak"] = summary["current_streak"]
+        summary["streak_date"] = date_str
+
+    summary["total"] += 1
+    if status == "late":
+        summary["late"] += 1
+    summary["points"] += point
+    summary["last_date"] = date_str
+    summary["last_status"] = status
+
+
+def build_summary(records) -> dict:
+    """Compute a summary from an iterable of attendance dicts (date, status, point)."""
+    summary = empty_summary()
+    for data in sorted(records, key=lambda r: r.get("date", "")):
+        _append(summary, data.get("date", ""), data.get("status"), data.get("point", 0))
+    return summary
+
+
+def apply_change(summary: dict, date_str: str, old_status, new_status) -> bool:
+    """
+    Apply one attendance change to a summary in place.
+    old_status / new_status are None when the record does not exist.
+    Returns False when the change cannot be applied incrementally (a delete or
+    an insert before last_date) and the summary must be rebuilt from history.
+    """
+    if old_status is None and new_status is not None:
+        if date_str < summary["last_date"]:
+            return False
+        _append(summary, date_str, new_status)
+        return True
+
+    if old_status is not None and new_status is not None:
+        if old_status == "late":
+            summary["late"] -= 1
+        if new_status == "late":
+            summary["late"] += 1
+        if date_str == summary["last_date"]:
+            summary["last_status"] = new_status
+        return True
+
+    # Deletes may remove the latest record or split a streak
+    return old_status is None
+
+
+def attendance_id(uid: str, date_str: str) -> str:
+    """Deterministic attendance record key: one record per member per day."""
+    return f"{uid}_{date_str}"
+
+
+async def apply_changes(repo, date_str: str, changes: dict):
+    """
+    Update summaries for admin edits on a single date.
+    changes: {uid: (old_status, new_status)} for records that actually changed.
+    """
+    if not changes:
+        return
+
+    users = await repo.get_users(list(changes))
+    summaries = {}
+
+    for uid, user_data in users.items():
+        old_status, new_status = changes[uid]
+        summary = get_summary(user_data)
+
+        if not apply_change(summary, date_str, old_status, new_status):
+            # Out-of-order edit: the record write is already committed, rebuild from history
+            summary = build_summary(await repo.list_member_attendance(uid))
+        summaries[uid] = summary
+
+    await repo.set_summaries(summaries)
+
+
+async def backfill_summaries(repo) -> int:
+    """Recompute every member's summary from raw attendance records. Returns users written."""
+    records_by_user = {}
+    for data in await repo.list_attendance():
+        records_by_user.setdefault(data.get("user_id"), []).append(data)
+
+    summaries = {
+        uid: build_summary(records_by_user.get(uid, []))
+        for uid, _ in await repo.list_users()
+    }
+    await repo.set_summaries(summaries)
+
+    logger.info(f"Backfilled attendance summary for {len(summaries)} users")
+    return len(summaries)
+
+
+def month_key(date_str: str) -> str:
+    return date_str[:7]
+
+
+def leaderboard_delta(old_status, new_status) -> dict:
+    """Counter steps for one attendance change, e.g. {"late": -1, "present": 1}."""
+    delta = {}
+    if old_status in RANKED_STATUSES:
+        delta[old_status] = delta.get(old_status, 0) - 1
+    if new_status in RANKED_STATUSES:
+        delta[new_status] = delta.get(new_status, 0) + 1
+    return {status: step for status, step in delta.items() if step}
+
+
+def apply_leaderboard_delta(counts: dict, uid: str, delta: dict):
+    """Add a leaderboard_delta() to a month's {uid: {present, late}} map in place."""
+    entry = counts.setdefault(uid, {})
+    for status, step in delta.items():
+        entry[status] = entry.get(status, 0) + step
+
+
+def count_records(records) -> dict:
+    """Count present/late records per member from raw attendance dicts."""
+    counts = {}
+    for data in records:
+        status = data.get("status")
+        if status not in RANKED_STATUSES:
+            continue
+        entry = counts.setdefault(data["user_id"], {"present": 0, "late": 0})
+        entry[status] += 1
+    return counts
+
+
+async def count_month(repo, key: str) -> dict:
+    """Count present/late records per member for a month from raw attendance."""
+    return count_records(await repo.list_attendance_between(f"{key}-01", f"{key}-31"))
+
+
+async def get_leaderboard(repo, key: str) -> dict:
+    """
+    Return {uid: {present, late}} for a month with a single read.
+    Falls back to counting raw records if the month has not been built yet.
+    """
+    counts = await repo.get_leaderboard(key)
+    if counts is not None:
+        return counts
+
+    logger.info(f"Leaderboard {key} not built yet, counting raw records")
+    return await count_month(repo, key)
+
+
+_built = set()  # months seen with a leaderboard doc (or started by this process's check-ins)
+
+
+async def ensure_built(repo, key: str):
+    """
+    Build a month from raw records before a check-in adds to it, if it has no
+    leaderboard doc but has records (e.g. deployed mid-month without
+    rebuild-leaderboard); otherwise the check-in's delta would start a doc
+    counting that member only. Checked once per month per process.
+    """
+    if key in _built:
+        return
+    if await repo.get_leaderboard(key) is None:
+        counts = await count_month(repo, key)
+        # A new month has nothing to count: the first check-in starts its doc
+        if counts:
+            logger.info(f"Leaderboard {key} not built yet, building it from {len(counts)} members' records")
+            await repo.set_leaderboard(key, counts)
+    _built.add(key)
+
+
+async def rebuild_leaderboard(repo, key: str, write: bool = True) -> dict:
+    """
+    Recompute a month from raw records and compare with the stored counters.
+    Returns drift as {uid: (stored, actual)} for members whose counts differ.
+    """
+    actual = await count_month(repo, key)
+    stored = await repo.get_leaderboard(key) or {}
+
+    drift = {}
+    for uid in set(actual) | set(stored):
+        stored_counts = {status: (stored.get(uid) or {}).get(status, 0) for status in RANKED_STATUSES}
+        actual_counts = actual.get(uid, {"present": 0, "late": 0})
+        if stored_counts != actual_counts:
+            drift[uid] = (stored_counts, actual_counts)
+
+    if write:
+        await repo.set_leaderboard(key, actual)
+    return drift
@@ -0,0 +1,80 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Warm per-day map of who has attended (uid -> status), so status checks
+# around session start are answered from memory instead of the datastore.
+# Reloaded after ATTENDED_CACHE_TTL seconds to pick up check-ins handled
+# by other workers.
+ATTENDED_CACHE_TTL = int(os.getenv("ATTENDED_CACHE_TTL", "30"))  # seconds
+
+_days = {}        # date -> (loaded_at, {uid: status})
+_pending = {}     # date -> {uid: status} accepted in memory but not yet stored
+_load_lock = asyncio.Lock()
+
+
+def is_loaded(date_str: str) -> bool:
+    return date_str in _days
+
+
+def _is_fresh(date_str: str) -> bool:
+    entry = _days.get(date_str)
+    return bool(entry) and time.monotonic() - entry[0] < ATTENDED_CACHE_TTL
+
+
+async def ensure_loaded(repo, date_str: str, force: bool = False):
+    """Load (or refresh) the day's attendees with one query."""
+    if not force and _is_fresh(date_str):
+        return
+    async with _load_lock:
+        if not force and _is_fresh(date_str):
+            return
+        statuses = {data["user_id"]: data.get("status") for data in await repo.list_attendance_by_date(date_str)}
+        statuses.update(_pending.get(date_str, {}))
+
+        # Only the most recent day is kept warm
+        _days.clear()
+        _days[date_str] = (time.monotonic(), statuses)
+        logger.info(f"Loaded {len(statuses)} attendees for {date_str}")
+
+
+def get_status(uid: str, date_str: str) -> Optional[str]:
+    """Status for a member on a loaded day, or None if absent / not loaded."""
+    entry = _days.get(date_str)
+    return entry[1].get(uid) if entry else None
+
+
+def get_day(date_str: str) -> dict:
+    """Copy of the loaded {uid: status} map for a day (empty if not loaded)."""
+    entry = _days.get(date_str)
+    return dict(entry[1]) if entry else {}
+
+
+def mark(uid: str, date_str: str, status: Optional[str], pending: bool = False):
+    """
+    Record a committed change (status None = removed) on a loaded day.
+    pending=True keeps it across reloads until confirm() is called.
+    """
+    if pending:
+        _pending.setdefault(date_str, {})[uid] = status
+
+    entry = _days.get(date_str)
+    if not entry:
+        return
+    if status is None:
+        entry[1].pop(uid, None)
+    else:
+        entry[1][uid] = status
+
+
+def confirm(uid: str, date_str: str):
+    """A pending record was stored; reloads will now see it there."""
+    day = _pending.get(date_str)
+    if day is not None:
+        day.pop(uid, None)
+        if not day:
+            _pending.pop(date_str, None)
@@ -0,0 +1,199 @@
+import io
+import csv
+import logging
+from datetime import datetime
+import aggregates
+import attendance_cache
+import member_index
+
+logger = logging.getLogger(__name__)
+
+# Bulk import of historical attendance from a CSV of (uid or nickname, date,
+# status). Everything is validated before anything is written, and rows are
+# diffed against the stored records, so re-running a file changes nothing.
+# Writes are not all-or-nothing: each date is committed on its own (in
+# chunks of BATCH_LIMIT), so a failure leaves the dates before it saved;
+# re-running the same file writes only what is still missing.
+MAX_IMPORT_ROWS = 20000
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d")
+STATUS_ALIASES = {
+    "present": "present", "출석": "present",
+    "late": "late", "지각": "late",
+    "absent": "absent", "결석": "absent",
+}
+UID_COLUMNS = ("uid", "user_id")
+OUTCOMES = ("created", "updated", "deleted", "unchanged", "failed")
+
+
+class InvalidImport(ValueError):
+    """The file cannot be imported; `errors` lists (row number, message)."""
+
+    def __init__(self, errors: list):
+        super().__init__(f"{len(errors)} invalid row(s)")
+        self.errors = errors
+
+
+def _parse_date(value: str):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse(content: str, users: list, today) -> dict:
+    """
+    Validate a CSV and resolve members. Returns {(uid, date): status} with
+    status None for absent. Raises InvalidImport listing every bad row.
+    """
+    reader = csv.DictReader(io.StringIO(content.lstrip("\ufeff")))
+    columns = {name.strip().lower() for name in reader.fieldnames or []}
+    if "date" not in columns or "status" not in columns or not (columns & {*UID_COLUMNS, "nickname"}):
+        raise InvalidImport([(1, "Header must have date, status and uid or nickname columns")])
+
+    by_uid = {doc_id: user_data for doc_id, user_data in users}
+    by_nickname = {}
+    for doc_id, user_data in users:
+        if user_data.get("nickname"):
+            by_nickname.setdefault(user_data["nickname"].strip(), []).append(doc_id)
+
+    entries = {}
+    errors = []
+    for line, raw in enumerate(reader, start=2):
+        if line - 1 > MAX_IMPORT_ROWS:
+            raise InvalidImport([(line, f"Too many rows (max {MAX_IMPORT_ROWS})")])
+        row = {(key or "").strip().lower(): (value or "").strip() for key, value in raw.items()}
+        if not any(row.values()):
+            continue
+
+        uid = next((row[col] for col in UID_COLUMNS if row.get(col)), "")
+        nickname = row.get("nickname", "")
+        if uid:
+            if uid not in by_uid:
+                errors.append((line, f"Unknown uid {uid}"))
+                continue
+        else:
+            matches = by_nickname.get(nickname, [])
+            if len(matches) != 1:
+                problem = "Unknown nickname" if not matches else f"Ambiguous nickname ({len(matches)} members)"
+                errors.append((line, f"{problem} {nickname!r}" if nickname else "Missing uid / nickname"))
+                continue
+            uid = matches[0]
+
+        date = _parse_date(row.get("date", ""))
+        if date is None:
+            errors.append((line, f"Invalid date {row.get('date')!r}"))
+            continue
+        if date > today:
+            errors.append((line, f"Date {date} is in the future"))
+            continue
+
+        status = STATUS_ALIASES.get(row.get("status", "").lower())
+        if status is None:
+            errors.append((line, f"Invalid status {row.get('status')!r}"))
+            continue
+        status = None if status == "absent" else status
+
+        key = (uid, date.isoformat())
+        if key in entries and entries[key] != status:
+            errors.append((line, f"Conflicting status for {uid} on {key[1]}"))
+            continue
+        entries[key] = status
+
+    if errors:
+        raise InvalidImport(errors)
+    return entries
+
+
+async def diff(repo, entries: dict) -> dict:
+    """{date: {uid: (old_status, new_status)}} for entries that differ from the stored records."""
+    if not entries:
+        return {}
+
+    # Page through the covered range once instead of one read per row
+    dates = [date for _, date in entries]
+    existing = {}
+    after = None
+    while True:
+        records = await repo.list_attendance_page(min(dates), max(dates), after=after, limit=aggregates.BATCH_LIMIT)
+        for record in records:
+            key = (record.get("user_id"), record.get("date"))
+            if key in entries:
+                existing[key] = record.get("status")
+        if len(records) < aggregates.BATCH_LIMIT:
+            break
+        after = (records[-1]["date"], records[-1]["user_id"])
+
+    changes = {}
+    for (uid, date), new_status in entries.items():
+        old_status = existing.get((uid, date))
+        if old_status != new_status:
+            changes.setdefault(date, {})[uid] = (old_status, new_status)
+    return changes
+
+
+async def run(repo, content: str, today, dry_run: bool = False) -> dict:
+    """
+    Import a CSV. Raises InvalidImport before writing anything if a row is bad.
+    Returns outcome counts, and per-date changes on a dry run.
+    """
+    entries = parse(content, await repo.list_users(), today)
+    changes = await diff(repo, entries)
+
+    counts = dict.fromkeys(OUTCOMES, 0)
+    counts["unchanged"] = len(entries) - sum(len(day) for day in changes.values())
+    result = {"dry_run": dry_run, "rows": len(entries), "dates": len(changes), "counts": counts}
+
+    def outcome(old_status, new_status):
+        if new_status is None:
+            return "deleted"
+        return "created" if old_status is None else "updated"
+
+    commit_note = "Each date is committed separately: if a write fails, earlier dates stay saved; re-run the file to finish."
+
+    if dry_run:
+        result["message"] = f"Dry run, nothing written. {commit_note}"
+        for day in changes.values():
+            for old_status, new_status in day.values():
+                counts[outcome(old_status, new_status)] += 1
+        result["changes"] = {
+            date: {uid: {"from": old, "to": new} for uid, (old, new) in sorted(day.items())}
+            for date, day in sorted(changes.items())
+        }
+        return result
+
+    # Months never built would otherwise end up with counters for the imported rows only
+    months = sorted({aggregates.month_key(date) for date in changes})
+    unbuilt = [key for key in months if await repo.get_leaderboard(key) is None]
+
+    touched = set()
+    failed_dates = []
+    for date, day in sorted(changes.items()):
+        committed = await repo.apply_attendance_changes(date, day)
+        if not all(committed.get(uid) for uid in day):
+            failed_dates.append(date)
+        for uid, (old_status, new_status) in day.items():
+            if not committed.get(uid):
+                counts["failed"] += 1
+                continue
+            counts[outcome(old_status, new_status)] += 1
+            touched.add(uid)
+            attendance_cache.mark(uid, date, new_status)
+
+    # Historical rows land before last_date, so summaries are rebuilt from history
+    summaries = {uid: aggregates.build_summary(await repo.list_member_attendance(uid)) for uid in sorted(touched)}
+    await repo.set_summaries(summaries)
+    for key in unbuilt:
+        await aggregates.rebuild_leaderboard(repo, key, write=True)
+    if touched:
+        member_index.invalidate()
+
+    if failed_dates:
+        result["failed_dates"] = failed_dates
+        result["message"] = f"Some records were not saved on {len(failed_dates)} date(s). {commit_note}"
+    else:
+        result["message"] = f"Imported {len(changes)} changed date(s)."
+
+    logger.info(f"Attendance import: {counts} over {len(changes)} date(s)")
+    return result
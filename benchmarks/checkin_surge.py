@@ -0,0 +1,277 @@
+"""
+Check-in surge load test: a whole session checking in at once.
+
+Drives the real app in-process (httpx.ASGITransport) against a local storage
+backend (memory or sqlite, see storage/), with N approved members holding
+signed user_uid cookies, the KST clock frozen inside the attendance window
+and every request coming from the gym IP. Each member runs the check-in flow
+
+    GET /  ->  GET /attendance/status  ->  POST /attendance  ->  GET /api/ranking
+
+and the run reports throughput, p50/p95/p99 latency and datastore reads
+(from the Server-Timing header, see metrics.py) per endpoint.
+Results can be saved as JSON and compared with an earlier run:
+
+    python benchmarks/checkin_surge.py --output baseline.json
+    python benchmarks/checkin_surge.py --compare baseline.json --max-regression 0.25
+
+With --compare, the exit code is 1 if any endpoint's p95 got slower than the
+allowed ratio, needs more reads per request, or any request failed. Rate limits
+stay on: they count per member (see rate_limit.py), so one check-in per member
+is far within budget even though every request comes from the gym IP.
+
+Usage:
+    python benchmarks/checkin_surge.py [--members 300] [--concurrency 50] [--backend memory]
+        [--history-weeks 8] [--at 2025-03-08T12:50] [--surge] [--output FILE] [--compare FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FLOW = (
+    ("GET /", "GET", "/"),
+    ("GET /attendance/status", "GET", "/attendance/status"),
+    ("POST /attendance", "POST", "/attendance"),
+    ("GET /api/ranking", "GET", "/api/ranking?year={year}&month={month}"),
+)
+
+
+def configure_environment(args, workdir: str):
+    """Settings read at import time; must run before the app is imported."""
+    os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "bench.sqlite3")
+    os.environ["ALLOWED_IP"] = args.gym_ip
+    os.environ["CHECKIN_SURGE_MODE"] = "true" if args.surge else "false"
+    os.environ["CHECKIN_SPILL_PATH"] = os.path.join(workdir, "checkin_spill.jsonl")
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)  # templates/ and static/ are resolved relative to the repo root
+
+
+def freeze_clock(at: datetime):
+    """Replace get_current_kst_time in logic and every module that imported it."""
+    import logic
+
+    frozen = logic.KST.localize(at)
+    original = logic.get_current_kst_time
+    for module in list(sys.modules.values()):
+        if getattr(module, "get_current_kst_time", None) is original:
+            module.get_current_kst_time = lambda: frozen
+    return frozen
+
+
+async def seed(repo, members: int, history_weeks: int, now: datetime, rng: random.Random) -> list:
+    """Approved members plus some weekend history so summaries and rankings are non-trivial."""
+    uids = [f"bench{i:05d}" for i in range(members)]
+    for uid in uids:
+        await repo.create_user(uid, {
+            "uid": uid,
+            "nickname": f"member{uid[-5:]}",
+            "initial_nickname": f"member{uid[-5:]}",
+            "profile_image": "",
+            "is_auth": "approved",
+            "batch": "25-01",
+        })
+
+    records = []
+    for week in range(history_weeks, 0, -1):
+        for offset in (0, 1):  # the Saturday and Sunday of each earlier week
+            day = (now - timedelta(weeks=week, days=(now.weekday() - 5) % 7) + timedelta(days=offset)).strftime("%Y-%m-%d")
+            for uid in uids:
+                if rng.random() < 0.6:
+                    status = "present" if rng.random() < 0.8 else "late"
+                    records.append({"user_id": uid, "date": day, "timestamp": now, "status": status})
+    for i in range(0, len(records), 500):
+        await repo.record_checkins(records[i:i + 500])
+    return uids
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for name, entries in samples.items():
+        latencies = sorted(latency for latency, _, _ in entries)
+        reads = [count for _, _, count in entries]
+        statuses = {}
+        for _, status_code, _ in entries:
+            statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+        endpoints[name] = {
+            "requests": len(entries),
+            "errors": sum(1 for _, status_code, _ in entries if status_code >= 400),
+            "status_codes": statuses,
+            "rps": len(entries) / elapsed if elapsed else 0.0,
+            "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+            "avg_reads": statistics.fmean(reads) if reads else 0.0,
+            "max_reads": max(reads, default=0),
+        }
+    total = sum(entry["requests"] for entry in endpoints.values())
+    return {
+        "elapsed_s": elapsed,
+        "total_requests": total,
+        "total_rps": total / elapsed if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    import database
+    import checkin_queue
+    import metrics
+    from dependencies import sign_uid
+    import main
+
+    database.initialize_firebase()
+    repo = database.get_repo()
+    now = freeze_clock(datetime.fromisoformat(args.at))
+
+    rng = random.Random(args.seed)
+    uids = await seed(repo, args.members, args.history_weeks, now, rng)
+    if args.surge:
+        await checkin_queue.start(repo)
+
+    queue = asyncio.Queue()
+    for uid in rng.sample(uids, len(uids)):
+        queue.put_nowait(uid)
+    samples = {name: [] for name, _, _ in FLOW}
+    headers = {"X-Forwarded-For": args.gym_ip, "X-Requested-With": "XMLHttpRequest"}
+
+    transport = httpx.ASGITransport(app=main.app)
+
+    async def member_flow():
+        # One client per in-flight member, so each carries its own session cookie
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            while not queue.empty():
+                uid = queue.get_nowait()
+                client.cookies.set("user_uid", sign_uid(uid))
+                for name, method, path in FLOW:
+                    url = path.format(year=now.year, month=now.month)
+                    started = time.perf_counter()
+                    response = await client.request(method, url)
+                    latency = time.perf_counter() - started
+                    reads = metrics.parse_server_timing(response.headers.get("server-timing", "")).get("reads", 0)
+                    samples[name].append((latency, response.status_code, reads))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(member_flow() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    if args.surge:
+        await checkin_queue.stop()
+
+    stored = len(await repo.list_attendance_by_date(now.strftime("%Y-%m-%d")))
+    result = summarize(samples, elapsed)
+    result["checkins_stored"] = stored
+    result["config"] = {
+        "members": args.members,
+        "concurrency": args.concurrency,
+        "backend": args.backend,
+        "surge": args.surge,
+        "history_weeks": args.history_weeks,
+        "at": args.at,
+        "seed": args.seed,
+    }
+    result["environment"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    return result
+
+
+def print_report(result: dict):
+    config = result["config"]
+    print(
+        f"{config['members']} members, concurrency {config['concurrency']}, backend {config['backend']}"
+        f"{' (surge mode)' if config['surge'] else ''}: {result['total_requests']} requests in "
+        f"{result['elapsed_s']:.2f}s ({result['total_rps']:.1f} req/s), {result['checkins_stored']} check-ins stored\n"
+    )
+    print(f"{'endpoint':<24} {'req':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'reads':>6}")
+    for name, entry in result["endpoints"].items():
+        print(
+            f"{name:<24} {entry['requests']:>6} {entry['errors']:>5} {entry['rps']:>8.1f} "
+            f"{entry['p50_ms']:>8.1f} {entry['p95_ms']:>8.1f} {entry['p99_ms']:>8.1f} {entry['avg_reads']:>6.1f}"
+        )
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> bool:
+    """Print p95 / read changes against a baseline run. Returns False on a regression or failed requests."""
+    ok = True
+    print(f"\nAgainst baseline ({baseline.get('environment', {}).get('run_at', 'unknown')}), max p95 regression {max_regression:.0%}:")
+    for name, entry in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if entry["errors"]:
+            ok = False
+        if not before or not before["p95_ms"]:
+            print(f"  {name:<24} (not in baseline)")
+            continue
+        change = entry["p95_ms"] / before["p95_ms"] - 1
+        more_reads = entry.get("max_reads", 0) > before.get("max_reads", 0)
+        regressed = change > max_regression or more_reads
+        ok = ok and not regressed
+        print(
+            f"  {name:<24} p95 {before['p95_ms']:.1f} -> {entry['p95_ms']:.1f} ms ({change:+.0%}), "
+            f"max reads {before.get('max_reads', 0)} -> {entry.get('max_reads', 0)}{'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=300, help="Members checking in")
+    parser.add_argument("--concurrency", type=int, default=50, help="Members in flight at once")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--history-weeks", type=int, default=8, help="Weeks of earlier attendance to seed")
+    parser.add_argument("--at", default="2025-03-08T12:50", help="Frozen KST time (inside a session window)")
+    parser.add_argument("--gym-ip", default="203.0.113.10", help="Client IP sent in X-Forwarded-For")
+    parser.add_argument("--surge", action="store_true", help="Enable CHECKIN_SURGE_MODE (write-behind queue)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for history and arrival order")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed p95 slowdown ratio with --compare")
+    args = parser.parse_args()
+    # The run changes into the repo root; keep file arguments relative to the caller
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(args, workdir)
+        result = asyncio.run(run(args))
+
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
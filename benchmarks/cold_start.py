@@ -0,0 +1,168 @@
+"""
+Cold-start profile: import time by module and first-request cost per route.
+
+Each measurement runs in a fresh interpreter, as on a serverless cold start:
+
+  1. `python -X importtime -c "import main"`: total import time of the app,
+     broken down by top-level package (self time) and by the heaviest
+     modules the app imports directly (cumulative time).
+  2. For each route, import the app and send one request in-process, and
+     report the time to the first response and which heavy SDKs it loaded.
+
+Routes that never touch the datastore (/favicon.ico, /logout, /login/kakao)
+should not load firebase_admin. Without Firebase credentials the datastore
+routes answer without data (or 500), but still show the SDK import cost;
+set STORAGE_BACKEND=memory to profile the app without the SDK.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 3] [--top 15] [--output cold_start.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = ("/favicon.ico", "/logout", "/login/kakao", "/attendance/status", "/api/ranking?year=2025&month=3", "/")
+HEAVY_MODULES = ("firebase_admin", "google.cloud.firestore", "grpc", "httpx", "jinja2")
+APP_MODULE = re.compile(r"^(main|database|logic|dependencies|metrics|roster|aggregates|templating|routers|storage)\b")
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+FIRST_REQUEST = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def request(url):
+    # Bare ASGI call, so the profiler itself does not import an HTTP client
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"cold")], "client": ("127.0.0.1", 50000), "server": ("cold", 80),
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await main.app(scope, receive, send)
+    return status[0]
+
+status = asyncio.run(request(sys.argv[1]))
+done = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (done - imported) * 1000,
+    "loaded": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("KAKAO_CLIENT_ID", "cold-start-profile")
+    return env
+
+
+def import_profile() -> list:
+    """(self_us, cumulative_us, depth, module) for every import of `import main`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((int(self_us), int(cumulative_us), len(indent) // 2, module))
+    return entries
+
+
+def summarize_imports(entries: list, top: int) -> dict:
+    total_us = next((cumulative for _, cumulative, _, module in entries if module == "main"), 0)
+
+    by_package = {}
+    for self_us, _, _, module in entries:
+        package = module.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+
+    # Third-party modules imported straight from app code, with their cumulative cost
+    direct = {}
+    parents = []
+    for self_us, cumulative_us, depth, module in reversed(entries):  # importtime lists children first
+        del parents[depth:]
+        parent = parents[-1] if parents else ""
+        if APP_MODULE.match(parent) and not APP_MODULE.match(module):
+            direct[module] = max(direct.get(module, 0), cumulative_us)
+        parents.append(module)
+
+    return {
+        "total_ms": total_us / 1000,
+        "packages_ms": {k: v / 1000 for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]},
+        "app_imports_ms": {k: v / 1000 for k, v in sorted(direct.items(), key=lambda kv: -kv[1])[:top]},
+    }
+
+
+def first_request(path: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST, path, *HEAVY_MODULES],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--top", type=int, default=15, help="Rows per import table")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    profiles = [summarize_imports(import_profile(), args.top) for _ in range(args.runs)]
+    profile = min(profiles, key=lambda p: p["total_ms"])  # least noisy run for the breakdown
+    total_ms = statistics.median(p["total_ms"] for p in profiles)
+
+    print(f"import main: {total_ms:.1f} ms (median of {args.runs})\n")
+    print(f"{'package (self time)':<40} {'ms':>8}")
+    for package, ms in profile["packages_ms"].items():
+        print(f"{package:<40} {ms:>8.1f}")
+    print(f"\n{'imported by app code (cumulative)':<40} {'ms':>8}")
+    for module, ms in profile["app_imports_ms"].items():
+        print(f"{module:<40} {ms:>8.1f}")
+
+    routes = {}
+    print(f"\n{'route (fresh process)':<34} {'status':>6} {'import ms':>10} {'1st req ms':>11}  loaded")
+    for path in ROUTES:
+        runs = [first_request(path) for _ in range(args.runs)]
+        routes[path] = {
+            "status": runs[-1]["status"],
+            "import_ms": statistics.median(r["import_ms"] for r in runs),
+            "first_request_ms": statistics.median(r["first_request_ms"] for r in runs),
+            "loaded": runs[-1]["loaded"],
+        }
+        entry = routes[path]
+        print(
+            f"{path:<34} {entry['status']:>6} {entry['import_ms']:>10.1f} {entry['first_request_ms']:>11.1f}"
+            f"  {', '.join(entry['loaded']) or '-'}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"import_total_ms": total_ms, "imports": profile, "routes": routes}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Event-loop blocking benchmark: the real app with a slow datastore.
+
+Drives main.app in-process (httpx.ASGITransport) against the memory backend
+wrapped so that every repository call takes --latency-ms, either
+
+  - "sync":  blocking the event loop (time.sleep), as the synchronous
+             Firestore client did before the routers moved to AsyncClient
+  - "async": awaited (asyncio.sleep), as with AsyncClient
+
+and reports throughput and latency of GET / and GET /api/ranking from
+signed-in members arriving in waves of increasing concurrency. Latency is
+measured from a wave's arrival, so time queued behind a blocked loop counts.
+Round trips per request come from the Server-Timing header (see metrics.py).
+Process caches (roster, attendee map, fragments) are emptied before each
+level, so each level starts cold.
+
+Usage:
+    python benchmarks/event_loop.py [--latency-ms 30] [--members 100] [--requests 200]
+        [--concurrency 1 10 50 100] [--modes sync async]
+"""
+import argparse
+import asyncio
+import inspect
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from checkin_surge import configure_environment, freeze_clock, seed, percentile
+
+ENDPOINTS = (
+    ("GET /", "/"),
+    ("GET /api/ranking", "/api/ranking?year={year}&month={month}"),
+)
+
+
+class LatencyRepository:
+    """Wraps a repository; every awaited call first spends `latency` seconds, blocking or not."""
+
+    def __init__(self, repo, latency: float, blocking: bool):
+        self._repo = repo
+        self.latency = latency
+        self.blocking = blocking
+
+    def __getattr__(self, name):
+        attr = getattr(self._repo, name)
+        if name.startswith("_") or not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            if self.blocking:
+                time.sleep(self.latency)  # a blocking round trip stalls every other request
+            else:
+                await asyncio.sleep(self.latency)  # an awaited one yields the loop
+            return await attr(*args, **kwargs)
+
+        return call
+
+
+def clear_caches():
+    import roster
+    import member_index
+    import attendance_cache
+    import templating
+
+    roster.clear()
+    member_index.invalidate()
+    attendance_cache._days.clear()
+    templating._fragments.clear()
+
+
+async def drive(app, uids: list, paths: list, concurrency: int, total: int) -> dict:
+    import httpx
+    import metrics
+    from dependencies import sign_uid
+
+    samples = {name: [] for name, _ in paths}
+    jobs = [(paths[i % len(paths)], uids[i % len(uids)]) for i in range(total)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def request(job, arrived: float):
+            (name, path), uid = job
+            response = await client.get(path, cookies={"user_uid": sign_uid(uid)})
+            # From the wave's arrival: time spent waiting for a blocked loop counts too
+            latency = time.perf_counter() - arrived
+            queries = metrics.parse_server_timing(response.headers.get("server-timing", "")).get("queries", 0)
+            samples[name].append((latency, response.status_code, queries))
+
+        started = time.perf_counter()
+        # Waves of `concurrency` requests arriving together, as members do at session start
+        for i in range(0, total, concurrency):
+            arrived = time.perf_counter()
+            await asyncio.gather(*(request(job, arrived) for job in jobs[i:i + concurrency]))
+        elapsed = time.perf_counter() - started
+
+    result = {"rps": total / elapsed, "endpoints": {}}
+    for name, entries in samples.items():
+        latencies = sorted(latency for latency, _, _ in entries)
+        result["endpoints"][name] = {
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "errors": sum(1 for _, status_code, _ in entries if status_code >= 400),
+            "queries": statistics.fmean(queries for _, _, queries in entries) if entries else 0.0,
+        }
+    return result
+
+
+async def run(args):
+    import database
+    import metrics
+    from storage import create_repository
+    import main
+
+    now = freeze_clock(datetime.fromisoformat(args.at))
+    base = create_repository("memory")
+    uids = await seed(base, args.members, args.history_weeks, now, random.Random(args.seed))
+    paths = [(name, path.format(year=now.year, month=now.month)) for name, path in ENDPOINTS]
+
+    print(f"Datastore round trip {args.latency_ms:.0f} ms, {args.members} members, {args.requests} requests per level\n")
+    print(f"{'mode':<6} {'conc':>5} {'req/s':>8}  " + "  ".join(f"{name + ' p50/p95 ms':>28}" for name, _ in paths) + f"  {'queries/req':>11}")
+    for mode in args.modes:
+        database.repo = metrics.instrument(LatencyRepository(base, args.latency_ms / 1000, blocking=mode == "sync"))
+        for concurrency in args.concurrency:
+            clear_caches()
+            result = await drive(main.app, uids, paths, concurrency, args.requests)
+            endpoints = result["endpoints"]
+            cells = "  ".join(f"{endpoints[name]['p50_ms']:>13.1f} / {endpoints[name]['p95_ms']:>10.1f}" for name, _ in paths)
+            queries = "/".join(f"{endpoints[name]['queries']:.1f}" for name, _ in paths)
+            errors = sum(endpoints[name]["errors"] for name, _ in paths)
+            print(f"{mode:<6} {concurrency:>5} {result['rps']:>8.1f}  {cells}  {queries:>11}" + (f"  ({errors} errors)" if errors else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Datastore round trip (ms)")
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--history-weeks", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--modes", nargs="+", choices=("sync", "async"), default=["sync", "async"])
+    parser.add_argument("--at", default="2025-03-08T12:50", help="Frozen KST time (YYYY-MM-DDTHH:MM)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Settings read at import time (storage backend, gym IP) before the app is imported
+    args.backend, args.gym_ip, args.surge = "memory", "127.0.0.1", False
+    configure_environment(args, tempfile.mkdtemp(prefix="magnus-bench-"))
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Check-in location check microbenchmark: per-request cost vs number of rules.
+
+Compares the old check (re-split the ALLOWED_IP string on every call, exact
+matches only) with network_policy's precompiled prefix set, for growing rule
+lists mixing single addresses and CIDR networks. Also times resolving the
+client address through a chain of trusted proxies.
+
+Usage:
+    python benchmarks/network_policy.py [--rules 1 10 100 1000 10000] [--calls 20000]
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import network_policy  # noqa: E402
+
+
+def old_check_ip(client_ip: str, allowed_ip: str) -> bool:
+    """The check as it was: parse the env string on every request."""
+    if client_ip == "127.0.0.1" or client_ip == "::1":
+        return True
+    allowed_ips = [ip.strip() for ip in allowed_ip.split(",")]
+    return client_ip in allowed_ips
+
+
+def make_rules(count: int, rng: random.Random) -> list:
+    """Public /32 hosts, /24 and /28 networks and some IPv6 /48s."""
+    rules = []
+    for i in range(count):
+        kind = i % 4
+        base = ipaddress.IPv4Address(rng.randrange(0x0B000000, 0xDF000000))
+        if kind == 0:
+            rules.append(str(base))
+        elif kind == 1:
+            rules.append(str(ipaddress.ip_network(f"{base}/24", strict=False)))
+        elif kind == 2:
+            rules.append(str(ipaddress.ip_network(f"{base}/28", strict=False)))
+        else:
+            rules.append(f"2001:db8:{rng.randrange(0x10000):x}::/48")
+    return rules
+
+
+def per_call_ns(stmt, calls: int) -> float:
+    return min(timeit.repeat(stmt, number=calls, repeat=5)) / calls * 1e9
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    print(f"{'rules':>7}  {'old hit ns':>10}  {'old miss ns':>11}  {'new hit ns':>10}  {'new miss ns':>11}  {'XFF walk ns':>11}")
+    for count in args.rules:
+        rules = make_rules(count, rng)
+        allowed_ip = ", ".join(rules)
+        policy = network_policy.build_policy(rules, ["10.0.0.0/8", "127.0.0.0/8"])
+
+        # The last rule is the worst case for the old linear scan
+        hit = str(ipaddress.ip_network(rules[-1], strict=False)[0]) if "/" in rules[-1] else rules[-1]
+        miss = "8.8.8.8"
+        chain = f"{hit}, 10.1.2.3, 10.4.5.6"
+
+        old_hit = per_call_ns(lambda: old_check_ip(hit, allowed_ip), args.calls)
+        old_miss = per_call_ns(lambda: old_check_ip(miss, allowed_ip), args.calls)
+        new_hit = per_call_ns(lambda: network_policy.is_allowed(hit, policy), args.calls)
+        new_miss = per_call_ns(lambda: network_policy.is_allowed(miss, policy), args.calls)
+        walk = per_call_ns(lambda: network_policy.client_ip("127.0.0.1", chain, policy), args.calls)
+
+        assert network_policy.is_allowed(hit, policy) and not network_policy.is_allowed(miss, policy)
+        assert network_policy.client_ip("127.0.0.1", chain, policy) == hit
+        print(f"{count:>7}  {old_hit:>10.0f}  {old_miss:>11.0f}  {new_hit:>10.0f}  {new_miss:>11.0f}  {walk:>11.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
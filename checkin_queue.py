@@ -0,0 +1,239 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from datetime import datetime
+import aggregates
+import attendance_cache
+
+logger = logging.getLogger(__name__)
+
+# Write-behind check-in mode for the session-start surge.
+# Check-ins are accepted against the warm attendee map (attendance_cache),
+# appended to a spill file, and flushed to the datastore in batches by a
+# background task. Needs a long-running process (not serverless) and is
+# meant for a single worker: duplicates across workers are dropped at flush.
+SURGE_MODE = os.getenv("CHECKIN_SURGE_MODE", "false").lower() in ("1", "true", "yes")
+SPILL_PATH = os.getenv("CHECKIN_SPILL_PATH", "checkin_spill.jsonl")
+FLUSH_INTERVAL = float(os.getenv("CHECKIN_FLUSH_INTERVAL", "1.0"))  # seconds
+# A record that keeps failing while others commit is set aside here after
+# CHECKIN_MAX_ATTEMPTS flushes, so it cannot hold up the records behind it
+DEAD_LETTER_PATH = os.getenv("CHECKIN_DEAD_LETTER_PATH", "checkin_dead_letter.jsonl")
+MAX_ATTEMPTS = int(os.getenv("CHECKIN_MAX_ATTEMPTS", "5"))
+FLUSH_SIZE = 200        # records per batch commit (2 writes each + leaderboard)
+MAX_BACKOFF = 30.0      # seconds between retries when the datastore is failing
+
+_pending = []           # accepted records not yet committed, in accept order
+_attempts = {}          # (uid, date) -> failed flushes of a record that failed on its own
+_spill_lock = threading.Lock()
+_wakeup = asyncio.Event()
+_task = None
+_repo = None
+
+
+def _encode(record: dict) -> str:
+    data = dict(record)
+    data["timestamp"] = record["timestamp"].isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _decode(line: str) -> dict:
+    data = json.loads(line)
+    data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+    return data
+
+
+def _spill_append(record: dict):
+    with _spill_lock:
+        with open(SPILL_PATH, "a", encoding="utf-8") as f:
+            f.write(_encode(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _spill_rewrite():
+    """Replace the spill file with the records still pending."""
+    with _spill_lock:
+        remaining = list(_pending)
+        if not remaining:
+            if os.path.exists(SPILL_PATH):
+                os.remove(SPILL_PATH)
+            return
+        tmp_path = f"{SPILL_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in remaining:
+                f.write(_encode(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, SPILL_PATH)
+
+
+def _dead_letter_append(record: dict, error: str):
+    data = json.loads(_encode(record))
+    data["error"] = error
+    with _spill_lock:
+        with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _replay_spill():
+    """Reload records accepted before a crash or restart."""
+    if not os.path.exists(SPILL_PATH):
+        return
+    seen = set()
+    with open(SPILL_PATH, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = _decode(line)
+            except (ValueError, KeyError):
+                logger.warning(f"Skipping unreadable spill line: {line.strip()}")
+                continue
+            key = (record["user_id"], record["date"])
+            if key not in seen:
+                seen.add(key)
+                _pending.append(record)
+                attendance_cache.mark(record["user_id"], record["date"], record["status"], pending=True)
+    logger.info(f"Replayed {len(_pending)} pending check-ins from {SPILL_PATH}")
+
+
+async def accept(repo, uid: str, date_str: str, status: str, timestamp: datetime) -> bool:
+    """
+    Accept a check-in without waiting for the datastore. The status and timestamp
+    decided now are what gets written at flush. Returns False on a duplicate.
+    """
+    await attendance_cache.ensure_loaded(repo, date_str)
+    if attendance_cache.get_status(uid, date_str):
+        return False
+    attendance_cache.mark(uid, date_str, status, pending=True)
+
+    record = {
+        "user_id": uid,
+        "date": date_str,
+        "timestamp": timestamp,
+        "status": status,
+    }
+    _pending.append(record)
+    try:
+        await asyncio.to_thread(_spill_append, record)
+    except OSError:
+        _pending.remove(record)
+        attendance_cache.confirm(uid, date_str)
+        attendance_cache.mark(uid, date_str, None)
+        raise
+
+    if len(_pending) >= FLUSH_SIZE:
+        _wakeup.set()
+    return True
+
+
+def _done(records: list):
+    """Drop committed (or dead-lettered) records from the queue."""
+    ids = {id(record) for record in records}
+    _pending[:] = [record for record in _pending if id(record) not in ids]
+    for record in records:
+        _attempts.pop((record["user_id"], record["date"]), None)
+        attendance_cache.confirm(record["user_id"], record["date"])
+
+
+async def _flush_singly(chunk: list):
+    """
+    Commit a failed batch one record at a time. Records that fail while others
+    go through are blamed (a failure of every record is an outage, not theirs)
+    and dead-lettered after MAX_ATTEMPTS. Raises if anything is left pending.
+    """
+    stored, failed = [], []
+    for record in chunk:
+        try:
+            await _repo.record_checkins([record])
+            stored.append(record)
+        except Exception as e:
+            failed.append((record, e))
+    if not stored:
+        raise failed[0][1]
+    _done(stored)
+
+    dead = []
+    for record, error in failed:
+        key = (record["user_id"], record["date"])
+        _attempts[key] = _attempts.get(key, 0) + 1
+        if _attempts[key] >= MAX_ATTEMPTS:
+            dead.append(record)
+            await asyncio.to_thread(_dead_letter_append, record, repr(error))
+            logger.error(f"Check-in {key} failed {MAX_ATTEMPTS} times, moved to {DEAD_LETTER_PATH}: {error!r}")
+    _done(dead)
+    # Not stored: the member can check in again
+    for record in dead:
+        attendance_cache.mark(record["user_id"], record["date"], None)
+    await asyncio.to_thread(_spill_rewrite)
+
+    logger.info(f"Flushed {len(stored)} check-ins one by one, {len(failed) - len(dead)} still failing")
+    if len(failed) > len(dead):
+        raise RuntimeError(f"{len(failed) - len(dead)} check-in(s) failed on their own")
+
+
+async def flush():
+    """Commit pending records in batches. Raises if a batch fails; it stays pending."""
+    while _pending:
+        chunk = _pending[:FLUSH_SIZE]
+        for key in sorted({aggregates.month_key(record["date"]) for record in chunk}):
+            await aggregates.ensure_built(_repo, key)
+        try:
+            written = await _repo.record_checkins(chunk)
+        except Exception as e:
+            if len(chunk) == 1:
+                raise
+            # Find out whether one bad record is failing the whole batch
+            logger.warning(f"Check-in batch of {len(chunk)} failed, retrying records one by one: {e!r}")
+            await _flush_singly(chunk)
+            continue
+        _done(chunk)
+        await asyncio.to_thread(_spill_rewrite)
+        logger.info(f"Flushed {written} check-ins ({len(chunk) - written} already stored)")
+
+
+async def _flush_loop():
+    backoff = FLUSH_INTERVAL
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+        try:
+            await flush()
+            backoff = FLUSH_INTERVAL
+        except Exception as e:
+            logger.error(f"Check-in flush failed ({len(_pending)} pending), retrying in {backoff:.0f}s: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+async def start(repo):
+    global _task, _repo
+    _repo = repo
+    _replay_spill()
+    _task = asyncio.create_task(_flush_loop())
+    logger.info(f"Check-in surge mode enabled (spill file: {SPILL_PATH})")
+
+
+async def stop():
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+    try:
+        await flush()
+    except Exception as e:
+        logger.error(f"Final check-in flush failed, {len(_pending)} kept in {SPILL_PATH}: {e}")
@@ -0,0 +1,142 @@
+import os
+import zlib
+import importlib.util
+from starlette.datastructures import Headers, MutableHeaders
+from static_assets import accepted_encodings
+
+# Response compression for pages and API responses: brotli when the optional
+# brotli package is installed and the browser accepts it, gzip otherwise.
+# Streamed responses (exports) are compressed chunk by chunk and flushed, so
+# they still arrive progressively; event streams and already-encoded
+# responses (precompressed static files) pass through untouched.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))  # bytes
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # per request, so speed over ratio (static files use 11)
+
+COMPRESSIBLE_TYPES = (
+    "text/html", "text/plain", "text/css", "text/csv", "text/javascript",
+    "application/json", "application/javascript", "image/svg+xml",
+)
+
+
+def _brotli_available() -> bool:
+    return importlib.util.find_spec("brotli") is not None
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = accepted_encodings(accept_encoding)
+    if "br" in accepted and _brotli_available():
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        import brotli
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing text responses with brotli or gzip."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                if message["status"] in (204, 304) or not _compressible(headers):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether it is worth compressing
+                    start = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body and len(body) < COMPRESSION_MIN_SIZE:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                compressor = _Brotli() if encoding == "br" else _Gzip()
+                headers = MutableHeaders(raw=start.setdefault("headers", []))
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                # The compressed bytes are a different representation of the same resource
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["etag"] = f"W/{etag}"
+
+                if more_body:
+                    del headers["content-length"]
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressor.compress(body), "more_body": True})
+                else:
+                    compressed = compressor.compress(body) + compressor.finish()
+                    headers["content-length"] = str(len(compressed))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressed})
+                return
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
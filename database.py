@@ -1,24 +1,42 @@
 import os
 import json
 import logging
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
+from storage import create_repository
+import metrics
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# Global variable to hold the Firestore client
+# Storage backend: firestore (default), memory or sqlite (see storage/__init__.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+
+# Global variable to hold the Firestore client (AsyncClient: all reads and writes are awaited)
 db = None
 
+# Repository the routers talk to (storage/base.py), counted per request (metrics.py)
+repo = None
+
 
 def initialize_firebase():
-    global db
+    global db, repo
+
+    if STORAGE_BACKEND != "firestore":
+        if repo is None:
+            repo = metrics.instrument(create_repository(STORAGE_BACKEND))
+            logger.info(f"Using {STORAGE_BACKEND} storage backend (Firebase not initialized)")
+        return
+
+    # Imported here: the Firebase SDK is most of the app's import time, and
+    # routes that never touch the datastore should not pay for it on a cold start
+    import firebase_admin
+    from firebase_admin import credentials, firestore_async
 
     # Check if already initialized
     if firebase_admin._apps:
-        db = firestore.client()
+        db = firestore_async.client()
+        repo = metrics.instrument(create_repository("firestore", db))
         return
 
     cred_path = os.getenv("FIREBASE_CREDENTIALS_PATH", "firebase_credentials.json")
@@ -29,20 +47,36 @@ def initialize_firebase():
         cred_dict = json.loads(cred_json)
         cred = credentials.Certificate(cred_dict)
         firebase_admin.initialize_app(cred)
-        db = firestore.client()
+        db = firestore_async.client()
     elif os.path.exists(cred_path):
         logger.info(f"Loading Firebase credentials from file: {cred_path}")
         cred = credentials.Certificate(cred_path)
         firebase_admin.initialize_app(cred)
-        db = firestore.client()
+        db = firestore_async.client()
     else:
         raise RuntimeError(
             f"Firebase credentials not found. "
             f"Set FIREBASE_CREDENTIALS_JSON env var or provide file at {cred_path}"
         )
 
+    repo = metrics.instrument(create_repository("firestore", db))
     logger.info("Firebase initialized successfully")
 
 
 def get_db():
+    """Raw Firestore client (None on the memory / sqlite backends)."""
     return db
+
+
+def get_repo():
+    """
+    Repository, initializing the backend on first use. Returns None if it
+    cannot be initialized (the routes answer with a database error).
+    """
+    if repo is None:
+        try:
+            initialize_firebase()
+        except Exception as e:
+            logger.error(f"Storage initialization failed: {e}")
+            return None
+    return repo
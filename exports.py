@@ -0,0 +1,142 @@
+import io
+import csv
+import logging
+import importlib.util
+from datetime import datetime
+from typing import Optional
+from aggregates import BATCH_LIMIT
+from member_index import NO_BATCH
+
+logger = logging.getLogger(__name__)
+
+# Attendance export: records are paged out of the datastore BATCH_LIMIT at a
+# time and written out page by page, so memory stays flat however long the
+# date range. Nicknames and batches come from one users listing.
+EXPORT_COLUMNS = ("date", "user_id", "nickname", "batch", "status", "point", "timestamp")
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def columnar_available() -> bool:
+    """Arrow / Parquet output needs the optional pyarrow package."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _timestamp(value) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if value is not None else ""
+
+
+async def iter_rows(repo, start: str, end: str, uid: Optional[str] = None, batch: Optional[str] = None,
+                    page_size: int = BATCH_LIMIT):
+    """Yield pages (lists) of export rows, ordered by date."""
+    members = {doc_id: user_data for doc_id, user_data in await repo.list_users()}
+    after = None
+
+    while True:
+        records = await repo.list_attendance_page(start, end, uid=uid, after=after, limit=page_size)
+        if not records:
+            return
+
+        rows = []
+        for record in records:
+            user_data = members.get(record.get("user_id")) or {}
+            member_batch = user_data.get("batch") or ""
+            if batch and (member_batch or NO_BATCH) != batch:
+                continue
+            rows.append({
+                "date": record.get("date", ""),
+                "user_id": record.get("user_id", ""),
+                "nickname": user_data.get("nickname") or "",
+                "batch": member_batch,
+                "status": record.get("status", ""),
+                "point": record.get("point", 0),
+                "timestamp": _timestamp(record.get("timestamp")),
+            })
+        if rows:
+            yield rows
+
+        if len(records) < page_size:
+            return
+        last = records[-1]
+        after = (last["date"], last["user_id"])
+
+
+async def csv_stream(pages):
+    """CSV text, one chunk per page. Starts with a BOM so Excel reads Korean nicknames as UTF-8."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    buffer.write("\ufeff")
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    async for rows in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+class _ChunkSink:
+    """Write-only file object that hands pyarrow's output back out in chunks."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def columnar_stream(pages, fmt: str):
+    """Arrow IPC stream or Parquet bytes, one record batch / row group per page."""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("date", pa.string()),
+        ("user_id", pa.string()),
+        ("nickname", pa.string()),
+        ("batch", pa.string()),
+        ("status", pa.string()),
+        ("point", pa.int64()),
+        ("timestamp", pa.string()),
+    ])
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema)
+        write = writer.write_table
+        to_arrow = pa.Table.from_pylist
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+        to_arrow = pa.RecordBatch.from_pylist
+
+    try:
+        async for rows in pages:
+            write(to_arrow(rows, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,45 @@
+import os
+import json
+import hashlib
+from fastapi.responses import Response
+
+# Conditional GETs for the month APIs. ETags are built from the month's data
+# version (bumped by every attendance write, see storage/base.py) plus the
+# inputs that change with the clock, so a revalidation costs one versions read.
+# The current month is revalidated on every use; closed months only change on
+# admin edits and may be reused by the browser for CLOSED_MONTH_MAX_AGE.
+CLOSED_MONTH_MAX_AGE = int(os.getenv("CLOSED_MONTH_MAX_AGE", "86400"))  # seconds
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over JSON-serializable parts."""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def is_closed_month(target_date, now) -> bool:
+    return (target_date.year, target_date.month) < (now.year, now.month)
+
+
+def cache_headers(etag: str, target_date, now) -> dict:
+    if is_closed_month(target_date, now):
+        cache_control = f"private, max-age={CLOSED_MONTH_MAX_AGE}"
+    else:
+        cache_control = "private, no-cache"
+    # Responses depend on the session cookie (is_me, the member's calendar)
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Cookie"}
+
+
+def is_not_modified(request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,95 @@
+import os
+import asyncio
+import logging
+import importlib.util
+from urllib.parse import urlencode
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Kakao endpoints; point these at a local stub for tests and benchmarks
+KAKAO_AUTH_URL = os.getenv("KAKAO_AUTH_URL", "https://kauth.kakao.com").rstrip("/")
+KAKAO_API_URL = os.getenv("KAKAO_API_URL", "https://kapi.kakao.com").rstrip("/")
+
+CONNECT_TIMEOUT = float(os.getenv("KAKAO_CONNECT_TIMEOUT", "3"))  # seconds
+READ_TIMEOUT = float(os.getenv("KAKAO_READ_TIMEOUT", "5"))        # seconds
+MAX_RETRIES = int(os.getenv("KAKAO_MAX_RETRIES", "2"))
+RETRY_BACKOFF = 0.2  # seconds, doubled per attempt
+
+# One keep-alive client for the whole app (created on the first login, closed
+# in main.lifespan), so re-logins reuse the TLS connection to Kakao
+_client = None
+_transport = None
+
+
+def _http2_available() -> bool:
+    return os.getenv("KAKAO_HTTP2", "true").lower() in ("1", "true", "yes") and importlib.util.find_spec("h2") is not None
+
+
+def use_transport(transport):
+    """Route Kakao calls through a custom httpx transport (e.g. httpx.MockTransport in tests)."""
+    global _transport, _client
+    _transport = transport
+    _client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        import httpx
+
+        limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+        # Transport-level retries only cover failed connects, where nothing was sent
+        transport = _transport or httpx.AsyncHTTPTransport(retries=MAX_RETRIES, http2=_http2_available(), limits=limits)
+        _client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def authorize_url(client_id: str, redirect_uri: str) -> str:
+    query = urlencode({"client_id": client_id, "redirect_uri": redirect_uri, "response_type": "code"})
+    return f"{KAKAO_AUTH_URL}/oauth/authorize?{query}"
+
+
+async def exchange_token(client_id: str, redirect_uri: str, code: str):
+    """POST the authorization code for an access token. Not retried once sent: codes are single-use."""
+    payload = {
+        "grant_type": "authorization_code",
+        "client_id": client_id,
+        "redirect_uri": redirect_uri,
+        "code": code,
+    }
+    with metrics.timed("kakao"):
+        return await get_client().post(f"{KAKAO_AUTH_URL}/oauth/token", data=payload)
+
+
+async def get_user_info(access_token: str):
+    """GET /v2/user/me, retried on timeouts and 5xx/429 with backoff."""
+    import httpx
+
+    url = f"{KAKAO_API_URL}/v2/user/me"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    with metrics.timed("kakao"):
+        for attempt in range(MAX_RETRIES + 1):
+            last_attempt = attempt == MAX_RETRIES
+            try:
+                response = await get_client().get(url, headers=headers)
+            except (httpx.TimeoutException, httpx.NetworkError) as e:
+                if last_attempt:
+                    raise
+                logger.warning(f"Kakao user info request failed ({e!r}), retrying")
+            else:
+                if last_attempt or not (response.status_code >= 500 or response.status_code == 429):
+                    return response
+                logger.warning(f"Kakao user info returned {response.status_code}, retrying")
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
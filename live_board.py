@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import roster
+import thumbnails
+import attendance_cache
+
+logger = logging.getLogger(__name__)
+
+# Live attendance board for admins (/admin/api/attendance/live, Server-Sent
+# Events). A connection gets a snapshot of the day from attendance_cache, then
+# the check-ins and batch edits committed by this process as small deltas.
+# Each delta is built and serialized once in publish() and shared by every
+# connection, so an idle admin tab costs a queue and a keep-alive comment.
+# Changes made by other workers reach the board through the periodic resync,
+# which compares against attendance_cache (reloaded every ATTENDED_CACHE_TTL).
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "50"))   # open streams per process
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))            # events buffered per stream
+LIVE_KEEPALIVE = float(os.getenv("LIVE_KEEPALIVE", "15"))             # seconds between keep-alive comments
+LIVE_RESYNC_INTERVAL = float(os.getenv("LIVE_RESYNC_INTERVAL", "60"))  # seconds between checks for other workers' changes
+LIVE_MAX_DURATION = float(os.getenv("LIVE_MAX_DURATION", "300"))      # seconds before the client is asked to reconnect
+RECONNECT_MS = 3000
+
+
+class Subscriber:
+    """One open stream: the day it watches and its bounded event queue."""
+
+    def __init__(self, date_str: str):
+        self.date = date_str
+        self.queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.overflowed = False
+
+
+_subscribers = set()
+
+
+def subscriber_count() -> int:
+    return len(_subscribers)
+
+
+def subscribe(date_str: str):
+    """A new Subscriber, or None when LIVE_MAX_SUBSCRIBERS are already open."""
+    if len(_subscribers) >= LIVE_MAX_SUBSCRIBERS:
+        return None
+    subscriber = Subscriber(date_str)
+    _subscribers.add(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber: Subscriber):
+    _subscribers.discard(subscriber)
+
+
+def format_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+async def _rows(repo, statuses: dict) -> list:
+    """[{uid, status, nickname, profile_image}] for {uid: status}; status None = removed."""
+    members = await roster.get_members(repo, list(statuses))
+    rows = []
+    for uid, status in statuses.items():
+        member = members.get(uid) or {}
+        rows.append({
+            "uid": uid,
+            "status": status,
+            "nickname": member.get("nickname") or "Unknown",
+            "profile_image": thumbnails.profile_url(uid, member.get("profile_image") or ""),
+        })
+    return rows
+
+
+async def publish(repo, date_str: str, statuses: dict):
+    """
+    Push committed changes ({uid: status}, None = removed) to the streams
+    watching date_str. Free when nobody watches; a stream whose queue is full
+    is marked and reset rather than slowing the caller down.
+    """
+    watching = [s for s in _subscribers if s.date == date_str]
+    if not watching or not statuses:
+        return
+    try:
+        payload = format_event("delta", {"date": date_str, "changes": await _rows(repo, statuses)})
+    except Exception as e:
+        logger.warning(f"Live board update for {date_str} not sent: {e}")
+        return
+    for subscriber in watching:
+        try:
+            subscriber.queue.put_nowait((statuses, payload))
+        except asyncio.QueueFull:
+            subscriber.overflowed = True
+
+
+async def snapshot(repo, date_str: str) -> tuple:
+    """({uid: status}, snapshot event) from the warm attendee map (one query per TTL)."""
+    await attendance_cache.ensure_loaded(repo, date_str)
+    statuses = attendance_cache.get_day(date_str)
+    return statuses, format_event("snapshot", {"date": date_str, "members": await _rows(repo, statuses)})
+
+
+async def stream(repo, subscriber: Subscriber, today):
+    """
+    The SSE body for a subscriber; unsubscribes when the client goes away.
+    today() returns the current date string: at midnight the stream resets
+    so the client reconnects to the new day.
+    """
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        state, payload = await snapshot(repo, subscriber.date)
+        yield payload
+
+        started_at = resynced_at = time.monotonic()
+        while True:
+            try:
+                statuses, payload = await asyncio.wait_for(subscriber.queue.get(), LIVE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                statuses = payload = None
+
+            # A client too slow to keep up starts over from a fresh snapshot
+            if subscriber.overflowed:
+                yield format_event("reset", {"reason": "overflow"})
+                return
+            if payload is not None:
+                for uid, status in statuses.items():
+                    if status is None:
+                        state.pop(uid, None)
+                    else:
+                        state[uid] = status
+                yield payload
+                continue
+
+            now = time.monotonic()
+            if today() != subscriber.date or now - started_at >= LIVE_MAX_DURATION:
+                yield format_event("reset", {"reason": "expired"})
+                return
+            if now - resynced_at >= LIVE_RESYNC_INTERVAL:
+                resynced_at = now
+                await attendance_cache.ensure_loaded(repo, subscriber.date)
+                if attendance_cache.get_day(subscriber.date) != state:
+                    state, payload = await snapshot(repo, subscriber.date)
+                    yield payload
+                    continue
+            yield ": keep-alive\n\n"
+    finally:
+        unsubscribe(subscriber)
@@ -1,13 +1,14 @@
 import os
-from datetime import datetime, time, timedelta
+from datetime import datetime
 import pytz
 from dotenv import load_dotenv
+import training_schedule
+import network_policy
 
 load_dotenv()
 
 # Constants
 KST = pytz.timezone('Asia/Seoul')
-ALLOWED_IP = os.getenv("ALLOWED_IP", "127.0.0.1")
 
 # Absence thresholds (days since last attendance)
 # 3 weeks + 2 day buffer for weekday gap between training sessions
@@ -18,25 +19,17 @@ ACTIVE_DAYS = 9     #  7 + 2: considered actively attending
 def get_client_ip(request):
     """
     Extracts the real client IP address, handling proxies (X-Forwarded-For).
+    Forwarded hops are only believed through TRUSTED_PROXIES (see network_policy.py).
     """
-    x_forwarded_for = request.headers.get("x-forwarded-for")
-    if x_forwarded_for:
-        # X-Forwarded-For: <client>, <proxy1>, <proxy2>
-        ip = x_forwarded_for.split(",")[0].strip()
-        return ip
-    return request.client.host
+    peer = request.client.host if request.client else None
+    return network_policy.client_ip(peer, request.headers.get("x-forwarded-for"))
 
 def check_ip(client_ip: str) -> bool:
     """
-    Check if the client IP matches the allowed gym IP.
+    Check if the client IP is inside the gym's allowed networks (ALLOWED_IP,
+    addresses or CIDR; localhost always passes for local development).
     """
-    # For local development, allow localhost
-    if client_ip == "127.0.0.1" or client_ip == "::1":
-        return True
-    
-    # Check against allowed IP (supports multiple IPs comma separated if needed)
-    allowed_ips = [ip.strip() for ip in ALLOWED_IP.split(",")]
-    return client_ip in allowed_ips
+    return network_policy.is_allowed(client_ip)
 
 def get_current_kst_time():
     return datetime.now(KST)
@@ -44,47 +37,9 @@ def get_current_kst_time():
 def check_attendance_time():
     """
     Check if the current time is within the attendance window.
+    Session times, holidays and extra sessions live in training_schedule.py.
     Returns:
         status (str): "open", "late", "closed"
         message (str): Description
     """
-    now = get_current_kst_time()
-    weekday = now.weekday() # Monday=0, Sunday=6
-    
-    # Saturday = 5, Sunday = 6
-    if weekday not in [5, 6]:
-        return "closed", "오늘은 훈련일이 아닙니다."
-
-    current_time = now.time()
-    
-    if weekday == 5: # Saturday
-        # 13:00 기준
-        # 출석: 12:45 ~ 13:15 (전후 15분)
-        # 지각: 13:15:01 ~ 15:00 (기준 시간 2시간까지)
-        start_attend = time(12, 45)
-        end_attend = time(13, 16)
-        end_late = time(15, 0)
-        
-        if start_attend <= current_time <= end_attend:
-            return "open", "출석 가능"
-        elif end_attend < current_time <= end_late:
-            return "late", "지각"
-        else:
-            return "closed", "출석 시간이 아닙니다."
-
-    elif weekday == 6: # Sunday
-        # 16:00 기준
-        # 출석: 15:45 ~ 16:15 (전후 15분)
-        # 지각: 16:15:01 ~ 18:00 (기준 시간 2시간까지)
-        start_attend = time(15, 45)
-        end_attend = time(16, 16)
-        end_late = time(18, 0)
-
-        if start_attend <= current_time <= end_attend:
-            return "open", "출석 가능"
-        elif end_attend < current_time <= end_late:
-            return "late", "지각"
-        else:
-            return "closed", "출석 시간이 아닙니다."
-            
-    return "closed", "오류 발생"
+    return training_schedule.window_state(get_current_kst_time())
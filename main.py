@@ -3,12 +3,18 @@ from contextlib import asynccontextmanager
 import os
 from fastapi import FastAPI, Request, HTTPException, Header
 from fastapi.responses import JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from database import initialize_firebase, get_db
-from routers import auth, attendance, views, admin
+import database
+from database import get_repo
+import checkin_queue
+import attendance_cache
+import roster
+import metrics
+import kakao
+import static_assets
+import rate_limit
+from compression import CompressionMiddleware
+from logic import get_current_kst_time
+from routers import auth, attendance, views, admin, images
 
 # Configure structured logging
 logging.basicConfig(
@@ -18,29 +24,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Rate limiter
-limiter = Limiter(key_func=get_remote_address)
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    initialize_firebase()
+    # Startup: the datastore is initialized by the first request that needs it
+    # (database.get_repo), except for surge mode whose flush task needs it now
+    if checkin_queue.SURGE_MODE:
+        await checkin_queue.start(get_repo())
     logger.info("Application started successfully")
     yield
     # Shutdown
+    await checkin_queue.stop()
+    await kakao.close_client()
+    if database.repo:
+        await database.repo.close()
     logger.info("Application shutting down")
 
 
 app = FastAPI(title="Magnus Attendance", lifespan=lifespan)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(CompressionMiddleware)
 
 # Include Routers
 app.include_router(views.router)
 app.include_router(auth.router)
 app.include_router(attendance.router)
 app.include_router(admin.router)
+app.include_router(images.router)
+
+
+# Rate limits (budgets per route, see rate_limit.py)
+@app.exception_handler(rate_limit.RateLimited)
+async def rate_limited_handler(request: Request, exc: rate_limit.RateLimited):
+    logger.warning(f"Rate limit hit on {request.url.path} by {rate_limit.rate_key(request)}")
+    return JSONResponse(
+        status_code=429,
+        content={"message": "요청이 너무 많습니다. 잠시 후 다시 시도해주세요."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 # Global exception handler
@@ -53,11 +73,14 @@ async def global_exception_handler(request: Request, exc: Exception):
 # favicon.png 및 favicon.ico 요청 처리
 @app.get("/favicon.png", include_in_schema=False)
 @app.get("/favicon.ico", include_in_schema=False)
-async def favicon():
-    # static 폴더 안의 로고 파일을 favicon으로 사용합니다.
-    favicon_path = os.path.join(os.path.dirname(__file__), "static", "team-magnus-logo.jpg")
+async def favicon(request: Request):
+    # 로고에서 잘라낸 작은 아이콘 (manage.py build-static), 없으면 로고 원본
+    name = request.url.path.lstrip("/")
+    favicon_path = os.path.join(static_assets.STATIC_DIR, name)
+    if not os.path.exists(favicon_path):
+        favicon_path = os.path.join(static_assets.STATIC_DIR, static_assets.LOGO)
     if os.path.exists(favicon_path):
-        return FileResponse(favicon_path)
+        return FileResponse(favicon_path, headers={"Cache-Control": f"public, max-age={static_assets.ICON_MAX_AGE}"})
     return JSONResponse(status_code=404, content={"message": "Favicon not found"})
 
 
@@ -70,22 +93,34 @@ async def run_cron_job(authorization: str = Header(None)):
         logger.warning("Unauthorized cron attempt")
         raise HTTPException(status_code=401, detail="Unauthorized")
     
-    db = get_db()
-    logger.info("Cron job executed. Server is warmed up.")
+    repo = get_repo()
+
+    # Pre-load today's attendee map and the roster before the training window opens
+    attendees_loaded = 0
+    members_cached = 0
+    if repo:
+        today_str = get_current_kst_time().strftime("%Y-%m-%d")
+        await attendance_cache.ensure_loaded(repo, today_str, force=True)
+        attendees_loaded = len(attendance_cache.get_day(today_str))
+        members_cached = await roster.warm(repo)
+
+    logger.info(f"Cron job executed. Server is warmed up ({attendees_loaded} attendees, {members_cached} members cached).")
     return {
         "ok": True,
         "message": "Server warmed up successfuly",
-        "database": "connected" if db else "disconnected"
+        "database": "connected" if repo else "disconnected",
+        "attendees_loaded": attendees_loaded,
+        "members_cached": members_cached,
     }
 
 
-# Mount static files
-static_path = os.path.join(os.path.dirname(__file__), "static")
+# Mount static files (fingerprinted URLs are cached as immutable, see static_assets.py)
+static_path = static_assets.STATIC_DIR
 try:
     if os.path.exists(static_path):
-        app.mount("/static", StaticFiles(directory=static_path), name="static")
+        app.mount("/static", static_assets.AssetFiles(directory=static_path), name="static")
         logger.info(f"Static files mounted successfully at {static_path}")
     else:
         logger.warning(f"Static directory not found at {static_path}")
 except RuntimeError as e:
-    logger.error(f"Failed to mount static files: {e}")
\ No newline at end of file
+    logger.error(f"Failed to mount static files: {e}")
@@ -0,0 +1,145 @@
+"""
+One-shot maintenance commands.
+
+Usage:
+    python manage.py backfill-summary
+    python manage.py rebuild-leaderboard 2025-03 [2025-04 ...] [--check]
+    python manage.py migrate-attendance-ids [--dry-run]
+    python manage.py import-attendance history.csv [--dry-run]
+    python manage.py compile-templates
+    python manage.py build-static [--icons]
+"""
+import argparse
+import asyncio
+import inspect
+import logging
+import sys
+from database import initialize_firebase, get_repo
+import aggregates
+import attendance_import
+import templating
+import static_assets
+from logic import get_current_kst_time
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+async def backfill_summary(args):
+    initialize_firebase()
+    count = await aggregates.backfill_summaries(get_repo())
+    print(f"Attendance summary written for {count} users.")
+    return 0
+
+
+async def rebuild_leaderboard(args):
+    initialize_firebase()
+    repo = get_repo()
+    total_drift = 0
+
+    for key in args.months:
+        drift = await aggregates.rebuild_leaderboard(repo, key, write=not args.check)
+        total_drift += len(drift)
+        if not drift:
+            print(f"{key}: no drift")
+            continue
+        print(f"{key}: {len(drift)} member(s) drifted")
+        for uid, (stored, actual) in sorted(drift.items()):
+            print(f"  {uid}: stored={stored} actual={actual}")
+
+    if args.check and total_drift:
+        return 1
+    return 0
+
+
+async def migrate_attendance_ids(args):
+    initialize_firebase()
+    repo = get_repo()
+    if not hasattr(repo, "migrate_attendance_ids"):
+        print(f"The {repo.name} backend already keys records by (uid, date); nothing to migrate.")
+        return 0
+    stats = await repo.migrate_attendance_ids(dry_run=args.dry_run)
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"{prefix}Moved {stats['moved']} record(s) to {{uid}}_{{date}} IDs, dropped {stats['duplicates']} duplicate(s).")
+    if stats["duplicates"]:
+        print("Duplicates were removed: run backfill-summary and rebuild-leaderboard for the affected months.")
+    return 0
+
+
+async def import_attendance(args):
+    initialize_firebase()
+    with open(args.path, encoding="utf-8-sig") as f:
+        content = f.read()
+    try:
+        result = await attendance_import.run(get_repo(), content, get_current_kst_time().date(), dry_run=args.dry_run)
+    except attendance_import.InvalidImport as e:
+        print(f"Nothing imported: {e}")
+        for row, message in e.errors:
+            print(f"  row {row}: {message}")
+        return 1
+
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"{prefix}{result['rows']} row(s) over {result['dates']} changed date(s): {result['counts']}")
+    print(result["message"])
+    for date, changes in result.get("changes", {}).items():
+        for uid, change in changes.items():
+            print(f"  {date} {uid}: {change['from']} -> {change['to']}")
+    return 1 if result["counts"]["failed"] else 0
+
+
+def compile_templates(args):
+    count = templating.precompile()
+    print(f"Compiled {count} template(s) into {templating.TEMPLATE_BUNDLE_DIR}.")
+    return 0
+
+
+def build_static(args):
+    if args.icons:
+        written = static_assets.build_icons()
+        print(f"Icons written: {', '.join(written) or 'none changed'}")
+    written = static_assets.build_precompressed()
+    print(f"Precompressed {len(written)} file(s) in {static_assets.STATIC_DIR}.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Magnus Attendance maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("backfill-summary", help="Recompute each member's attendance summary from raw records")
+    p.set_defaults(func=backfill_summary)
+
+    p = subparsers.add_parser("rebuild-leaderboard", help="Recompute monthly leaderboards from raw records and report drift")
+    p.add_argument("months", nargs="+", help="Months to rebuild (YYYY-MM)")
+    p.add_argument("--check", action="store_true", help="Only report drift, do not write")
+    p.set_defaults(func=rebuild_leaderboard)
+
+    p = subparsers.add_parser("migrate-attendance-ids", help="Re-key attendance docs to {uid}_{date} and drop duplicates")
+    p.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    p.set_defaults(func=migrate_attendance_ids)
+
+    p = subparsers.add_parser("import-attendance", help="Import historical attendance from a CSV of uid or nickname, date, status")
+    p.add_argument("path", help="UTF-8 CSV with date, status and uid or nickname columns")
+    p.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    p.set_defaults(func=import_attendance)
+
+    p = subparsers.add_parser("compile-templates", help="Compile templates into the bytecode bundled with the app (run in the deploy build)")
+    p.set_defaults(func=compile_templates)
+
+    p = subparsers.add_parser("build-static", help="Write .br/.gz variants of static text files (run in the deploy build)")
+    p.add_argument("--icons", action="store_true", help="Also regenerate favicons from the logo (needs Pillow)")
+    p.set_defaults(func=build_static)
+
+    args = parser.parse_args(argv)
+    if inspect.iscoroutinefunction(args.func):
+        # One event loop for the whole command: the async Firestore client is bound to the loop it first ran on
+        return asyncio.run(args.func(args))
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
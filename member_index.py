@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import bisect
+import logging
+from datetime import datetime
+from typing import Optional
+import aggregates
+import roster
+import thumbnails
+from logic import DROPOUT_DAYS, WARNING_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Classified member list behind the admin dashboard API. Built from one users
+# listing and reused while the members version, the current month's version
+# (check-ins move last_date) and the day are unchanged, so paging through
+# sections costs one versions read. MEMBER_INDEX_TTL bounds staleness from
+# changes that bump neither (e.g. admin edits to an earlier month elsewhere).
+MEMBER_INDEX_TTL = int(os.getenv("MEMBER_INDEX_TTL", "300"))  # seconds
+
+# pending: awaiting approval; members: everyone approved (withdrawn excluded);
+# dropout / warning / sick: subsets of members
+SECTIONS = ("pending", "dropout", "warning", "sick", "members")
+NO_BATCH = "No Batch"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+_index = None  # {"key", "loaded_at", "members"}
+_load_lock = asyncio.Lock()
+
+
+def member_info(doc_id: str, user_data: dict, today) -> Optional[dict]:
+    """Dashboard fields for a users doc, with its section; None for withdrawn members."""
+    nickname = user_data.get("nickname") or "Unknown"
+    is_auth = user_data.get("is_auth") or user_data.get("status", "approved")
+    if is_auth == "withdrawn":
+        return None
+
+    unnotified_date1 = user_data.get("unnotified_date1", "")
+    unnotified_date2 = user_data.get("unnotified_date2", "")
+    is_sick_leave = user_data.get("is_sick_leave", False)
+
+    unnotified_count = 0
+    if unnotified_date1: unnotified_count += 1
+    if unnotified_date2: unnotified_count += 1
+
+    # Last attendance from the denormalized summary (see aggregates.py)
+    summary = aggregates.get_summary(user_data)
+
+    last_date_str = "Never"
+    days_absent = -1
+
+    if summary["last_date"]:
+        last_date_str = summary["last_date"]
+        last_date = datetime.strptime(last_date_str, "%Y-%m-%d").date()
+        days_absent = (today - last_date).days
+
+    info = {
+        "uid": user_data.get("uid") or doc_id,
+        "nickname": nickname,
+        "initial_nickname": user_data.get("initial_nickname", nickname),
+        "profile_image": thumbnails.profile_url(doc_id, user_data.get("profile_image", "")),
+        "days_absent": days_absent,
+        "last_date": last_date_str,
+        "total_attendance": summary["total"],
+        "late_count": summary["late"],
+        "phone": user_data.get("phone", ""),
+        "batch": user_data.get("batch", ""),
+        "unnotified_date1": unnotified_date1,
+        "unnotified_date2": unnotified_date2,
+        "unnotified_count": unnotified_count,
+        "is_sick_leave": is_sick_leave,
+        "is_auth": is_auth,
+        "section": None,
+        "reason": "",
+    }
+
+    if is_auth == "pending":
+        info["section"] = "pending"
+    elif is_sick_leave:
+        info["section"] = "sick"
+    elif days_absent >= DROPOUT_DAYS or unnotified_count >= 2:
+        # Dropout Criteria (using named constants)
+        reasons = []
+        if days_absent >= DROPOUT_DAYS: reasons.append("장기 결석 (3주+)")
+        if unnotified_count >= 2: reasons.append(f"미통보 불참 2회 ({unnotified_date1}, {unnotified_date2})")
+        info["section"] = "dropout"
+        info["reason"] = " & ".join(reasons)
+    elif days_absent >= WARNING_DAYS:
+        info["section"] = "warning"
+        info["reason"] = "2주 이상 결석"
+
+    return info
+
+
+def _sort_key(info: dict) -> tuple:
+    return (info["nickname"], str(info["uid"]))
+
+
+async def get_members(repo, now) -> list:
+    """All non-withdrawn members as member_info() dicts, sorted by (nickname, uid)."""
+    versions = await repo.get_versions([aggregates.MEMBERS_VERSION, now.strftime("%Y-%m")])
+    key = (now.date().isoformat(), sorted(versions.items()))
+
+    def cached():
+        if _index and _index["key"] == key and time.monotonic() - _index["loaded_at"] < MEMBER_INDEX_TTL:
+            return _index["members"]
+        return None
+
+    members = cached()
+    if members is not None:
+        return members
+
+    # Sections requested together on page load share one listing
+    async with _load_lock:
+        members = cached()
+        if members is not None:
+            return members
+
+        _set_index(key, await repo.list_users(), now.date())
+        return _index["members"]
+
+
+def _set_index(key, users: list, today):
+    global _index
+    members = []
+    for doc_id, user_data in users:
+        roster.prime(doc_id, user_data)
+        info = member_info(doc_id, user_data, today)
+        if info is not None:
+            members.append(info)
+    members.sort(key=_sort_key)
+    _index = {"key": key, "loaded_at": time.monotonic(), "members": members}
+    logger.info(f"Member index built ({len(members)} members)")
+
+
+def invalidate():
+    """Drop the index after a change made in this process (user edit, attendance batch)."""
+    global _index
+    _index = None
+
+
+def _batch_sort_key(name: str) -> str:
+    return "ZZ-ZZ" if name == NO_BATCH else name
+
+
+def summarize(members: list) -> dict:
+    """Section counts and batch names (newest first) with member counts."""
+    counts = dict.fromkeys(SECTIONS, 0)
+    batches = {}
+    for info in members:
+        if info["section"] == "pending":
+            counts["pending"] += 1
+            continue
+        counts["members"] += 1
+        if info["section"]:
+            counts[info["section"]] += 1
+        name = info["batch"] or NO_BATCH
+        batches[name] = batches.get(name, 0) + 1
+
+    return {
+        "counts": counts,
+        "batches": [
+            {"name": name, "count": batches[name]}
+            for name in sorted(batches, key=_batch_sort_key, reverse=True)
+        ],
+    }
+
+
+def filter_members(members: list, section: str, batch: Optional[str] = None, query: Optional[str] = None) -> list:
+    """Members of a section, optionally narrowed to a batch (NO_BATCH for none) and a nickname search."""
+    if section == "members":
+        result = [info for info in members if info["section"] != "pending"]
+    else:
+        result = [info for info in members if info["section"] == section]
+
+    if batch:
+        result = [info for info in result if (info["batch"] or NO_BATCH) == batch]
+    if query:
+        query = query.strip().lower()
+        result = [info for info in result if query in info["nickname"].lower()]
+    return result
+
+
+def encode_cursor(info: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(_sort_key(info), ensure_ascii=False).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        nickname, uid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    return (str(nickname), str(uid))
+
+
+def paginate(members: list, cursor: Optional[str], limit: int) -> tuple:
+    """
+    Keyset page of a sorted member list: the items after the cursor's
+    (nickname, uid), so pages stay stable while members are added or removed.
+    Returns (items, next_cursor or None).
+    """
+    start = 0
+    if cursor:
+        start = bisect.bisect_right([_sort_key(info) for info in members], decode_cursor(cursor))
+    items = members[start:start + limit]
+    has_more = start + limit < len(members)
+    return items, (encode_cursor(items[-1]) if has_more and items else None)
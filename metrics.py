@@ -0,0 +1,233 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Per-request datastore accounting, sent as a Server-Timing header and
+# aggregated per route for /admin/api/metrics. Reads / writes follow
+# Firestore billing (a query bills at least one read) whatever the backend.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+TIMED_SECTIONS = ("storage", "template", "kakao")
+
+
+class RequestMetrics:
+    __slots__ = ("reads", "writes", "queries", "durations", "started")
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.queries = 0
+        self.durations = dict.fromkeys(TIMED_SECTIONS, 0.0)  # seconds
+        self.started = time.perf_counter()
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+_routes = {}  # route path -> totals
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def timed(section: str):
+    """Add the time spent in the block to a section of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_metrics = _current.get()
+        if request_metrics is not None:
+            request_metrics.durations[section] += time.perf_counter() - started
+
+
+# Datastore accounting
+
+def _count_reads(name: str, args: tuple, result) -> int:
+    if name in ("get_user", "get_attendance", "get_leaderboard"):
+        return 1
+    if name in ("get_users", "get_versions"):
+        return len(args[0]) if args else 0
+    if name.startswith("list_"):
+        return max(1, len(result or ()))
+    if name == "record_checkin":
+        return 2  # record + users doc, inside the transaction
+    if name == "record_checkins":
+        records = args[0] if args else []
+        return len(records) + len({r["user_id"] for r in records})
+    return 0
+
+
+def _count_writes(name: str, args: tuple, result) -> int:
+    if name in ("create_user", "update_user", "merge_user"):
+        return 2  # users doc + members version
+    if name in ("set_leaderboard", "touch_user"):
+        return 1
+    if name == "set_summaries":
+        return len(args[0]) if args else 0
+    if name == "record_checkin":
+        return 3 if result else 0  # record, summary, leaderboard
+    if name == "record_checkins":
+        records = args[0] if args else []
+        return result + len({r["user_id"] for r in records}) + len({r["date"][:7] for r in records}) if result else 0
+    if name == "apply_attendance_changes":
+        return len(args[1]) + 1 if len(args) > 1 and args[1] else 0
+    return 0
+
+
+class InstrumentedRepository:
+    """Wraps a repository; every awaited call counts toward the current request."""
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __getattr__(self, name):
+        attr = getattr(self._repo, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            request_metrics = _current.get()
+            if request_metrics is None:
+                return await attr(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = await attr(*args, **kwargs)
+            finally:
+                request_metrics.durations["storage"] += time.perf_counter() - started
+                request_metrics.queries += 1
+            request_metrics.reads += _count_reads(name, args, result)
+            request_metrics.writes += _count_writes(name, args, result)
+            return result
+
+        return call
+
+
+def instrument(repo):
+    return InstrumentedRepository(repo) if METRICS_ENABLED and repo is not None else repo
+
+
+# Server-Timing
+
+def server_timing(request_metrics: RequestMetrics, total: float) -> str:
+    entries = [
+        f'storage;dur={request_metrics.durations["storage"] * 1000:.1f};'
+        f'desc="reads={request_metrics.reads} writes={request_metrics.writes} queries={request_metrics.queries}"'
+    ]
+    for section in TIMED_SECTIONS[1:]:
+        if request_metrics.durations[section]:
+            entries.append(f"{section};dur={request_metrics.durations[section] * 1000:.1f}")
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def parse_server_timing(header: str) -> dict:
+    """
+    Parse this app's Server-Timing header into
+    {"reads", "writes", "queries", "<section>_ms"...}.
+    """
+    parsed = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, *params = [p.strip() for p in entry.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if key == "dur":
+                parsed[f"{name}_ms"] = float(value)
+            elif key == "desc":
+                for item in value.strip('"').split():
+                    counter, _, count = item.partition("=")
+                    if count.isdigit():
+                        parsed[counter] = int(count)
+    return parsed
+
+
+def check_read_budget(response, max_reads: int, max_queries: Optional[int] = None) -> int:
+    """
+    Assert that a response (httpx / TestClient) stayed within a datastore
+    read budget, e.g. check_read_budget(client.get("/"), 4) in a test, and
+    optionally within a number of round trips: listings bill a read per
+    document, so an N+1 lookup shows most clearly as extra queries.
+    Returns the reads made; raises AssertionError over budget.
+    """
+    header = response.headers.get("server-timing")
+    assert header, "No Server-Timing header (METRICS_ENABLED off?)"
+    parsed = parse_server_timing(header)
+    reads = parsed.get("reads", 0)
+    where = f"{response.request.method} {response.request.url.path}"
+    assert reads <= max_reads, f"{where}: {reads} reads, budget {max_reads}"
+    if max_queries is not None:
+        queries = parsed.get("queries", 0)
+        assert queries <= max_queries, f"{where}: {queries} queries, budget {max_queries}"
+    return reads
+
+
+# Per-route aggregation
+
+def _record(route: str, request_metrics: RequestMetrics, total: float):
+    totals = _routes.get(route)
+    if totals is None:
+        totals = _routes[route] = {
+            "requests": 0, "reads": 0, "writes": 0, "queries": 0, "max_reads": 0,
+            "total_ms": 0.0, **{f"{section}_ms": 0.0 for section in TIMED_SECTIONS},
+        }
+    totals["requests"] += 1
+    totals["reads"] += request_metrics.reads
+    totals["writes"] += request_metrics.writes
+    totals["queries"] += request_metrics.queries
+    totals["max_reads"] = max(totals["max_reads"], request_metrics.reads)
+    totals["total_ms"] += total * 1000
+    for section in TIMED_SECTIONS:
+        totals[f"{section}_ms"] += request_metrics.durations[section] * 1000
+
+
+def snapshot() -> dict:
+    """Per-route totals and per-request averages since start (or reset())."""
+    result = {}
+    for route, totals in sorted(_routes.items()):
+        count = totals["requests"]
+        result[route] = {
+            **totals,
+            "avg_reads": totals["reads"] / count,
+            "avg_writes": totals["writes"] / count,
+            "avg_ms": totals["total_ms"] / count,
+        }
+    return result
+
+
+def reset():
+    _routes.clear()
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-request accounting, Server-Timing header, per-route totals."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - request_metrics.started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(request_metrics, total).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            _record(getattr(route, "path", "(unmatched)"), request_metrics, time.perf_counter() - request_metrics.started)
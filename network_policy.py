@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import logging
+import ipaddress
+import threading
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Where check-in is allowed from, as addresses or CIDR networks (IPv4/IPv6):
+# ALLOWED_IP plus an optional JSON file that is re-read when it changes, so
+# adding the backup router's address needs no restart:
+#   {"allowed": ["211.1.2.0/28", "2001:db8::/48"], "trusted_proxies": ["203.0.113.7"]}
+# Client addresses come from X-Forwarded-For only through TRUSTED_PROXIES,
+# walking the chain from the nearest hop (see client_ip). The default trusts
+# loopback and private networks, where a server's own proxy (nginx, a load
+# balancer in the VPC) lives, so clients reaching it directly cannot forge
+# the header. "*" trusts every peer: opt in to it only behind an edge that
+# overwrites X-Forwarded-For and whose addresses are not published (Vercel).
+ALLOWED_IP = os.getenv("ALLOWED_IP", "127.0.0.1")
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "127.0.0.0/8, ::1/128, 10.0.0.0/8, 172.16.0.0/12, 192.168.0.0/16, fc00::/7")
+NETWORK_POLICY_FILE = os.getenv("NETWORK_POLICY_FILE", "")
+RELOAD_INTERVAL = float(os.getenv("NETWORK_POLICY_RELOAD", "5"))  # seconds between file checks
+
+# Local development always passes (from a loopback peer; see client_ip)
+LOOPBACK = ("127.0.0.0/8", "::1/128")
+# "*" in a list stands for every address
+ANY = ("0.0.0.0/0", "::/0")
+
+
+def _split(value: str) -> list:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _expand(entries: list) -> list:
+    expanded = []
+    for entry in entries:
+        expanded.extend(ANY if str(entry).strip() == "*" else [entry])
+    return expanded
+
+
+class PrefixSet:
+    """
+    Networks compiled to {prefix length: set of masked addresses} per IP
+    version. A lookup masks the address once per distinct prefix length, so it
+    costs the same for 3 rules or 3000.
+    """
+
+    def __init__(self, networks=()):
+        self._prefixes = {4: {}, 6: {}}
+        self.size = 0
+        for network in ipaddress.collapse_addresses(n for n in networks if n.version == 4):
+            self._add(network)
+        for network in ipaddress.collapse_addresses(n for n in networks if n.version == 6):
+            self._add(network)
+        # Longest prefixes first; any match will do, but hosts are the common case
+        self._lookup = {
+            version: sorted(
+                ((length, (-1 << (bits - length)) & ((1 << bits) - 1), frozenset(values)) for length, values in by_length.items()),
+                reverse=True,
+            )
+            for (version, by_length), bits in zip(self._prefixes.items(), (32, 128))
+        }
+
+    def _add(self, network):
+        self._prefixes[network.version].setdefault(network.prefixlen, set()).add(int(network.network_address))
+        self.size += 1
+
+    @staticmethod
+    def parse(entries) -> "PrefixSet":
+        """From strings like '211.1.2.3' or '211.1.2.0/24'. Raises ValueError naming a bad entry."""
+        networks = []
+        for entry in entries:
+            try:
+                networks.append(ipaddress.ip_network(entry, strict=False))
+            except ValueError as e:
+                raise ValueError(f"Invalid network {entry!r}: {e}") from e
+        return PrefixSet(networks)
+
+    def __contains__(self, address) -> bool:
+        if address is None:
+            return False
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        value = int(address)
+        for _, mask, values in self._lookup[address.version]:
+            if value & mask in values:
+                return True
+        return False
+
+
+@lru_cache(maxsize=4096)
+def parse_address(value: Optional[str]):
+    """
+    ip_address() that returns None instead of raising (also strips an IPv6
+    zone). Cached: parsing costs more than the lookup, and the same few
+    addresses (the gym's, the proxies') come back on every request.
+    """
+    if not value:
+        return None
+    try:
+        return ipaddress.ip_address(value.strip().split("%")[0])
+    except ValueError:
+        return None
+
+
+class Policy(NamedTuple):
+    allowed: PrefixSet
+    trusted_proxies: PrefixSet
+
+
+def build_policy(allowed: list, trusted_proxies: list) -> Policy:
+    return Policy(PrefixSet.parse(_expand([*LOOPBACK, *allowed])), PrefixSet.parse(_expand(trusted_proxies)))
+
+
+def _valid(entries: list) -> list:
+    """Entries that parse ("*" expanded); the others are logged and skipped."""
+    valid = []
+    for entry in _expand(entries):
+        try:
+            ipaddress.ip_network(str(entry), strict=False)
+        except ValueError as e:
+            logger.error(f"Ignoring invalid network policy entry {entry!r}: {e}")
+            continue
+        valid.append(str(entry))
+    return valid
+
+
+def _read_file(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must hold a JSON object")
+    return {"allowed": list(data.get("allowed", [])), "trusted_proxies": list(data.get("trusted_proxies", []))}
+
+
+_policy = None
+_file_mtime = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _load(force: bool = False) -> Policy:
+    global _policy, _file_mtime, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _policy is not None and not force and now - _checked_at < RELOAD_INTERVAL:
+            return _policy
+        _checked_at = now
+
+        mtime = None
+        if NETWORK_POLICY_FILE:
+            try:
+                mtime = os.stat(NETWORK_POLICY_FILE).st_mtime_ns
+            except OSError:
+                mtime = None
+        if _policy is not None and not force and mtime == _file_mtime:
+            return _policy
+
+        extra = {"allowed": [], "trusted_proxies": []}
+        if mtime is not None:
+            try:
+                extra = _read_file(NETWORK_POLICY_FILE)
+            except (OSError, ValueError) as e:
+                _file_mtime = mtime
+                if _policy is not None:
+                    # Keep serving the last good policy rather than locking everyone out
+                    logger.error(f"Network policy not reloaded, keeping the previous one: {e}")
+                    return _policy
+                logger.error(f"Network policy file not loaded: {e}")
+
+        policy = build_policy(
+            _valid(_split(ALLOWED_IP) + extra["allowed"]),
+            _valid(_split(TRUSTED_PROXIES) + extra["trusted_proxies"]),
+        )
+        if _policy is not None:
+            logger.info(f"Network policy reloaded: {policy.allowed.size} allowed network(s), {policy.trusted_proxies.size} trusted proxy network(s)")
+        _policy, _file_mtime = policy, mtime
+        return _policy
+
+
+def get_policy() -> Policy:
+    """The current policy, re-checking NETWORK_POLICY_FILE at most every RELOAD_INTERVAL."""
+    return _load()
+
+
+def reload() -> Policy:
+    return _load(force=True)
+
+
+def client_ip(peer: Optional[str], forwarded_for: Optional[str], policy: Optional[Policy] = None) -> Optional[str]:
+    """
+    The client address: X-Forwarded-For is walked from the nearest hop back
+    while each hop is a trusted proxy; the first untrusted address is the
+    client. A header from an untrusted peer is ignored, as anyone can send one.
+    A forwarded loopback address is only believed from a loopback peer, since
+    loopback is always allowed to check in.
+    """
+    policy = policy or get_policy()
+    peer_address = parse_address(peer)
+    if peer is not None and peer_address not in policy.trusted_proxies:
+        return peer
+    if not forwarded_for:
+        return peer
+
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    client = hops[0] if hops else peer  # every hop a proxy: the leftmost is the closest we get
+    for hop in reversed(hops):
+        address = parse_address(hop)
+        if address is None or address not in policy.trusted_proxies:
+            # The first untrusted (or garbled) hop: nothing further left can be trusted
+            client = hop
+            break
+    # A forged "127.0.0.1" would otherwise pass is_allowed
+    if _is_loopback(parse_address(client)) and not _is_loopback(peer_address):
+        return peer
+    return client
+
+
+def _is_loopback(address) -> bool:
+    if address is not None and address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address is not None and address.is_loopback
+
+
+def is_allowed(ip: Optional[str], policy: Optional[Policy] = None) -> bool:
+    return parse_address(ip) in (policy or get_policy()).allowed
@@ -0,0 +1,215 @@
+import os
+import asyncio
+import time
+import math
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from fastapi import Request
+from dependencies import get_current_user_uid
+from logic import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+# One limiter for the app. Requests are counted per member (the verified
+# session UID) and per client IP only before login: at the gym every member
+# shares the ALLOWED_IP address, so an IP budget would throttle the whole club
+# at once. Counting uses a sliding window (this window's count plus the
+# previous window's, weighted by how much of it still overlaps), which needs
+# two counters per key instead of a timestamp per request.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory")  # memory | sqlite
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "rate_limits.sqlite3")
+MAX_KEYS = 10000  # memory store: least recently seen keys are dropped beyond this
+
+# Per-route budgets: (requests, window in seconds). RATE_LIMITS overrides
+# them, e.g. RATE_LIMITS="attendance=20/minute,login=60/minute"
+BUDGETS = {
+    "login": (30, 60),       # per IP: members log in together from the gym network
+    "kakao_callback": (30, 60),
+    "attendance": (10, 60),  # per member
+}
+
+SECOND_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimited(Exception):
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"Rate limit exceeded for {name}")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def parse_budget(value: str) -> tuple:
+    """'10/minute' or '100/2 hours' -> (10, 60) / (100, 7200)."""
+    count, _, period = value.partition("/")
+    amount, _, unit = period.strip().partition(" ")
+    if not unit:
+        amount, unit = "1", amount
+    unit = unit.strip().lower().rstrip("s")
+    if unit not in SECOND_UNITS:
+        raise ValueError(f"Unknown rate limit period: {value}")
+    return int(count), int(amount) * SECOND_UNITS[unit]
+
+
+def _weighted(current: int, previous: int, elapsed: float, window: int) -> float:
+    return current + previous * (1 - elapsed / window)
+
+
+def _retry_after(count: int, current: int, previous: int, elapsed: float, window: int) -> int:
+    """Seconds until the weighted count drops below the budget again."""
+    if previous and current < count:
+        # The previous window's share shrinks as time passes
+        needed = 1 - (count - current) / previous
+        return max(1, math.ceil(needed * window - elapsed))
+    return max(1, math.ceil(window - elapsed))
+
+
+class MemoryStore:
+    """Per-process counters, bounded to MAX_KEYS keys."""
+
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self.max_keys = max_keys
+        self._windows = OrderedDict()  # key -> [window start, current count, previous count]
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, count: int, window: int, now: float) -> int:
+        """Count a request; returns 0 if allowed, else seconds to wait."""
+        start = now - now % window
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None or entry[0] < start - window:
+                entry = [start, 0, 0]
+            elif entry[0] < start:
+                entry = [start, 0, entry[1]]
+            self._windows[key] = entry
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+
+            elapsed = now - start
+            if _weighted(entry[1], entry[2], elapsed, window) >= count:
+                return _retry_after(count, entry[1], entry[2], elapsed, window)
+            entry[1] += 1
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+
+class SQLiteStore:
+    """
+    Counters in a local SQLite file, shared by the worker processes of one host.
+    A hit may wait up to 5 seconds for another worker's lock on the file, so it
+    runs in an asyncio.to_thread() worker rather than on the event loop.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5)
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, window_start REAL NOT NULL, current INTEGER NOT NULL, previous INTEGER NOT NULL)"
+        )
+
+    async def hit(self, key: str, count: int, window: int, now: float) -> int:
+        return await asyncio.to_thread(self._hit, key, count, window, now)
+
+    def _hit(self, key: str, count: int, window: int, now: float) -> int:
+        start = now - now % window
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT window_start, current, previous FROM rate_limits WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[0] < start - window:
+                    current, previous = 0, 0
+                elif row[0] < start:
+                    current, previous = 0, row[1]
+                else:
+                    current, previous = row[1], row[2]
+
+                elapsed = now - start
+                allowed = _weighted(current, previous, elapsed, window) < count
+                if allowed:
+                    current += 1
+                self._conn.execute(
+                    "INSERT INTO rate_limits (key, window_start, current, previous) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET window_start = excluded.window_start, "
+                    "current = excluded.current, previous = excluded.previous",
+                    (key, start, current, previous),
+                )
+                # Keys idle for a day are of no use to any window
+                if allowed and current == 1:
+                    self._conn.execute("DELETE FROM rate_limits WHERE window_start < ?", (now - 86400,))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return 0 if allowed else _retry_after(count, current, previous, elapsed, window)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limits")
+
+
+def create_store(kind: str = RATE_LIMIT_STORAGE):
+    if kind == "sqlite":
+        return SQLiteStore(RATE_LIMIT_SQLITE_PATH)
+    if kind != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_STORAGE {kind!r}, using memory")
+    return MemoryStore()
+
+
+def rate_key(request: Request) -> str:
+    """The member's UID when the session cookie verifies, else the client IP."""
+    uid = get_current_user_uid(request)
+    if uid:
+        return f"uid:{uid}"
+    return f"ip:{get_client_ip(request)}"
+
+
+class Limiter:
+    def __init__(self, budgets: dict, store=None):
+        self.budgets = dict(budgets)
+        self.store = store
+        self.enabled = RATE_LIMIT_ENABLED
+
+    def use_store(self, store):
+        """Swap the counter store, e.g. for one shared by every instance. Needs an async hit(key, count, window, now)."""
+        self.store = store
+
+    def limit(self, name: str):
+        """FastAPI dependency enforcing the budget registered under name."""
+        if name not in self.budgets:
+            raise KeyError(f"No rate limit budget named {name!r}")
+
+        async def check(request: Request):
+            if not self.enabled:
+                return
+            if self.store is None:
+                self.store = create_store()
+            count, window = self.budgets[name]
+            retry_after = await self.store.hit(f"{name}:{rate_key(request)}", count, window, time.time())
+            if retry_after:
+                raise RateLimited(name, retry_after)
+
+        return check
+
+
+def parse_overrides(value: str) -> dict:
+    budgets = {}
+    for item in value.split(","):
+        name, _, budget = item.partition("=")
+        if name.strip():
+            budgets[name.strip()] = parse_budget(budget)
+    return budgets
+
+
+limiter = Limiter({**BUDGETS, **parse_overrides(os.getenv("RATE_LIMITS", ""))})
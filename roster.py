@@ -0,0 +1,73 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# In-process cache of the member fields shown in rankings
+ROSTER_FIELDS = ("nickname", "profile_image", "is_auth")
+ROSTER_TTL = int(os.getenv("ROSTER_CACHE_TTL", "300"))  # seconds
+
+_cache = {}  # uid -> (expires_at, entry)
+_lock = threading.Lock()
+
+
+def _entry(user_data: dict) -> dict:
+    return {field: user_data.get(field) for field in ROSTER_FIELDS}
+
+
+async def get_members(repo, uids) -> dict:
+    """
+    Return {uid: {nickname, profile_image, is_auth}} for the given uids.
+    Cache misses are fetched with a single batched repo.get_users() call.
+    Unknown users map to an empty dict.
+    """
+    now = time.monotonic()
+    result = {}
+    missing = []
+
+    with _lock:
+        for uid in uids:
+            cached = _cache.get(uid)
+            if cached and cached[0] > now:
+                result[uid] = cached[1]
+            else:
+                missing.append(uid)
+
+    if missing and repo:
+        fetched = {uid: _entry(user_data) for uid, user_data in (await repo.get_users(missing)).items()}
+
+        expires_at = time.monotonic() + ROSTER_TTL
+        with _lock:
+            for uid in missing:
+                entry = fetched.get(uid, {})
+                _cache[uid] = (expires_at, entry)
+                result[uid] = entry
+
+    return result
+
+
+def prime(uid: str, user_data: dict):
+    """Store a member read elsewhere (e.g. a full users stream) in the cache."""
+    with _lock:
+        _cache[uid] = (time.monotonic() + ROSTER_TTL, _entry(user_data))
+
+
+async def warm(repo) -> int:
+    """Load every member into the cache with one users listing. Returns members cached."""
+    users = await repo.list_users()
+    for uid, user_data in users:
+        prime(uid, user_data)
+    return len(users)
+
+
+def invalidate(uid: str):
+    """Drop a member from the cache after their users doc changed."""
+    with _lock:
+        _cache.pop(uid, None)
+
+
+def clear():
+    with _lock:
+        _cache.clear()
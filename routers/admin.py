@@ -2,22 +2,26 @@ import os
 import re
 import logging
 from datetime import datetime, timedelta
-from typing import List
-from fastapi import APIRouter, Request, HTTPException, Depends, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from typing import List, Optional
+from fastapi import APIRouter, Request, HTTPException, Depends, Form, File, UploadFile
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from database import get_db
-from logic import get_current_kst_time, DROPOUT_DAYS, WARNING_DAYS
+from database import get_repo
+from templating import get_templates
+import aggregates
+import roster
+import member_index
+import exports
+import attendance_import
+import attendance_cache
+import live_board
+import metrics
+from logic import get_current_kst_time
 from dependencies import get_current_user_uid, require_admin, ADMIN_UIDS
-from google.cloud.firestore_v1.base_query import FieldFilter
-from firebase_admin import firestore
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
-
 
 class BatchAttendanceRequest(BaseModel):
     date: str
@@ -27,62 +31,173 @@ class BatchAttendanceRequest(BaseModel):
 
 @router.get("/admin/api/attendance/daily")
 async def get_daily_attendance(request: Request, date: str, admin_uid: str = Depends(require_admin)):
-    db = get_db()
-    if not db:
+    repo = get_repo()
+    if not repo:
         return JSONResponse(status_code=500, content={"message": "Database error"})
 
-    docs = db.collection("attendance").where(filter=FieldFilter("date", "==", date)).stream()
-
     result = {}
-    for doc in docs:
-        data = doc.to_dict()
+    for data in await repo.list_attendance_by_date(date):
         result[data['user_id']] = data['status']
 
     return JSONResponse(result)
 
 
+def _today() -> str:
+    return get_current_kst_time().strftime("%Y-%m-%d")
+
+
+@router.get("/admin/api/attendance/live")
+async def live_attendance(request: Request, admin_uid: str = Depends(require_admin)):
+    # Server-Sent Events: today's snapshot, then deltas as check-ins commit (see live_board.py)
+    repo = get_repo()
+    if not repo:
+        return JSONResponse(status_code=500, content={"message": "Database error"})
+
+    subscriber = live_board.subscribe(_today())
+    if subscriber is None:
+        return JSONResponse(status_code=503, content={"message": "Too many live connections"})
+
+    return StreamingResponse(
+        live_board.stream(repo, subscriber, _today),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/admin/api/attendance/batch")
 async def batch_update_attendance(request: Request, payload: BatchAttendanceRequest, admin_uid: str = Depends(require_admin)):
     # CSRF check
     if request.headers.get("X-Requested-With") != "XMLHttpRequest":
         return JSONResponse(status_code=403, content={"message": "잘못된 요청입니다."})
 
-    db = get_db()
-    if not db:
+    repo = get_repo()
+    if not repo:
         return JSONResponse(status_code=500, content={"message": "Database error"})
 
-    updated_count = 0
-
-    for uid in payload.user_ids:
-        docs = (
-            db.collection("attendance")
-            .where(filter=FieldFilter("user_id", "==", uid))
-            .where(filter=FieldFilter("date", "==", payload.date))
-            .limit(1)
-            .stream()
-        )
-        existing_doc = next(docs, None)
-
-        if payload.status == 'absent':
-            if existing_doc:
-                existing_doc.reference.delete()
-                updated_count += 1
+    if payload.status not in ('present', 'late', 'absent'):
+        return JSONResponse(status_code=400, content={"message": "Invalid status"})
+    try:
+        datetime.strptime(payload.date, "%Y-%m-%d")
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid date"})
+
+    # 1. One query for the date's records, diffed against the payload in memory
+    existing = {}
+    for data in await repo.list_attendance_by_date(payload.date):
+        existing[data.get('user_id')] = data.get('status')
+
+    new_status = None if payload.status == 'absent' else payload.status
+    results = {}
+    changes = {}  # uid -> (old_status, new_status)
+
+    for uid in dict.fromkeys(payload.user_ids):
+        old_status = existing.get(uid)
+        if old_status == new_status:
+            results[uid] = "unchanged"
         else:
-            if existing_doc:
-                if existing_doc.to_dict().get('status') != payload.status:
-                    existing_doc.reference.update({"status": payload.status})
-                    updated_count += 1
-            else:
-                new_data = {
-                    "user_id": uid,
-                    "date": payload.date,
-                    "timestamp": firestore.SERVER_TIMESTAMP,
-                    "status": payload.status
-                }
-                db.collection("attendance").add(new_data)
-                updated_count += 1
+            changes[uid] = (old_status, new_status)
 
-    return JSONResponse(status_code=200, content={"message": f"Processed {updated_count} updates."})
+    # A month never built (e.g. before the leaderboard existed) would otherwise end up with counters for these members only
+    month = aggregates.month_key(payload.date)
+    unbuilt = bool(changes) and await repo.get_leaderboard(month) is None
+
+    # 2. Commit in chunked atomic batches; each chunk carries its own leaderboard delta
+    committed = await repo.apply_attendance_changes(payload.date, changes)
+    summary_changes = {}
+
+    for uid, (old_status, status) in changes.items():
+        if not committed.get(uid):
+            results[uid] = "failed"
+            continue
+        if status is None:
+            results[uid] = "deleted"
+        elif old_status is None:
+            results[uid] = "created"
+        else:
+            results[uid] = "updated"
+        summary_changes[uid] = (old_status, status)
+        attendance_cache.mark(uid, payload.date, status)
+    if unbuilt and summary_changes:
+        await aggregates.rebuild_leaderboard(repo, month, write=True)
+
+    # 3. Member summaries for the committed changes. Attendance and the leaderboard are already
+    # committed at this point, so a failure here is reported rather than failing the request
+    summaries_stale = False
+    try:
+        await aggregates.apply_changes(repo, payload.date, summary_changes)
+    except Exception as e:
+        logger.error(f"Attendance summaries not updated for {payload.date} ({len(summary_changes)} member(s)): {e}")
+        summaries_stale = True
+    if summary_changes:
+        member_index.invalidate()
+        await live_board.publish(repo, payload.date, {uid: status for uid, (_, status) in summary_changes.items()})
+
+    counts = {outcome: 0 for outcome in ("created", "updated", "deleted", "unchanged", "failed")}
+    for outcome in results.values():
+        counts[outcome] += 1
+
+    updated_count = counts["created"] + counts["updated"] + counts["deleted"]
+    status_code = 500 if counts["failed"] and not updated_count else 200
+    message = f"Processed {updated_count} updates."
+    if summaries_stale:
+        message += " Member summaries were not updated: run `python manage.py backfill-summary`."
+    return JSONResponse(status_code=status_code, content={
+        "message": message,
+        "counts": counts,
+        "results": results,
+        "summaries_stale": summaries_stale,
+    })
+
+
+@router.post("/admin/api/attendance/import")
+async def import_attendance(
+    request: Request,
+    file: UploadFile = File(...),
+    dry_run: bool = Form(False),
+    admin_uid: str = Depends(require_admin),
+):
+    # CSRF check
+    if request.headers.get("X-Requested-With") != "XMLHttpRequest":
+        return JSONResponse(status_code=403, content={"message": "잘못된 요청입니다."})
+
+    repo = get_repo()
+    if not repo:
+        return JSONResponse(status_code=500, content={"message": "Database error"})
+
+    try:
+        content = (await file.read()).decode("utf-8")
+    except UnicodeDecodeError:
+        return JSONResponse(status_code=400, content={"message": "File must be UTF-8 CSV"})
+
+    # Every row is validated before anything is written
+    try:
+        result = await attendance_import.run(repo, content, get_current_kst_time().date(), dry_run=dry_run)
+    except attendance_import.InvalidImport as e:
+        return JSONResponse(status_code=400, content={
+            "message": str(e),
+            "errors": [{"row": row, "message": message} for row, message in e.errors],
+        })
+
+    counts = result["counts"]
+    status_code = 500 if counts["failed"] and not (counts["created"] + counts["updated"] + counts["deleted"]) else 200
+    logger.info(f"Attendance import by {admin_uid} (dry_run={dry_run}): {counts}")
+    return JSONResponse(status_code=status_code, content=result)
+
+
+@router.get("/admin/api/metrics")
+async def get_metrics(request: Request, admin_uid: str = Depends(require_admin)):
+    # Per-route datastore reads/writes and time split since start (see metrics.py)
+    return JSONResponse({"enabled": metrics.METRICS_ENABLED, "routes": metrics.snapshot()})
+
+
+@router.post("/admin/api/metrics/reset")
+async def reset_metrics(request: Request, admin_uid: str = Depends(require_admin)):
+    # CSRF check
+    if request.headers.get("X-Requested-With") != "XMLHttpRequest":
+        return JSONResponse(status_code=403, content={"message": "잘못된 요청입니다."})
+
+    metrics.reset()
+    return JSONResponse(status_code=200, content={"message": "Metrics reset."})
 
 
 @router.post("/admin/api/user/delete")
@@ -91,12 +206,13 @@ async def delete_user(request: Request, uid: str = Form(...), admin_uid: str = D
     if request.headers.get("X-Requested-With") != "XMLHttpRequest":
         return JSONResponse(status_code=403, content={"message": "잘못된 요청입니다."})
 
-    db = get_db()
-    if not db:
+    repo = get_repo()
+    if not repo:
         return JSONResponse(status_code=500, content={"message": "Database error"})
 
-    user_ref = db.collection("users").document(uid)
-    user_ref.update({"is_auth": "withdrawn"})
+    await repo.update_user(uid, {"is_auth": "withdrawn"})
+    roster.invalidate(uid)
+    member_index.invalidate()
 
     return JSONResponse(status_code=200, content={"message": "User moved to withdrawn list."})
 
@@ -118,8 +234,8 @@ async def update_user_info(
     if request.headers.get("X-Requested-With") != "XMLHttpRequest":
         return JSONResponse(status_code=403, content={"message": "잘못된 요청입니다."})
 
-    db = get_db()
-    if not db:
+    repo = get_repo()
+    if not repo:
         return JSONResponse(status_code=500, content={"message": "Database error"})
 
     update_data = {
@@ -164,155 +280,116 @@ async def update_user_info(
         update_data["batch"] = ""
 
     if update_data:
-        user_ref = db.collection("users").document(uid)
-        user_ref.set(update_data, merge=True)
+        await repo.merge_user(uid, update_data)
+        roster.invalidate(uid)
+        member_index.invalidate()
         return JSONResponse(status_code=200, content={"message": "Updated successfully", "data": update_data})
 
     return JSONResponse(status_code=200, content={"message": "No changes made"})
 
 
+@router.get("/admin/api/members/summary")
+async def get_members_summary(request: Request, admin_uid: str = Depends(require_admin)):
+    repo = get_repo()
+    if not repo:
+        return JSONResponse(status_code=500, content={"message": "Database error"})
+
+    members = await member_index.get_members(repo, get_current_kst_time())
+    return JSONResponse(member_index.summarize(members))
+
+
+@router.get("/admin/api/members")
+async def list_members(
+    request: Request,
+    section: str = "members",
+    batch: Optional[str] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = member_index.DEFAULT_PAGE_SIZE,
+    admin_uid: str = Depends(require_admin),
+):
+    if section not in member_index.SECTIONS:
+        return JSONResponse(status_code=400, content={"message": "Invalid section"})
+
+    repo = get_repo()
+    if not repo:
+        return JSONResponse(status_code=500, content={"message": "Database error"})
+
+    members = member_index.filter_members(await member_index.get_members(repo, get_current_kst_time()), section, batch, q)
+    limit = max(1, min(limit, member_index.MAX_PAGE_SIZE))
+    try:
+        items, next_cursor = member_index.paginate(members, cursor, limit)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid cursor"})
+
+    return JSONResponse({"items": items, "next_cursor": next_cursor, "total": len(members)})
+
+
+@router.get("/admin/api/export/attendance")
+async def export_attendance(
+    request: Request,
+    start: str,
+    end: str,
+    uid: Optional[str] = None,
+    batch: Optional[str] = None,
+    format: str = "csv",
+    admin_uid: str = Depends(require_admin),
+):
+    # Validate everything before the response starts streaming
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end, "%Y-%m-%d").date()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid date (YYYY-MM-DD)"})
+    if start_date > end_date:
+        return JSONResponse(status_code=400, content={"message": "start is after end"})
+    if format not in exports.FORMATS:
+        return JSONResponse(status_code=400, content={"message": "Invalid format (csv, arrow, parquet)"})
+    if format != "csv" and not exports.columnar_available():
+        return JSONResponse(status_code=400, content={"message": f"{format} export requires pyarrow"})
+
+    repo = get_repo()
+    if not repo:
+        return JSONResponse(status_code=500, content={"message": "Database error"})
+
+    pages = exports.iter_rows(repo, start, end, uid=uid or None, batch=batch or None)
+    body = exports.csv_stream(pages) if format == "csv" else exports.columnar_stream(pages, format)
+    media_type, extension = exports.FORMATS[format]
+    logger.info(f"Attendance export {start}..{end} (uid={uid}, batch={batch}, format={format}) by {admin_uid}")
+
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="attendance_{start}_{end}.{extension}"',
+        "Cache-Control": "no-store",
+    })
+
+
 @router.get("/admin", response_class=HTMLResponse)
 async def admin_dashboard(request: Request):
     uid = get_current_user_uid(request)
     if not uid or uid not in ADMIN_UIDS:
         return RedirectResponse("/")
 
-    db = get_db()
-    if not db:
+    repo = get_repo()
+    if not repo:
         return HTMLResponse("Database Error", status_code=500)
 
-    users_ref = db.collection("users").stream()
-    warning_list = []
-    dropout_list = []
-    sick_list = []
-    all_users_list = []
-    pending_list = []
-
-    now = get_current_kst_time()
-    today = now.date()
-
-    for user_doc in users_ref:
-        user_data = user_doc.to_dict()
-        user_id = user_data.get("uid")
-        nickname = user_data.get("nickname", "Unknown")
-        initial_nickname = user_data.get("initial_nickname", nickname)
-        phone = user_data.get("phone", "")
-        batch = user_data.get("batch", "")
-        profile_image = user_data.get("profile_image", "")
-
-        is_auth = user_data.get("is_auth") or user_data.get("status", "approved")
-
-        unnotified_date1 = user_data.get("unnotified_date1", "")
-        unnotified_date2 = user_data.get("unnotified_date2", "")
-        is_sick_leave = user_data.get("is_sick_leave", False)
-
-        unnotified_count = 0
-        if unnotified_date1: unnotified_count += 1
-        if unnotified_date2: unnotified_count += 1
-
-        # Get last attendance
-        last_attend_doc = (
-            db.collection("attendance")
-            .where(filter=FieldFilter("user_id", "==", user_id))
-            .order_by("date", direction="DESCENDING")
-            .limit(1)
-            .stream()
-        )
-
-        last_date_str = "Never"
-        days_absent = -1
-
-        last_attend_list = list(last_attend_doc)
-        if last_attend_list:
-            data = last_attend_list[0].to_dict()
-            last_date_str = data['date']
-            last_date = datetime.strptime(last_date_str, "%Y-%m-%d").date()
-            days_absent = (today - last_date).days
-
-        user_info = {
-            "uid": user_id,
-            "nickname": nickname,
-            "initial_nickname": initial_nickname,
-            "profile_image": profile_image,
-            "days_absent": days_absent,
-            "last_date": last_date_str,
-            "phone": phone,
-            "batch": batch,
-            "unnotified_date1": unnotified_date1,
-            "unnotified_date2": unnotified_date2,
-            "unnotified_count": unnotified_count,
-            "is_sick_leave": is_sick_leave,
-            "is_auth": is_auth
-        }
-
-        if is_auth == 'pending':
-            pending_list.append(user_info)
-            continue
-
-        if is_auth == 'withdrawn':
-            continue
-
-        all_users_list.append(user_info)
-
-        if is_sick_leave:
-            sick_list.append(user_info)
-        else:
-            # Dropout Criteria (using named constants)
-            if days_absent >= DROPOUT_DAYS or unnotified_count >= 2:
-                reasons = []
-                if days_absent >= DROPOUT_DAYS: reasons.append("장기 결석 (3주+)")
-                if unnotified_count >= 2: reasons.append(f"미통보 불참 2회 ({unnotified_date1}, {unnotified_date2})")
-                user_info['reason'] = " & ".join(reasons)
-                dropout_list.append(user_info)
-            elif days_absent >= WARNING_DAYS:
-                user_info['reason'] = "2주 이상 결석"
-                warning_list.append(user_info)
-
-    # Sorting
-    dropout_list.sort(key=lambda x: x['nickname'])
-    warning_list.sort(key=lambda x: x['nickname'])
-    sick_list.sort(key=lambda x: x['nickname'])
-    all_users_list.sort(key=lambda x: x['nickname'])
-    pending_list.sort(key=lambda x: x['nickname'])
-
-    # Group by Batch
-    batch_groups = {}
-    for user in all_users_list:
-        b = user.get('batch') or "No Batch"
-        if b not in batch_groups:
-            batch_groups[b] = []
-        batch_groups[b].append(user)
-
-    def batch_sort_key(b_key):
-        if b_key == "No Batch":
-            return "ZZ-ZZ"
-        return b_key
-
-    batch_list = []
-    sorted_keys = sorted(batch_groups.keys(), key=batch_sort_key, reverse=True)
-
-    for key in sorted_keys:
-        batch_list.append({
-            "name": key,
-            "users": sorted(batch_groups[key], key=lambda u: u['nickname']),
-            "count": len(batch_groups[key])
-        })
+    # Only the section counts are rendered; the lists load lazily from
+    # /admin/api/members, so the page stays small as the club grows
+    summary = member_index.summarize(await member_index.get_members(repo, get_current_kst_time()))
+    counts = summary["counts"]
 
     context = {
         "request": request,
         "uid": uid,
         "is_admin_page": True,
         "is_admin_user": True,
-        "warning_list": warning_list,
-        "dropout_list": dropout_list,
-        "sick_list": sick_list,
-        "all_users_list": all_users_list,
-        "pending_list": pending_list,
-        "batch_list": batch_list,
-        "total_warning": len(warning_list),
-        "total_dropout": len(dropout_list),
-        "total_sick": len(sick_list),
-        "total_users": len(all_users_list),
-        "total_pending": len(pending_list)
+        "batch_list": summary["batches"],
+        "page_size": member_index.DEFAULT_PAGE_SIZE,
+        "total_warning": counts["warning"],
+        "total_dropout": counts["dropout"],
+        "total_sick": counts["sick"],
+        "total_users": counts["members"],
+        "total_pending": counts["pending"]
     }
-    return templates.TemplateResponse("admin/dashboard.html", context)
+    with metrics.timed("template"):
+        return get_templates().TemplateResponse("admin/dashboard.html", context)
@@ -1,22 +1,22 @@
 import logging
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import JSONResponse
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from database import get_db
+from database import get_repo
+from storage import SERVER_TIMESTAMP
+import aggregates
+import checkin_queue
+import attendance_cache
+import live_board
+from rate_limit import limiter
 from logic import check_ip, check_attendance_time, get_current_kst_time, get_client_ip
 from dependencies import get_current_user_uid, require_authenticated
-from firebase_admin import firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
 
 
-@router.post("/attendance")
-@limiter.limit("10/minute")
+@router.post("/attendance", dependencies=[Depends(limiter.limit("attendance"))])
 async def mark_attendance(request: Request, uid: str = Depends(require_authenticated)):
     # 1. CSRF check: require custom header from JS fetch
     if request.headers.get("X-Requested-With") != "XMLHttpRequest":
@@ -32,37 +32,39 @@ async def mark_attendance(request: Request, uid: str = Depends(require_authentic
     if status == "closed":
         return JSONResponse(status_code=400, content={"message": message})
 
-    # 4. Check Duplicate Attendance (Today)
-    db = get_db()
-    if not db:
+    repo = get_repo()
+    if not repo:
         return JSONResponse(status_code=500, content={"message": "DB 연결 오류"})
 
-    today_str = get_current_kst_time().strftime("%Y-%m-%d")
+    now = get_current_kst_time()
+    today_str = now.strftime("%Y-%m-%d")
 
-    docs = (
-        db.collection("attendance")
-        .where(filter=FieldFilter("user_id", "==", uid))
-        .where(filter=FieldFilter("date", "==", today_str))
-        .limit(1)
-        .stream()
-    )
-
-    if any(docs):
-        return JSONResponse(status_code=400, content={"message": "이미 오늘 출석을 완료했습니다."})
-
-    # 5. Save Attendance
+    # 4. Save Attendance
     status_text = "present" if status == "open" else "late"
+    success_message = f"{ '출석' if status == 'open' else '지각' } 처리되었습니다!"
+
+    # Surge mode: accept in memory now, write-behind flush to the datastore (see checkin_queue.py)
+    if checkin_queue.SURGE_MODE:
+        if not await checkin_queue.accept(repo, uid, today_str, status_text, now):
+            return JSONResponse(status_code=400, content={"message": "이미 오늘 출석을 완료했습니다."})
+        await live_board.publish(repo, today_str, {uid: status_text})
+        return JSONResponse(status_code=200, content={"message": success_message})
 
     new_attendance = {
         "user_id": uid,
         "date": today_str,
-        "timestamp": firestore.SERVER_TIMESTAMP,
+        "timestamp": SERVER_TIMESTAMP,
         "status": status_text,
     }
 
-    db.collection("attendance").add(new_attendance)
+    # 5. Create-if-absent on (uid, date) + member stats + monthly leaderboard, in one transaction
+    await aggregates.ensure_built(repo, aggregates.month_key(today_str))
+    if not await repo.record_checkin(new_attendance):
+        return JSONResponse(status_code=400, content={"message": "이미 오늘 출석을 완료했습니다."})
+    attendance_cache.mark(uid, today_str, status_text)
+    await live_board.publish(repo, today_str, {uid: status_text})
 
-    return JSONResponse(status_code=200, content={"message": f"{ '출석' if status == 'open' else '지각' } 처리되었습니다!"})
+    return JSONResponse(status_code=200, content={"message": success_message})
 
 
 @router.get("/attendance/status")
@@ -75,17 +77,14 @@ async def get_status(request: Request):
 
     already_attended = False
     if uid:
-        db = get_db()
-        if db:
+        repo = get_repo()
+        if repo:
             today_str = get_current_kst_time().strftime("%Y-%m-%d")
-            docs = (
-                db.collection("attendance")
-                .where(filter=FieldFilter("user_id", "==", uid))
-                .where(filter=FieldFilter("date", "==", today_str))
-                .limit(1)
-                .stream()
-            )
-            if any(docs):
+            # During the window, answer from the warm attendee map (one query per TTL)
+            if time_status != "closed" or attendance_cache.is_loaded(today_str):
+                await attendance_cache.ensure_loaded(repo, today_str)
+                already_attended = attendance_cache.get_status(uid, today_str) is not None
+            elif await repo.get_attendance(uid, today_str):
                 already_attended = True
 
     return {
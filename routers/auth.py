@@ -1,28 +1,27 @@
 import os
 import logging
-import httpx
-from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi import APIRouter, Request, Response, HTTPException, Depends
 from fastapi.responses import RedirectResponse
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from dotenv import load_dotenv
-from database import get_db
+from database import get_repo
+from storage import SERVER_TIMESTAMP
+import roster
+import kakao
+from rate_limit import limiter
+import thumbnails
 from dependencies import sign_uid, COOKIE_MAX_AGE
-from firebase_admin import firestore
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
 
 KAKAO_CLIENT_ID = os.getenv("KAKAO_CLIENT_ID")
 KAKAO_REDIRECT_URI = os.getenv("KAKAO_REDIRECT_URI")
 
 
-@router.get("/login/kakao")
-@limiter.limit("10/minute")
+@router.get("/login/kakao", dependencies=[Depends(limiter.limit("login"))])
 def login_kakao(request: Request):
     client_id = os.getenv("KAKAO_CLIENT_ID")
     redirect_uri = os.getenv("KAKAO_REDIRECT_URI")
@@ -31,12 +30,10 @@ def login_kakao(request: Request):
         logger.error("Kakao Client ID is missing or default in .env")
         raise HTTPException(status_code=500, detail="Server Configuration Error: Kakao Client ID missing.")
 
-    url = f"https://kauth.kakao.com/oauth/authorize?client_id={client_id}&redirect_uri={redirect_uri}&response_type=code"
-    return RedirectResponse(url)
+    return RedirectResponse(kakao.authorize_url(client_id, redirect_uri))
 
 
-@router.get("/auth/kakao/callback")
-@limiter.limit("10/minute")
+@router.get("/auth/kakao/callback", dependencies=[Depends(limiter.limit("kakao_callback"))])
 async def kakao_callback(request: Request, code: str, response: Response):
     client_id = os.getenv("KAKAO_CLIENT_ID")
     redirect_uri = os.getenv("KAKAO_REDIRECT_URI")
@@ -44,19 +41,13 @@ async def kakao_callback(request: Request, code: str, response: Response):
     if not code:
         raise HTTPException(status_code=400, detail="Code not found")
 
-    # 1. Get Access Token
-    token_url = "https://kauth.kakao.com/oauth/token"
-    payload = {
-        "grant_type": "authorization_code",
-        "client_id": client_id,
-        "redirect_uri": redirect_uri,
-        "code": code,
-    }
+    # Imported on first login only, to keep it out of the cold-start path
+    import httpx
 
+    # 1. Get Access Token (shared keep-alive client, see kakao.py)
     try:
         logger.debug(f"Requesting token with redirect_uri={redirect_uri}")
-        async with httpx.AsyncClient() as client:
-            token_res = await client.post(token_url, data=payload)
+        token_res = await kakao.exchange_token(client_id, redirect_uri, code)
 
         if token_res.status_code != 200:
             logger.error(f"Token Request Failed. Status: {token_res.status_code}, Body: {token_res.text}")
@@ -69,12 +60,8 @@ async def kakao_callback(request: Request, code: str, response: Response):
         raise HTTPException(status_code=400, detail=f"Failed to get access token: {str(e)}")
 
     # 2. Get User Info
-    user_url = "https://kapi.kakao.com/v2/user/me"
-    headers = {"Authorization": f"Bearer {access_token}"}
-
     try:
-        async with httpx.AsyncClient() as client:
-            user_res = await client.get(user_url, headers=headers)
+        user_res = await kakao.get_user_info(access_token)
         user_res.raise_for_status()
         user_info = user_res.json()
     except httpx.HTTPError as e:
@@ -98,36 +85,43 @@ async def kakao_callback(request: Request, code: str, response: Response):
     logger.info(f"Logged in as {nickname} ({kakao_uid})")
 
     # 4. Save/Update in Firebase
-    db = get_db()
-    if db:
-        user_ref = db.collection("users").document(kakao_uid)
-        user_doc = user_ref.get()
+    repo = get_repo()
+    if repo:
+        user_data = await repo.get_user(kakao_uid)
 
-        if not user_doc.exists:
+        if user_data is None:
             # New User: Store initial info
             user_data = {
                 "uid": kakao_uid,
                 "nickname": nickname,
                 "initial_nickname": nickname,
                 "profile_image": profile_image,
-                "created_at": firestore.SERVER_TIMESTAMP,
-                "last_login": firestore.SERVER_TIMESTAMP,
+                "created_at": SERVER_TIMESTAMP,
+                "last_login": SERVER_TIMESTAMP,
                 "is_auth": "pending"
             }
-            user_ref.set(user_data)
+            await repo.create_user(kakao_uid, user_data)
+            roster.invalidate(kakao_uid)
         else:
             # Existing User: Update profile image and last login only
-            user_data = user_doc.to_dict()
-            update_data = {
-                "profile_image": profile_image,
-                "last_login": firestore.SERVER_TIMESTAMP
-            }
+            update_data = {}
+            if user_data.get("profile_image") != profile_image:
+                update_data["profile_image"] = profile_image
 
             # If user was 'withdrawn', set to 'pending' to require re-approval
             if user_data.get("is_auth") == "withdrawn":
                 update_data["is_auth"] = "pending"
 
-            user_ref.update(update_data)
+            # Shown fields go through update_user, which bumps the members version (ranking/members
+            # ETags, member index); an unchanged profile only records last_login, without the bump
+            if update_data:
+                update_data["last_login"] = SERVER_TIMESTAMP
+                await repo.update_user(kakao_uid, update_data)
+                roster.invalidate(kakao_uid)
+                if "profile_image" in update_data:
+                    await thumbnails.forget(user_data.get("profile_image"))
+            else:
+                await repo.touch_user(kakao_uid, {"last_login": SERVER_TIMESTAMP})
 
     # 5. Create Signed Session Cookie
     signed_value = sign_uid(kakao_uid)
@@ -0,0 +1,43 @@
+import logging
+from typing import Optional
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import Response, RedirectResponse
+from database import get_repo
+import roster
+import thumbnails
+import http_cache
+from dependencies import require_authenticated
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/img/profile/{uid}")
+async def profile_thumbnail(request: Request, uid: str, v: Optional[str] = None, _: str = Depends(require_authenticated)):
+    # Rankings and the roster cache already hold the member, so this is usually read-free
+    member = (await roster.get_members(get_repo(), [uid])).get(uid) or {}
+    source_url = member.get("profile_image") or ""
+    if not source_url:
+        raise HTTPException(status_code=404, detail="Profile image not found")
+    if not thumbnails.available() or not thumbnails.is_allowed_source(source_url):
+        return RedirectResponse(source_url)
+
+    fmt = thumbnails.choose_format(request.headers.get("accept", ""))
+    etag = thumbnails.etag(source_url, fmt)
+    # ?v= matches the current source: the URL changes with the image, so it never needs revalidating
+    if v == thumbnails.version(source_url):
+        cache_control = f"private, max-age={thumbnails.THUMBNAIL_MAX_AGE}, immutable"
+    else:
+        cache_control = "private, no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept"}
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified(headers)
+
+    try:
+        data = await thumbnails.get_thumbnail(source_url, fmt)
+    except thumbnails.ThumbnailError as e:
+        logger.warning(f"Thumbnail for {uid} unavailable, redirecting to the source: {e}")
+        return RedirectResponse(source_url)
+
+    return Response(content=data, media_type=thumbnails.FORMATS[fmt], headers=headers)
@@ -1,156 +1,179 @@
 import os
 import logging
 import calendar
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
-from database import get_db
+from database import get_repo
+import templating
+from templating import get_templates
+import roster
+import aggregates
+import attendance_cache
+import training_schedule
+import metrics
+import http_cache
+import thumbnails
 from logic import (
     check_ip, check_attendance_time, get_current_kst_time, get_client_ip,
     DROPOUT_DAYS, WARNING_DAYS, ACTIVE_DAYS,
 )
 from dependencies import get_current_user_uid, ADMIN_UIDS
-from google.cloud.firestore_v1.base_query import FieldFilter
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
-
-def get_ranking_data(db, target_date, valid_days_count, uid):
+async def build_ranking(repo, target_date, valid_days_count):
+    """Ranking rows for a month, each with the member's uid (not sent to clients)."""
     current_month_prefix = target_date.strftime("%Y-%m")
     ranking_list = []
 
-    if not db:
+    if not repo:
         return ranking_list
 
-    # Optimized: query by date range instead of full collection scan
-    last_day = calendar.monthrange(target_date.year, target_date.month)[1]
-    start_date = f"{current_month_prefix}-01"
-    end_date = f"{current_month_prefix}-{last_day:02d}"
-
-    docs = (
-        db.collection("attendance")
-        .where(filter=FieldFilter("date", ">=", start_date))
-        .where(filter=FieldFilter("date", "<=", end_date))
-        .stream()
-    )
+    # One read of the incrementally maintained monthly leaderboard doc
+    leaderboard = await aggregates.get_leaderboard(repo, current_month_prefix)
 
     user_stats = {}
-    for doc in docs:
-        data = doc.to_dict()
+    for u_id, counts in leaderboard.items():
         # Only count if status is 'present' (exclude 'late')
-        if data.get('status') == 'present':
-            u_id = data['user_id']
-            if u_id not in user_stats:
-                user_stats[u_id] = {'count': 0}
-            user_stats[u_id]['count'] += 1
+        present = (counts or {}).get('present', 0)
+        if present > 0:
+            user_stats[u_id] = {'count': present}
 
     sorted_stats = sorted(user_stats.items(), key=lambda x: x[1]['count'], reverse=True)
 
     current_rank = 0
     last_count = -1
 
+    # Single batched fetch (cached) instead of one users read per member
+    members = await roster.get_members(repo, [u_id for u_id, _ in sorted_stats])
+
     for u_id, stat in sorted_stats:
         count = stat['count']
         if count != last_count:
             current_rank += 1
         last_count = count
 
-        u_doc = db.collection("users").document(u_id).get()
-        u_data = u_doc.to_dict() if u_doc.exists else {}
+        u_data = members.get(u_id) or {}
 
         # Skip if user is withdrawn or not approved
         if u_data.get("is_auth") != "approved":
             continue
 
-        u_nick = u_data.get("nickname", "Unknown")
-        u_profile = u_data.get("profile_image", "")
+        u_nick = u_data.get("nickname") or "Unknown"
+        # Avatar-sized thumbnail instead of the full Kakao image (see thumbnails.py)
+        u_profile = thumbnails.profile_url(u_id, u_data.get("profile_image") or "")
 
         rate = int((stat['count'] / valid_days_count) * 100)
 
         ranking_list.append({
+            "uid": u_id,
             "rank": current_rank,
             "nickname": u_nick,
             "profile_image": u_profile,
             "count": count,
             "rate": rate,
-            "is_me": (u_id == uid)
         })
 
     return ranking_list
 
 
+def _public_row(row, uid):
+    item = {key: value for key, value in row.items() if key != "uid"}
+    item["is_me"] = (row["uid"] == uid)
+    return item
+
+
+async def get_ranking_data(repo, target_date, valid_days_count, uid):
+    return [_public_row(row, uid) for row in await build_ranking(repo, target_date, valid_days_count)]
+
+
+async def render_ranking_rows(repo, target_date, valid_days_count, uid):
+    """
+    Ranking <tr>s for the page. The rows are the same for every visitor, so
+    they are rendered once per month and ranking data, and only the viewer's
+    own row is re-rendered with the ME badge.
+    """
+    rows = await build_ranking(repo, target_date, valid_days_count)
+    # Keyed by the rows themselves: they are built from the leaderboard doc and
+    # the roster cache anyway, and a versions read would cost more than it saves
+    fragment_key = ("ranking_rows", target_date.strftime("%Y-%m"), tuple(tuple(row.items()) for row in rows))
+
+    html = templating.get_fragment(fragment_key)
+    if html is None:
+        html = [templating.render("partials/ranking_row.html", item=_public_row(row, None)) for row in rows]
+        templating.set_fragment(fragment_key, html)
+
+    html = list(html)
+    for i, row in enumerate(rows):
+        if row["uid"] == uid:
+            html[i] = templating.render("partials/ranking_row.html", item=_public_row(row, uid))
+    return templating.join_fragments(html)
+
+
 @router.get("/api/ranking")
 async def get_ranking_api(request: Request, year: int, month: int):
     uid = get_current_user_uid(request)
-    db = get_db()
+    repo = get_repo()
 
     try:
         target_date = datetime(year, month, 1)
     except ValueError:
         return JSONResponse(status_code=400, content={"message": "Invalid date"})
 
-    # Valid Days Calculation
+    # Valid Days Calculation (sessions whose window has opened by now)
     now = get_current_kst_time()
-    now_naive = now.replace(tzinfo=None)
-
-    valid_days_count = 0
-
-    if target_date.strftime("%Y-%m") == now_naive.strftime("%Y-%m"):
-        check_range = range(1, now_naive.day + 1)
-        check_year, check_month = now_naive.year, now_naive.month
-    elif target_date < now_naive.replace(day=1, hour=0, minute=0, second=0, microsecond=0):
-        last_day = calendar.monthrange(target_date.year, target_date.month)[1]
-        check_range = range(1, last_day + 1)
-        check_year, check_month = target_date.year, target_date.month
-    else:
-        check_range = []
-        check_year, check_month = target_date.year, target_date.month
-
-    for day in check_range:
-        d = datetime(check_year, check_month, day)
-        if d.weekday() in [5, 6]:
-            if d.date() == now.date():
-                if d.weekday() == 5 and now.time() < time(12, 45): continue
-                if d.weekday() == 6 and now.time() < time(15, 45): continue
-            valid_days_count += 1
-    if valid_days_count == 0: valid_days_count = 1
-
-    data = get_ranking_data(db, target_date, valid_days_count, uid)
+    valid_days_count = max(1, training_schedule.valid_session_count(year, month, now))
+    is_current = (target_date.strftime("%Y-%m") == now.strftime("%Y-%m"))
+
+    # Conditional request: rankings change with the month's attendance and
+    # with members' profiles, so one versions read decides whether to rebuild
+    headers = None
+    if repo:
+        versions = await repo.get_versions([target_date.strftime("%Y-%m"), aggregates.MEMBERS_VERSION])
+        etag = http_cache.make_etag("ranking", uid, versions, valid_days_count, is_current)
+        headers = http_cache.cache_headers(etag, target_date, now)
+        if http_cache.is_not_modified(request, etag):
+            return http_cache.not_modified(headers)
+
+    data = await get_ranking_data(repo, target_date, valid_days_count, uid)
 
     return JSONResponse({
         "ranking_list": data,
         "month_name": target_date.strftime("%B %Y"),
         "year": year,
         "month": month,
-        "is_current_month": (target_date.strftime("%Y-%m") == now.strftime("%Y-%m"))
-    })
-
+        "is_current_month": is_current
+    }, headers=headers)
 
-def get_calendar_data(db, uid, target_date):
-    year = target_date.year
-    month = target_date.month
-    last_day = calendar.monthrange(year, month)[1]
 
+async def get_month_attendance(repo, uid, target_date):
+    """Return {day: status} for a member's records in the month of target_date."""
+    last_day = calendar.monthrange(target_date.year, target_date.month)[1]
     current_month_prefix = target_date.strftime("%Y-%m")
     attendance_map = {}
 
-    if db:
-        docs = (
-            db.collection("attendance")
-            .where(filter=FieldFilter("user_id", "==", uid))
-            .where(filter=FieldFilter("date", ">=", f"{current_month_prefix}-01"))
-            .where(filter=FieldFilter("date", "<=", f"{current_month_prefix}-{last_day}"))
-            .stream()
+    if repo:
+        records = await repo.list_member_attendance(
+            uid, f"{current_month_prefix}-01", f"{current_month_prefix}-{last_day:02d}"
         )
-        for doc in docs:
-            data = doc.to_dict()
+        for data in records:
             day_int = int(data['date'].split('-')[-1])
             attendance_map[day_int] = data['status']
 
+    return attendance_map
+
+
+async def get_calendar_data(repo, uid, target_date, attendance_map=None):
+    year = target_date.year
+    month = target_date.month
+    last_day = calendar.monthrange(year, month)[1]
+
+    if attendance_map is None:
+        attendance_map = await get_month_attendance(repo, uid, target_date)
+
     calendar_grid = []
     first_day_weekday = target_date.replace(day=1).weekday()
 
@@ -162,7 +185,7 @@ def get_calendar_data(db, uid, target_date):
 
     for day in range(1, last_day + 1):
         d = datetime(year, month, day)
-        is_weekend = d.weekday() in [5, 6]
+        is_weekend = training_schedule.is_class_day(d)
         status = attendance_map.get(day, "none")
         is_today = (d.date() == now_date)
 
@@ -191,34 +214,28 @@ async def get_record_calendar_api(request: Request, year: int, month: int):
     if not uid:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
-    db = get_db()
+    repo = get_repo()
     try:
         target_date = datetime(year, month, 1)
     except ValueError:
         return JSONResponse(status_code=400, content={"message": "Invalid date"})
 
-    valid_days_count = 0
-    last_day = calendar.monthrange(year, month)[1]
     now = get_current_kst_time()
-    now_naive = now.replace(tzinfo=None)
-
-    check_range = range(1, last_day + 1)
-
-    if target_date.strftime("%Y-%m") == now.strftime("%Y-%m"):
-        check_range = range(1, now.day + 1)
-    elif target_date > now_naive:
-        check_range = []
-    else:
-        check_range = range(1, last_day + 1)
-
-    for day in check_range:
-        d = datetime(year, month, day)
-        if d.weekday() in [5, 6]:
-            valid_days_count += 1
+    valid_days_count = max(1, training_schedule.valid_session_count(year, month, now))
+    is_current = (target_date.strftime("%Y-%m") == now.strftime("%Y-%m"))
 
-    if valid_days_count == 0: valid_days_count = 1
+    # Conditional request: the grid only changes with the month's attendance
+    # (and, in the current month, with the day that is highlighted as today)
+    headers = None
+    if repo:
+        versions = await repo.get_versions([target_date.strftime("%Y-%m")])
+        today = now.strftime("%Y-%m-%d") if is_current else None
+        etag = http_cache.make_etag("calendar", uid, versions, valid_days_count, today)
+        headers = http_cache.cache_headers(etag, target_date, now)
+        if http_cache.is_not_modified(request, etag):
+            return http_cache.not_modified(headers)
 
-    calendar_grid = get_calendar_data(db, uid, target_date)
+    calendar_grid = await get_calendar_data(repo, uid, target_date)
 
     current_month_count = 0
     for day in calendar_grid:
@@ -227,8 +244,6 @@ async def get_record_calendar_api(request: Request, year: int, month: int):
 
     attendance_rate = int((current_month_count / valid_days_count) * 100)
 
-    is_current = (target_date.strftime("%Y-%m") == now.strftime("%Y-%m"))
-
     return JSONResponse({
         "calendar_grid": calendar_grid,
         "month_name": target_date.strftime("%B %Y"),
@@ -240,7 +255,7 @@ async def get_record_calendar_api(request: Request, year: int, month: int):
         "attendance_count": current_month_count,
         "attendance_rate": attendance_rate,
         "valid_days_count": valid_days_count
-    })
+    }, headers=headers)
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -254,24 +269,14 @@ async def read_root(request: Request):
     already_attended = False
     today_status = None
 
-    db = get_db()
+    repo = get_repo()
 
     # 2. Date Setup (Default to Now)
     now = get_current_kst_time()
     target_date = now
-    current_month_prefix = now.strftime("%Y-%m")
-    today_str = now.strftime("%Y-%m-%d")
 
     # Calculate Valid Class Days
-    valid_days_count = 0
-    for day in range(1, now.day + 1):
-        d = datetime(now.year, now.month, day)
-        if d.weekday() in [5, 6]:
-            if d.date() == now.date():
-                if d.weekday() == 5 and now.time() < time(12, 45): continue
-                if d.weekday() == 6 and now.time() < time(15, 45): continue
-            valid_days_count += 1
-    if valid_days_count == 0: valid_days_count = 1
+    valid_days_count = max(1, training_schedule.valid_session_count(now.year, now.month, now))
 
     # 3. User Specific Data (Record)
     my_record = {
@@ -294,11 +299,10 @@ async def read_root(request: Request):
     # Check Admin
     is_admin_user = (str(uid).strip() in ADMIN_UIDS) if uid else False
 
-    if uid and db:
+    if uid and repo:
         # Get User Doc & Check Status
-        user_doc = db.collection("users").document(uid).get()
-        if user_doc.exists:
-            u_data = user_doc.to_dict()
+        u_data = await repo.get_user(uid)
+        if u_data:
             nickname = u_data.get("nickname")
             is_auth = u_data.get("is_auth") or u_data.get("status", "approved")
 
@@ -316,89 +320,45 @@ async def read_root(request: Request):
 
         # Only fetch data if NOT pending
         if not is_pending:
-            my_record["calendar"] = get_calendar_data(db, uid, now)
-
-            docs = db.collection("attendance").where(filter=FieldFilter("user_id", "==", uid)).order_by("date", direction="ASCENDING").stream()
-
-            all_dates = []
-            for doc in docs:
-                data = doc.to_dict()
-                date_str = data['date']
-                all_dates.append(date_str)
-
-                if date_str == today_str:
-                    already_attended = True
-                    today_status = data.get("status")
+            # Lifetime stats come from the summary on the users doc (see aggregates.py);
+            # only the current month's records are read, so cost is independent of tenure.
+            summary = aggregates.get_summary(u_data or {})
+            month_attendance = await get_month_attendance(repo, uid, now)
+            my_record["calendar"] = await get_calendar_data(repo, uid, now, month_attendance)
 
-                my_record["total_attendance"] += 1
-                my_record["total_points"] += data.get("point", 0)
+            # Check-ins accepted in surge mode may not be flushed yet
+            pending_status = attendance_cache.get_status(uid, now.strftime("%Y-%m-%d"))
+            if pending_status and now.day not in month_attendance:
+                month_attendance[now.day] = pending_status
 
-                if date_str.startswith(current_month_prefix):
-                    my_record["current_month_count"] += 1
+            if now.day in month_attendance:
+                already_attended = True
+                today_status = month_attendance[now.day]
 
-            # Calculate Longest Weekly Streak
-            max_streak = 0
-            current_streak = 0
-            streak_end_date = ""
-
-            if all_dates:
-                attended_weeks = sorted(list(set([datetime.strptime(d, "%Y-%m-%d").isocalendar()[:2] for d in all_dates])))
-
-                if attended_weeks:
-                    current_streak = 1
-                    max_streak = 1
-                    streak_end_date = all_dates[0]
-
-                    for i in range(1, len(attended_weeks)):
-                        prev_w = attended_weeks[i-1]
-                        curr_w = attended_weeks[i]
-
-                        d1 = datetime.fromisocalendar(prev_w[0], prev_w[1], 1)
-                        d2 = datetime.fromisocalendar(curr_w[0], curr_w[1], 1)
-
-                        if (d2 - d1).days == 7:
-                            current_streak += 1
-                        else:
-                            current_streak = 1
-
-                        if current_streak >= max_streak:
-                            max_streak = current_streak
-                            week_dates = [d for d in all_dates if datetime.strptime(d, "%Y-%m-%d").isocalendar()[:2] == curr_w]
-                            if week_dates:
-                                streak_end_date = week_dates[-1]
+            my_record["total_attendance"] = summary["total"]
+            my_record["total_points"] = summary["points"]
+            my_record["current_month_count"] = len(month_attendance)
 
             my_record["attendance_rate"] = int((my_record["current_month_count"] / valid_days_count) * 100)
-            my_record["current_streak"] = max_streak
-            if streak_end_date:
+            my_record["current_streak"] = summary["longest_streak"]
+            if summary["streak_date"]:
                 try:
-                    dt_obj = datetime.strptime(streak_end_date, "%Y-%m-%d")
+                    dt_obj = datetime.strptime(summary["streak_date"], "%Y-%m-%d")
                     my_record["streak_date"] = dt_obj.strftime("%y.%m.%d")
                 except Exception:
-                    my_record["streak_date"] = streak_end_date
+                    my_record["streak_date"] = summary["streak_date"]
             else:
                 my_record["streak_date"] = ""
 
+            if summary["last_date"]:
+                last_date = datetime.strptime(summary["last_date"], "%Y-%m-%d").date()
+                days_absent = (now.date() - last_date).days
+
     # 4. Determine Status Message
     status_message = "첫 출석을 기다리고 있어요 🌱"
     status_color = "text-gray-500"
 
-    if uid and db and not is_pending:
-        last_attend_doc = (
-            db.collection("attendance")
-            .where(filter=FieldFilter("user_id", "==", uid))
-            .order_by("date", direction="DESCENDING")
-            .limit(1)
-            .stream()
-        )
-        last_attend_list = list(last_attend_doc)
-        days_absent = -1
-
-        if last_attend_list:
-            last_data = last_attend_list[0].to_dict()
-            last_date_str = last_data['date']
-            last_date = datetime.strptime(last_date_str, "%Y-%m-%d").date()
-            days_absent = (now.date() - last_date).days
-
+    if uid and repo and not is_pending:
         # Status Priority Logic (using named constants)
         if is_sick_leave:
             status_message = "병결 중이시네요, 회복 후 다시 만나요 💊"
@@ -424,10 +384,15 @@ async def read_root(request: Request):
             status_message = "어서오세요! 오늘도 힘내세요 💪"
             status_color = "text-gray-500"
 
-    # 5. Ranking Data (Initial Load using helper)
-    ranking_list = []
-    if not is_pending:
-        ranking_list = get_ranking_data(db, target_date, valid_days_count, uid)
+    # 5. Ranking (Initial Load, from cached fragments)
+    ranking_rows = ""
+    ranking_month_header = ""
+    if uid and not is_pending:
+        ranking_rows = await render_ranking_rows(repo, target_date, valid_days_count, uid)
+        ranking_month_header = templating.cached_render(
+            now.strftime("%Y-%m"), "partials/ranking_month_header.html",
+            current_month_name=now.strftime("%B %Y"), initial_year=now.year, initial_month=now.month,
+        )
 
     context = {
         "request": request,
@@ -441,7 +406,8 @@ async def read_root(request: Request):
         "today_status": today_status,
         "client_ip": client_ip,
         "my_record": my_record,
-        "ranking_list": ranking_list,
+        "ranking_rows": ranking_rows,
+        "ranking_month_header": ranking_month_header,
         "valid_days_count": valid_days_count,
         "current_month_name": now.strftime("%B %Y"),
         "current_month_num": now.month,
@@ -452,4 +418,5 @@ async def read_root(request: Request):
         "status_color": status_color,
         "is_admin_user": is_admin_user
     }
-    return templates.TemplateResponse("index.html", context)
+    with metrics.timed("template"):
+        return get_templates().TemplateResponse("index.html", context)
@@ -0,0 +1,178 @@
+import os
+import re
+import gzip
+import hashlib
+import logging
+import importlib.util
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.staticfiles import StaticFiles
+
+logger = logging.getLogger(__name__)
+
+# Static files are linked by content hash (/static/team-magnus-logo.<hash>.jpg
+# via static_url() in templates), so those URLs are cached as immutable and a
+# new deploy changes the URL. Text files get .br / .gz siblings in the deploy
+# build (manage.py build-static; not committed), served when the browser
+# accepts them.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_PREFIX = "/static"
+HASH_LENGTH = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+ICON_MAX_AGE = int(os.getenv("ICON_MAX_AGE", "604800"))  # seconds, for the unhashed /favicon.ico
+
+# Text only: images (.ico included) are already compressed
+PRECOMPRESS_SUFFIXES = (".css", ".js", ".svg", ".json", ".txt", ".webmanifest")
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+# Small icons cut from the logo by build_icons(); the logo itself is 183 KB
+LOGO = "team-magnus-logo.jpg"
+ICONS = {
+    "favicon.ico": (16, 32, 48),
+    "favicon.png": (32,),
+    "apple-touch-icon.png": (180,),
+}
+
+_FINGERPRINTED = re.compile(rf"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{{{HASH_LENGTH}}})(?P<suffix>\.[^./]+)$")
+_digests = {}  # relative path -> content hash; files do not change within a deploy
+
+
+def digest(path: str) -> str:
+    """Content hash of a file under static/, computed once per process."""
+    value = _digests.get(path)
+    if value is None:
+        with open(os.path.join(STATIC_DIR, path), "rb") as f:
+            value = hashlib.sha256(f.read()).hexdigest()[:HASH_LENGTH]
+        _digests[path] = value
+    return value
+
+
+def static_url(path: str) -> str:
+    """Fingerprinted URL of a static file (the plain URL if it is missing)."""
+    try:
+        stem, suffix = os.path.splitext(path)
+        return f"{STATIC_PREFIX}/{stem}.{digest(path)}{suffix}"
+    except OSError:
+        logger.warning(f"Static file not found: {path}")
+        return f"{STATIC_PREFIX}/{path}"
+
+
+def split_fingerprint(path: str):
+    """('name.ext', digest) for 'name.<digest>.ext', else (path, None)."""
+    match = _FINGERPRINTED.match(path)
+    if not match:
+        return path, None
+    return match["stem"] + match["suffix"], match["digest"]
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codings the client accepts (q > 0) from an Accept-Encoding value."""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles with fingerprinted URLs, immutable caching and precompressed variants."""
+
+    async def get_response(self, path: str, scope):
+        original, requested_digest = split_fingerprint(path)
+        if requested_digest is None:
+            cache_control = REVALIDATE
+        else:
+            try:
+                current = digest(original)
+            except OSError:
+                raise HTTPException(status_code=404)
+            # An old hash after a deploy still gets the current file, just not for a year
+            cache_control = IMMUTABLE if current == requested_digest else REVALIDATE
+            path = original
+
+        response = None
+        if path.endswith(PRECOMPRESS_SUFFIXES):
+            accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+            for coding, suffix in PRECOMPRESSED:
+                if coding not in accepted:
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result is None:
+                    continue
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["content-encoding"] = coding
+                break
+            response = response or await super().get_response(path, scope)
+            response.headers["vary"] = "Accept-Encoding"
+        else:
+            response = await super().get_response(path, scope)
+
+        response.headers["cache-control"] = cache_control
+        return response
+
+
+def _write_if_changed(path: str, data: bytes) -> bool:
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def build_icons(directory: str = STATIC_DIR) -> list:
+    """Cut the icon files in ICONS from the logo. Needs the optional Pillow package."""
+    if importlib.util.find_spec("PIL") is None:
+        raise RuntimeError("Pillow is required to build icons (pip install pillow)")
+    import io
+    from PIL import Image
+
+    written = []
+    with Image.open(os.path.join(directory, LOGO)) as logo:
+        logo = logo.convert("RGB")
+        for name, sizes in ICONS.items():
+            buffer = io.BytesIO()
+            if name.endswith(".ico"):
+                logo.save(buffer, format="ICO", sizes=[(size, size) for size in sizes])
+            else:
+                logo.resize((sizes[0], sizes[0]), Image.LANCZOS).save(buffer, format="PNG", optimize=True)
+            if _write_if_changed(os.path.join(directory, name), buffer.getvalue()):
+                written.append(name)
+    return written
+
+
+def build_precompressed(directory: str = STATIC_DIR) -> list:
+    """Write .gz (and .br, if brotli is installed) next to each compressible file."""
+    use_brotli = importlib.util.find_spec("brotli") is not None
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(PRECOMPRESS_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if use_brotli:
+                import brotli
+                variants[".br"] = brotli.compress(data, quality=11)
+            for suffix, compressed in variants.items():
+                # Not worth a variant if it does not save anything
+                if len(compressed) < len(data) and _write_if_changed(path + suffix, compressed):
+                    written.append(os.path.relpath(path + suffix, directory))
+    if not use_brotli:
+        logger.warning("brotli is not installed; only .gz variants were written")
+    return written
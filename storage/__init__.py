@@ -0,0 +1,27 @@
+"""
+Storage backends behind one repository interface (storage/base.py).
+
+    firestore  Cloud Firestore, production (default)
+    memory     process-local dicts, for benchmarks and load tests
+    sqlite     single-file database at SQLITE_PATH, for offline runs
+"""
+import os
+from storage.base import Repository, SERVER_TIMESTAMP
+
+BACKENDS = ("firestore", "memory", "sqlite")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "attendance.sqlite3")
+
+
+def create_repository(backend: str, db=None) -> Repository:
+    """Build a repository; db is the Firestore AsyncClient for the firestore backend."""
+    # Backends are imported on demand so the offline ones never load the Firestore SDK
+    if backend == "firestore":
+        from storage.firestore import FirestoreRepository
+        return FirestoreRepository(db)
+    if backend == "memory":
+        from storage.memory import MemoryRepository
+        return MemoryRepository()
+    if backend == "sqlite":
+        from storage.sqlite import SQLiteRepository
+        return SQLiteRepository(SQLITE_PATH)
+    raise ValueError(f"Unknown storage backend {backend!r} (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,149 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+# Highest date bound for key-range scans over a member's records
+MAX_DATE = "\uf8ff"
+
+
+class _ServerTimestamp:
+    """Placeholder resolved by each backend to its own write time."""
+
+    def __repr__(self):
+        return "SERVER_TIMESTAMP"
+
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+def resolve_timestamps(data: dict, value) -> dict:
+    """Copy of data with every SERVER_TIMESTAMP replaced by value."""
+    return {key: (value if item is SERVER_TIMESTAMP else item) for key, item in data.items()}
+
+
+class Repository(ABC):
+    """
+    Users / attendance / leaderboard operations used by the app.
+
+    Attendance records are keyed by (user_id, date): one record per member
+    per day. Summary and leaderboard math lives in aggregates.py; backends
+    only store and fetch, and keep records, summaries, leaderboard counters
+    and data versions consistent on check-ins and admin changes.
+    """
+
+    name = ""
+
+    # Users
+
+    @abstractmethod
+    async def get_user(self, uid: str) -> Optional[dict]:
+        """Users doc, or None if the member does not exist."""
+
+    @abstractmethod
+    async def get_users(self, uids) -> dict:
+        """{uid: users doc} for the given uids in one round-trip. Unknown uids are omitted."""
+
+    @abstractmethod
+    async def list_users(self) -> list:
+        """Every member as (uid, users doc) pairs."""
+
+    @abstractmethod
+    async def create_user(self, uid: str, data: dict):
+        """Create or replace a users doc."""
+
+    @abstractmethod
+    async def update_user(self, uid: str, data: dict):
+        """Update fields of an existing users doc. Raises if it does not exist."""
+
+    @abstractmethod
+    async def merge_user(self, uid: str, data: dict):
+        """Update fields of a users doc, creating it if needed."""
+
+    @abstractmethod
+    async def touch_user(self, uid: str, data: dict):
+        """
+        Update bookkeeping fields of an existing users doc (e.g. last_login)
+        without bumping the members version: nothing cached shows them.
+        """
+
+    @abstractmethod
+    async def set_summaries(self, summaries: dict):
+        """Replace the attendance summary of existing members. summaries: {uid: summary}"""
+
+    # Attendance
+
+    @abstractmethod
+    async def get_attendance(self, uid: str, date_str: str) -> Optional[dict]:
+        """A member's record for one day, or None."""
+
+    @abstractmethod
+    async def list_attendance_by_date(self, date_str: str) -> list:
+        """Every record on one day."""
+
+    @abstractmethod
+    async def list_member_attendance(self, uid: str, start: str = "", end: str = MAX_DATE) -> list:
+        """A member's records between two dates (inclusive), ordered by date."""
+
+    @abstractmethod
+    async def list_attendance_between(self, start: str, end: str) -> list:
+        """Every record between two dates (inclusive)."""
+
+    @abstractmethod
+    async def list_attendance(self) -> list:
+        """Every record (maintenance commands only)."""
+
+    @abstractmethod
+    async def list_attendance_page(self, start: str = "", end: str = MAX_DATE, uid: Optional[str] = None,
+                                   after: Optional[tuple] = None, limit: int = 500) -> list:
+        """
+        Up to `limit` records between two dates (inclusive), optionally for one
+        member, ordered by date. `after` is the (date, user_id) of the last
+        record of the previous page. Order within a date is backend-defined but
+        stable, so paging this way visits every record once.
+        """
+
+    @abstractmethod
+    async def record_checkin(self, record: dict) -> bool:
+        """
+        Create a member's record for the day if absent, together with their
+        summary and the monthly leaderboard, atomically.
+        Returns False if the member already has a record that day.
+        """
+
+    @abstractmethod
+    async def record_checkins(self, records: list) -> int:
+        """
+        Commit several check-ins (write-behind flush) atomically, skipping
+        records that already exist. Returns the number of records written.
+        """
+
+    @abstractmethod
+    async def apply_attendance_changes(self, date_str: str, changes: dict) -> dict:
+        """
+        Create / update / delete records on one date with their leaderboard
+        deltas. changes: {uid: (old_status, new_status)}, None meaning no record.
+        Writes are committed in chunks; returns {uid: committed}.
+        Member summaries are updated separately (aggregates.apply_changes).
+        """
+
+    # Leaderboards
+
+    @abstractmethod
+    async def get_leaderboard(self, key: str) -> Optional[dict]:
+        """{uid: {present, late}} for a month (YYYY-MM), or None if never built."""
+
+    @abstractmethod
+    async def set_leaderboard(self, key: str, counts: dict):
+        """Replace a month's counters (rebuild)."""
+
+    # Data versions
+
+    @abstractmethod
+    async def get_versions(self, keys) -> dict:
+        """
+        {key: version} for month keys (YYYY-MM) and aggregates.MEMBERS_VERSION,
+        in one round-trip. A month's version changes with every attendance
+        write in it; 0 if nothing was ever written.
+        """
+
+    async def close(self):
+        pass
@@ -0,0 +1,353 @@
+import logging
+from typing import Optional
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+from aggregates import (
+    SUMMARY_FIELD, LEADERBOARD_COLLECTION, VERSIONS_COLLECTION, MEMBERS_VERSION, BATCH_LIMIT,
+    attendance_id, get_summary, _append, leaderboard_delta, month_key,
+)
+from storage.base import Repository, MAX_DATE, resolve_timestamps
+
+logger = logging.getLogger(__name__)
+
+
+def _to_firestore(data: dict) -> dict:
+    return resolve_timestamps(data, firestore.SERVER_TIMESTAMP)
+
+
+def attendance_ref(db, uid: str, date_str: str):
+    return db.collection("attendance").document(attendance_id(uid, date_str))
+
+
+def member_records_query(db, uid: str, start: str = "", end: str = MAX_DATE):
+    """
+    Key-range scan over a member's attendance docs between two dates
+    (inclusive). Uses the built-in document ID index, no composite index.
+    """
+    collection = db.collection("attendance")
+    return (
+        collection
+        .where(filter=FieldFilter(FieldPath.document_id(), ">=", collection.document(attendance_id(uid, start))))
+        .where(filter=FieldFilter(FieldPath.document_id(), "<=", collection.document(attendance_id(uid, end))))
+    )
+
+
+def leaderboard_ref(db, key: str):
+    return db.collection(LEADERBOARD_COLLECTION).document(key)
+
+
+def members_version_ref(db):
+    return db.collection(VERSIONS_COLLECTION).document(MEMBERS_VERSION)
+
+
+def add_leaderboard_changes(batch, db, date_str: str, changes: dict):
+    """
+    Queue counter deltas for several members on one date as a single
+    leaderboard write, which also bumps the month's data version.
+    changes: {uid: (old_status, new_status)}
+    """
+    if not changes:
+        return
+
+    counts = {}
+    for uid, (old_status, new_status) in changes.items():
+        delta = leaderboard_delta(old_status, new_status)
+        if delta:
+            counts[uid] = {status: firestore.Increment(step) for status, step in delta.items()}
+
+    # Merging an empty "counts" map would replace the stored one, so only the version is bumped then
+    data = {"counts": counts, "version": firestore.Increment(1)} if counts else {"version": firestore.Increment(1)}
+    batch.set(leaderboard_ref(db, month_key(date_str)), data, merge=True)
+
+
+@firestore.async_transactional
+async def _checkin_transaction(transaction, db, record: dict) -> bool:
+    uid = record["user_id"]
+    record_ref = attendance_ref(db, uid, record["date"])
+    user_ref = db.collection("users").document(uid)
+    snapshots = {doc.id: doc async for doc in db.get_all([record_ref, user_ref], transaction=transaction)}
+
+    if snapshots[record_ref.id].exists:
+        return False
+
+    transaction.create(record_ref, _to_firestore(record))
+    # Like set_summaries, only existing members get a summary: a merge-set would create a users doc
+    user_doc = snapshots[user_ref.id]
+    if user_doc.exists:
+        summary = get_summary(user_doc.to_dict())
+        _append(summary, record["date"], record["status"], record.get("point", 0))
+        transaction.update(user_ref, {SUMMARY_FIELD: summary})
+    add_leaderboard_changes(transaction, db, record["date"], {uid: (None, record["status"])})
+    return True
+
+
+@firestore.async_transactional
+async def _checkins_transaction(transaction, db, records: list) -> int:
+    record_refs = [attendance_ref(db, r["user_id"], r["date"]) for r in records]
+    user_refs = [db.collection("users").document(uid) for uid in dict.fromkeys(r["user_id"] for r in records)]
+    snapshots = {doc.id: doc async for doc in db.get_all(record_refs + user_refs, transaction=transaction)}
+
+    summaries = {}  # existing members only, as in set_summaries
+    for user_ref in user_refs:
+        user_doc = snapshots.get(user_ref.id)
+        if user_doc and user_doc.exists:
+            summaries[user_ref.id] = get_summary(user_doc.to_dict())
+
+    changes_by_date = {}
+    written = 0
+    for record_ref, record in sorted(zip(record_refs, records), key=lambda pair: pair[1]["date"]):
+        existing = snapshots.get(record_ref.id)
+        if existing and existing.exists:
+            continue
+        uid = record["user_id"]
+        if uid in summaries:
+            _append(summaries[uid], record["date"], record["status"], record.get("point", 0))
+        transaction.create(record_ref, _to_firestore(record))
+        changes_by_date.setdefault(record["date"], {})[uid] = (None, record["status"])
+        written += 1
+
+    for user_ref in user_refs:
+        if user_ref.id in summaries and any(user_ref.id in changes for changes in changes_by_date.values()):
+            transaction.update(user_ref, {SUMMARY_FIELD: summaries[user_ref.id]})
+    for date_str, changes in changes_by_date.items():
+        add_leaderboard_changes(transaction, db, date_str, changes)
+    return written
+
+
+class FirestoreRepository(Repository):
+    """Cloud Firestore (AsyncClient). Attendance docs live at attendance/{uid}_{date}."""
+
+    name = "firestore"
+
+    def __init__(self, db):
+        self.db = db
+
+    async def _commit_chunked(self, ops):
+        """Apply (method, *args) batch ops in commits of at most BATCH_LIMIT writes."""
+        for i in range(0, len(ops), BATCH_LIMIT):
+            batch = self.db.batch()
+            for op, *args in ops[i:i + BATCH_LIMIT]:
+                getattr(batch, op)(*args)
+            await batch.commit()
+
+    # Users
+
+    async def get_user(self, uid: str) -> Optional[dict]:
+        user_doc = await self.db.collection("users").document(uid).get()
+        return user_doc.to_dict() if user_doc.exists else None
+
+    async def get_users(self, uids) -> dict:
+        refs = [self.db.collection("users").document(uid) for uid in uids]
+        if not refs:
+            return {}
+        return {doc.id: doc.to_dict() async for doc in self.db.get_all(refs) if doc.exists}
+
+    async def list_users(self) -> list:
+        return [(doc.id, doc.to_dict()) async for doc in self.db.collection("users").stream()]
+
+    async def _write_user(self, op: str, uid: str, data: dict, **kwargs):
+        """Users doc write plus the members version bump, in one batch."""
+        batch = self.db.batch()
+        getattr(batch, op)(self.db.collection("users").document(uid), _to_firestore(data), **kwargs)
+        batch.set(members_version_ref(self.db), {"version": firestore.Increment(1)}, merge=True)
+        await batch.commit()
+
+    async def create_user(self, uid: str, data: dict):
+        await self._write_user("set", uid, data)
+
+    async def update_user(self, uid: str, data: dict):
+        await self._write_user("update", uid, data)
+
+    async def merge_user(self, uid: str, data: dict):
+        await self._write_user("set", uid, data, merge=True)
+
+    async def touch_user(self, uid: str, data: dict):
+        await self.db.collection("users").document(uid).update(_to_firestore(data))
+
+    async def set_summaries(self, summaries: dict):
+        await self._commit_chunked([
+            ("update", self.db.collection("users").document(uid), {SUMMARY_FIELD: summary})
+            for uid, summary in summaries.items()
+        ])
+
+    # Attendance
+
+    async def get_attendance(self, uid: str, date_str: str) -> Optional[dict]:
+        doc = await attendance_ref(self.db, uid, date_str).get()
+        return doc.to_dict() if doc.exists else None
+
+    async def list_attendance_by_date(self, date_str: str) -> list:
+        docs = self.db.collection("attendance").where(filter=FieldFilter("date", "==", date_str)).stream()
+        return [doc.to_dict() async for doc in docs]
+
+    async def list_member_attendance(self, uid: str, start: str = "", end: str = MAX_DATE) -> list:
+        return [doc.to_dict() async for doc in member_records_query(self.db, uid, start, end).stream()]
+
+    async def list_attendance_between(self, start: str, end: str) -> list:
+        docs = (
+            self.db.collection("attendance")
+            .where(filter=FieldFilter("date", ">=", start))
+            .where(filter=FieldFilter("date", "<=", end))
+            .stream()
+        )
+        return [doc.to_dict() async for doc in docs]
+
+    async def list_attendance(self) -> list:
+        return [doc.to_dict() async for doc in self.db.collection("attendance").stream()]
+
+    async def list_attendance_page(self, start: str = "", end: str = MAX_DATE, uid: Optional[str] = None,
+                                   after: Optional[tuple] = None, limit: int = BATCH_LIMIT) -> list:
+        if uid is not None:
+            # A member's doc IDs sort by date
+            query = member_records_query(self.db, uid, start, end).order_by(FieldPath.document_id())
+            if after:
+                query = query.start_after({"__name__": attendance_id(uid, after[0])})
+        else:
+            query = (
+                self.db.collection("attendance")
+                .where(filter=FieldFilter("date", ">=", start))
+                .where(filter=FieldFilter("date", "<=", end))
+                .order_by("date")
+                .order_by(FieldPath.document_id())
+            )
+            if after:
+                query = query.start_after({"date": after[0], "__name__": attendance_id(after[1], after[0])})
+        return [doc.to_dict() async for doc in query.limit(limit).stream()]
+
+    async def record_checkin(self, record: dict) -> bool:
+        # The duplicate check is a point read on the deterministic ID inside the
+        # transaction, so a double-tap cannot create two records
+        return await _checkin_transaction(self.db.transaction(), self.db, record)
+
+    async def record_checkins(self, records: list) -> int:
+        # A transaction per chunk: summaries are read and written back under its
+        # locks, so a concurrent check-in or admin summary update is not clobbered.
+        # Up to three writes per record (record, summary, leaderboard) fit one commit.
+        chunk_size = BATCH_LIMIT // 3
+        written = 0
+        for i in range(0, len(records), chunk_size):
+            written += await _checkins_transaction(self.db.transaction(), self.db, records[i:i + chunk_size])
+        return written
+
+    async def apply_attendance_changes(self, date_str: str, changes: dict) -> dict:
+        db = self.db
+        items = list(changes.items())
+        committed = {}
+        # One slot per chunk is kept for the leaderboard write
+        chunk_size = BATCH_LIMIT - 1
+
+        for i in range(0, len(items), chunk_size):
+            chunk = dict(items[i:i + chunk_size])
+            batch = db.batch()
+            for uid, (old_status, new_status) in chunk.items():
+                ref = attendance_ref(db, uid, date_str)
+                if new_status is None:
+                    batch.delete(ref)
+                elif old_status is not None:
+                    batch.update(ref, {"status": new_status})
+                else:
+                    batch.set(ref, {
+                        "user_id": uid,
+                        "date": date_str,
+                        "timestamp": firestore.SERVER_TIMESTAMP,
+                        "status": new_status,
+                    })
+            add_leaderboard_changes(batch, db, date_str, chunk)
+
+            try:
+                await batch.commit()
+            except Exception as e:
+                logger.error(f"Attendance commit failed for {date_str} ({len(chunk)} records): {e}")
+                committed.update({uid: False for uid in chunk})
+                continue
+            committed.update({uid: True for uid in chunk})
+
+        return committed
+
+    # Leaderboards
+
+    async def get_leaderboard(self, key: str) -> Optional[dict]:
+        lb_doc = await leaderboard_ref(self.db, key).get()
+        return lb_doc.to_dict().get("counts", {}) if lb_doc.exists else None
+
+    async def set_leaderboard(self, key: str, counts: dict):
+        # Merging only these fields replaces counts wholesale but keeps the
+        # version counting up, so a rebuild never reuses an old ETag
+        await leaderboard_ref(self.db, key).set({
+            "counts": counts,
+            "rebuilt_at": firestore.SERVER_TIMESTAMP,
+            "version": firestore.Increment(1),
+        }, merge=["counts", "rebuilt_at", "version"])
+
+    # Data versions
+
+    async def get_versions(self, keys) -> dict:
+        refs = {
+            key: members_version_ref(self.db) if key == MEMBERS_VERSION else leaderboard_ref(self.db, key)
+            for key in keys
+        }
+        if not refs:
+            return {}
+        versions = {
+            doc.reference.path: doc.to_dict().get("version", 0)
+            async for doc in self.db.get_all(list(refs.values())) if doc.exists
+        }
+        return {key: versions.get(ref.path, 0) for key, ref in refs.items()}
+
+    # Maintenance
+
+    async def migrate_attendance_ids(self, dry_run: bool = False) -> dict:
+        """
+        Re-key attendance docs created with random IDs to {uid}_{date}.
+        When several docs share a key, the one already at the deterministic ID
+        (or else the earliest timestamp) is kept and the others are deleted.
+        Returns counts of moved and dropped duplicate docs.
+        """
+        db = self.db
+        groups = {}
+        async for doc in db.collection("attendance").stream():
+            data = doc.to_dict()
+            if not data.get("user_id") or not data.get("date"):
+                continue
+            groups.setdefault(attendance_id(data["user_id"], data["date"]), []).append(doc)
+
+        def timestamp_key(doc):
+            ts = doc.to_dict().get("timestamp")
+            return (ts is None, ts or 0)
+
+        # Writes per key: the copy and the delete of its source share a batch,
+        # so an interrupted run never loses a record
+        stats = {"moved": 0, "duplicates": 0}
+        write_groups = []
+        for key, docs in groups.items():
+            ops = []
+            keeper = next((doc for doc in docs if doc.id == key), None)
+            if keeper is None:
+                keeper = min(docs, key=timestamp_key)
+                ops.append(("set", db.collection("attendance").document(key), keeper.to_dict()))
+                ops.append(("delete", keeper.reference))
+                stats["moved"] += 1
+            for doc in docs:
+                if doc is not keeper:
+                    ops.append(("delete", doc.reference))
+                    stats["duplicates"] += 1
+            if ops:
+                write_groups.append(ops)
+
+        if not dry_run:
+            batch = db.batch()
+            pending = 0
+            for ops in write_groups:
+                if pending + len(ops) > BATCH_LIMIT:
+                    await batch.commit()
+                    batch = db.batch()
+                    pending = 0
+                for op, *args in ops:
+                    getattr(batch, op)(*args)
+                pending += len(ops)
+            if pending:
+                await batch.commit()
+
+        logger.info(f"Attendance ID migration: {stats} (dry_run={dry_run})")
+        return stats
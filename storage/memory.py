@@ -0,0 +1,153 @@
+from datetime import datetime, timezone
+from typing import Optional
+from aggregates import (
+    SUMMARY_FIELD, MEMBERS_VERSION, get_summary, _append,
+    leaderboard_delta, apply_leaderboard_delta, month_key,
+)
+from storage.base import Repository, MAX_DATE, resolve_timestamps
+
+
+class MemoryRepository(Repository):
+    """
+    Process-local dicts, for local runs, benchmarks and load tests.
+    Every operation completes without awaiting, so each one is atomic on the
+    event loop. Data is lost on restart and not shared between workers.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.users = {}          # uid -> users doc
+        self.attendance = {}     # (uid, date) -> record
+        self.leaderboards = {}   # YYYY-MM -> {uid: {present, late}}
+        self.versions = {}       # YYYY-MM / MEMBERS_VERSION -> data version
+
+    def _now(self):
+        return datetime.now(timezone.utc)
+
+    def _bump(self, key: str):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _add_leaderboard_change(self, uid: str, date_str: str, old_status, new_status):
+        delta = leaderboard_delta(old_status, new_status)
+        counts = self.leaderboards.setdefault(month_key(date_str), {})
+        if delta:
+            apply_leaderboard_delta(counts, uid, delta)
+        self._bump(month_key(date_str))
+
+    # Users
+
+    async def get_user(self, uid: str) -> Optional[dict]:
+        user_data = self.users.get(uid)
+        return dict(user_data) if user_data is not None else None
+
+    async def get_users(self, uids) -> dict:
+        return {uid: dict(self.users[uid]) for uid in uids if uid in self.users}
+
+    async def list_users(self) -> list:
+        return [(uid, dict(user_data)) for uid, user_data in self.users.items()]
+
+    async def create_user(self, uid: str, data: dict):
+        self.users[uid] = resolve_timestamps(data, self._now())
+        self._bump(MEMBERS_VERSION)
+
+    async def update_user(self, uid: str, data: dict):
+        if uid not in self.users:
+            raise KeyError(f"users/{uid} not found")
+        self.users[uid].update(resolve_timestamps(data, self._now()))
+        self._bump(MEMBERS_VERSION)
+
+    async def merge_user(self, uid: str, data: dict):
+        self.users.setdefault(uid, {}).update(resolve_timestamps(data, self._now()))
+        self._bump(MEMBERS_VERSION)
+
+    async def touch_user(self, uid: str, data: dict):
+        if uid not in self.users:
+            raise KeyError(f"users/{uid} not found")
+        self.users[uid].update(resolve_timestamps(data, self._now()))
+
+    async def set_summaries(self, summaries: dict):
+        for uid, summary in summaries.items():
+            if uid in self.users:
+                self.users[uid][SUMMARY_FIELD] = summary
+
+    # Attendance
+
+    async def get_attendance(self, uid: str, date_str: str) -> Optional[dict]:
+        record = self.attendance.get((uid, date_str))
+        return dict(record) if record is not None else None
+
+    async def list_attendance_by_date(self, date_str: str) -> list:
+        return [dict(r) for (_, date), r in self.attendance.items() if date == date_str]
+
+    async def list_member_attendance(self, uid: str, start: str = "", end: str = MAX_DATE) -> list:
+        records = [
+            dict(r) for (user_id, date), r in self.attendance.items()
+            if user_id == uid and start <= date <= end
+        ]
+        return sorted(records, key=lambda r: r["date"])
+
+    async def list_attendance_between(self, start: str, end: str) -> list:
+        return [dict(r) for (_, date), r in self.attendance.items() if start <= date <= end]
+
+    async def list_attendance(self) -> list:
+        return [dict(r) for r in self.attendance.values()]
+
+    async def list_attendance_page(self, start: str = "", end: str = MAX_DATE, uid: Optional[str] = None,
+                                   after: Optional[tuple] = None, limit: int = 500) -> list:
+        keys = sorted(
+            (date, user_id) for user_id, date in self.attendance
+            if start <= date <= end and (uid is None or user_id == uid) and (after is None or (date, user_id) > tuple(after))
+        )
+        return [dict(self.attendance[(user_id, date)]) for date, user_id in keys[:limit]]
+
+    async def record_checkin(self, record: dict) -> bool:
+        return await self.record_checkins([record]) == 1
+
+    async def record_checkins(self, records: list) -> int:
+        now = self._now()
+        written = 0
+        for record in sorted(records, key=lambda r: r["date"]):
+            uid, date_str = record["user_id"], record["date"]
+            if (uid, date_str) in self.attendance:
+                continue
+            self.attendance[(uid, date_str)] = resolve_timestamps(record, now)
+            # Like set_summaries, only existing members get a summary
+            user_data = self.users.get(uid)
+            if user_data is not None:
+                summary = get_summary(user_data)
+                _append(summary, date_str, record["status"], record.get("point", 0))
+                user_data[SUMMARY_FIELD] = summary
+            self._add_leaderboard_change(uid, date_str, None, record["status"])
+            written += 1
+        return written
+
+    async def apply_attendance_changes(self, date_str: str, changes: dict) -> dict:
+        now = self._now()
+        for uid, (old_status, new_status) in changes.items():
+            key = (uid, date_str)
+            if new_status is None:
+                self.attendance.pop(key, None)
+            elif key in self.attendance:
+                self.attendance[key]["status"] = new_status
+            else:
+                self.attendance[key] = {"user_id": uid, "date": date_str, "timestamp": now, "status": new_status}
+            self._add_leaderboard_change(uid, date_str, old_status, new_status)
+        return {uid: True for uid in changes}
+
+    # Leaderboards
+
+    async def get_leaderboard(self, key: str) -> Optional[dict]:
+        counts = self.leaderboards.get(key)
+        if counts is None:
+            return None
+        return {uid: dict(entry) for uid, entry in counts.items()}
+
+    async def set_leaderboard(self, key: str, counts: dict):
+        self.leaderboards[key] = {uid: dict(entry) for uid, entry in counts.items()}
+        self._bump(key)
+
+    # Data versions
+
+    async def get_versions(self, keys) -> dict:
+        return {key: self.versions.get(key, 0) for key in keys}
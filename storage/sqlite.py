@@ -0,0 +1,329 @@
+import json
+import asyncio
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+from aggregates import (
+    SUMMARY_FIELD, MEMBERS_VERSION, BATCH_LIMIT, get_summary, _append,
+    leaderboard_delta, apply_leaderboard_delta, month_key,
+)
+from storage.base import Repository, MAX_DATE, resolve_timestamps
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    uid TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, date)
+);
+CREATE INDEX IF NOT EXISTS attendance_date ON attendance (date);
+CREATE TABLE IF NOT EXISTS leaderboards (
+    month TEXT PRIMARY KEY,
+    counts TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    key TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, default=lambda value: value.isoformat())
+
+
+class SQLiteRepository(Repository):
+    """
+    Single-file SQLite database; documents are stored as JSON next to their keys.
+    Statements run in asyncio.to_thread() workers, so a slow disk or a writer
+    waiting on the database lock does not stall the event loop; a lock
+    serializes them on the shared connection.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _run_transaction(self, body):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = body(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    async def _transaction(self, body):
+        """Run body(conn) in one transaction, off the event loop; returns its result."""
+        return await asyncio.to_thread(self._run_transaction, body)
+
+    def _run_query(self, sql: str, params) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def _query(self, sql: str, params=()) -> list:
+        return await asyncio.to_thread(self._run_query, sql, params)
+
+    def _now(self):
+        return datetime.now(timezone.utc)
+
+    def _load_user(self, conn, uid: str) -> Optional[dict]:
+        row = conn.execute("SELECT data FROM users WHERE uid = ?", (uid,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def _save_user(self, conn, uid: str, data: dict):
+        conn.execute(
+            "INSERT INTO users (uid, data) VALUES (?, ?) ON CONFLICT (uid) DO UPDATE SET data = excluded.data",
+            (uid, _dumps(data)),
+        )
+
+    def _bump(self, conn, key: str):
+        conn.execute(
+            "INSERT INTO versions (key, version) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET version = version + 1",
+            (key,),
+        )
+
+    def _add_leaderboard_changes(self, conn, date_str: str, changes: dict):
+        key = month_key(date_str)
+        row = conn.execute("SELECT counts FROM leaderboards WHERE month = ?", (key,)).fetchone()
+        counts = json.loads(row["counts"]) if row else {}
+        for uid, (old_status, new_status) in changes.items():
+            delta = leaderboard_delta(old_status, new_status)
+            if delta:
+                apply_leaderboard_delta(counts, uid, delta)
+        conn.execute(
+            "INSERT INTO leaderboards (month, counts) VALUES (?, ?) "
+            "ON CONFLICT (month) DO UPDATE SET counts = excluded.counts",
+            (key, _dumps(counts)),
+        )
+        self._bump(conn, key)
+
+    # Users
+
+    async def get_user(self, uid: str) -> Optional[dict]:
+        rows = await self._query("SELECT data FROM users WHERE uid = ?", (uid,))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    async def get_users(self, uids) -> dict:
+        uids = list(uids)
+        result = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(uids), BATCH_LIMIT):
+            chunk = uids[i:i + BATCH_LIMIT]
+            placeholders = ",".join("?" * len(chunk))
+            for row in await self._query(f"SELECT uid, data FROM users WHERE uid IN ({placeholders})", chunk):
+                result[row["uid"]] = json.loads(row["data"])
+        return result
+
+    async def list_users(self) -> list:
+        return [(row["uid"], json.loads(row["data"])) for row in await self._query("SELECT uid, data FROM users")]
+
+    async def create_user(self, uid: str, data: dict):
+        def write(conn):
+            self._save_user(conn, uid, resolve_timestamps(data, self._now()))
+            self._bump(conn, MEMBERS_VERSION)
+
+        await self._transaction(write)
+
+    async def update_user(self, uid: str, data: dict):
+        def write(conn):
+            user_data = self._load_user(conn, uid)
+            if user_data is None:
+                raise KeyError(f"users/{uid} not found")
+            user_data.update(resolve_timestamps(data, self._now()))
+            self._save_user(conn, uid, user_data)
+            self._bump(conn, MEMBERS_VERSION)
+
+        await self._transaction(write)
+
+    async def merge_user(self, uid: str, data: dict):
+        def write(conn):
+            user_data = self._load_user(conn, uid) or {}
+            user_data.update(resolve_timestamps(data, self._now()))
+            self._save_user(conn, uid, user_data)
+            self._bump(conn, MEMBERS_VERSION)
+
+        await self._transaction(write)
+
+    async def touch_user(self, uid: str, data: dict):
+        def write(conn):
+            user_data = self._load_user(conn, uid)
+            if user_data is None:
+                raise KeyError(f"users/{uid} not found")
+            user_data.update(resolve_timestamps(data, self._now()))
+            self._save_user(conn, uid, user_data)
+
+        await self._transaction(write)
+
+    async def set_summaries(self, summaries: dict):
+        def write(conn):
+            for uid, summary in summaries.items():
+                user_data = self._load_user(conn, uid)
+                if user_data is not None:
+                    user_data[SUMMARY_FIELD] = summary
+                    self._save_user(conn, uid, user_data)
+
+        await self._transaction(write)
+
+    # Attendance
+
+    async def get_attendance(self, uid: str, date_str: str) -> Optional[dict]:
+        rows = await self._query("SELECT data FROM attendance WHERE user_id = ? AND date = ?", (uid, date_str))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    async def list_attendance_by_date(self, date_str: str) -> list:
+        return [json.loads(row["data"]) for row in await self._query("SELECT data FROM attendance WHERE date = ?", (date_str,))]
+
+    async def list_member_attendance(self, uid: str, start: str = "", end: str = MAX_DATE) -> list:
+        rows = await self._query(
+            "SELECT data FROM attendance WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date",
+            (uid, start, end),
+        )
+        return [json.loads(row["data"]) for row in rows]
+
+    async def list_attendance_between(self, start: str, end: str) -> list:
+        rows = await self._query("SELECT data FROM attendance WHERE date BETWEEN ? AND ?", (start, end))
+        return [json.loads(row["data"]) for row in rows]
+
+    async def list_attendance(self) -> list:
+        return [json.loads(row["data"]) for row in await self._query("SELECT data FROM attendance")]
+
+    async def list_attendance_page(self, start: str = "", end: str = MAX_DATE, uid: Optional[str] = None,
+                                   after: Optional[tuple] = None, limit: int = BATCH_LIMIT) -> list:
+        sql = "SELECT data FROM attendance WHERE date BETWEEN ? AND ?"
+        params = [start, end]
+        if uid is not None:
+            sql += " AND user_id = ?"
+            params.append(uid)
+        if after:
+            sql += " AND (date, user_id) > (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY date, user_id LIMIT ?"
+        params.append(limit)
+        return [json.loads(row["data"]) for row in await self._query(sql, params)]
+
+    async def record_checkin(self, record: dict) -> bool:
+        return await self.record_checkins([record]) == 1
+
+    async def record_checkins(self, records: list) -> int:
+        now = self._now()
+
+        def write(conn):
+            written = 0
+            users = {}
+            changes_by_date = {}
+            for record in sorted(records, key=lambda r: r["date"]):
+                uid, date_str = record["user_id"], record["date"]
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO attendance (user_id, date, data) VALUES (?, ?, ?)",
+                    (uid, date_str, _dumps(resolve_timestamps(record, now))),
+                ).rowcount
+                if not inserted:
+                    continue
+                if uid not in users:
+                    users[uid] = self._load_user(conn, uid)
+                user_data = users[uid]
+                # Like set_summaries, only existing members get a summary
+                if user_data is not None:
+                    summary = get_summary(user_data)
+                    _append(summary, date_str, record["status"], record.get("point", 0))
+                    user_data[SUMMARY_FIELD] = summary
+                changes_by_date.setdefault(date_str, {})[uid] = (None, record["status"])
+                written += 1
+
+            for uid, user_data in users.items():
+                if user_data is not None:
+                    self._save_user(conn, uid, user_data)
+            for date_str, changes in changes_by_date.items():
+                self._add_leaderboard_changes(conn, date_str, changes)
+            return written
+
+        return await self._transaction(write)
+
+    async def apply_attendance_changes(self, date_str: str, changes: dict) -> dict:
+        now = self._now()
+        items = list(changes.items())
+        committed = {}
+
+        for i in range(0, len(items), BATCH_LIMIT):
+            chunk = dict(items[i:i + BATCH_LIMIT])
+            try:
+                def write(conn):
+                    for uid, (old_status, new_status) in chunk.items():
+                        if new_status is None:
+                            conn.execute("DELETE FROM attendance WHERE user_id = ? AND date = ?", (uid, date_str))
+                            continue
+                        row = conn.execute(
+                            "SELECT data FROM attendance WHERE user_id = ? AND date = ?", (uid, date_str)
+                        ).fetchone()
+                        record = json.loads(row["data"]) if row else {
+                            "user_id": uid, "date": date_str, "timestamp": now,
+                        }
+                        record["status"] = new_status
+                        conn.execute(
+                            "INSERT INTO attendance (user_id, date, data) VALUES (?, ?, ?) "
+                            "ON CONFLICT (user_id, date) DO UPDATE SET data = excluded.data",
+                            (uid, date_str, _dumps(record)),
+                        )
+                    self._add_leaderboard_changes(conn, date_str, chunk)
+
+                await self._transaction(write)
+            except sqlite3.Error as e:
+                logger.error(f"Attendance commit failed for {date_str} ({len(chunk)} records): {e}")
+                committed.update({uid: False for uid in chunk})
+                continue
+            committed.update({uid: True for uid in chunk})
+
+        return committed
+
+    # Leaderboards
+
+    async def get_leaderboard(self, key: str) -> Optional[dict]:
+        rows = await self._query("SELECT counts FROM leaderboards WHERE month = ?", (key,))
+        return json.loads(rows[0]["counts"]) if rows else None
+
+    async def set_leaderboard(self, key: str, counts: dict):
+        def write(conn):
+            conn.execute(
+                "INSERT INTO leaderboards (month, counts) VALUES (?, ?) "
+                "ON CONFLICT (month) DO UPDATE SET counts = excluded.counts",
+                (key, _dumps(counts)),
+            )
+            self._bump(conn, key)
+
+        await self._transaction(write)
+
+    # Data versions
+
+    async def get_versions(self, keys) -> dict:
+        keys = list(keys)
+        placeholders = ",".join("?" * len(keys))
+        rows = await self._query(f"SELECT key, version FROM versions WHERE key IN ({placeholders})", keys) if keys else []
+        versions = {row["key"]: row["version"] for row in rows}
+        return {key: versions.get(key, 0) for key in keys}
+
+    def _close(self):
+        with self._lock:
+            self._conn.close()
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
@@ -0,0 +1,128 @@
+import os
+import hashlib
+import logging
+import tempfile
+from collections import OrderedDict
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Compiled template bytecode. `manage.py compile-templates`, run in the deploy
+# build with the runtime's Python version, writes it to TEMPLATE_BUNDLE_DIR,
+# which ships with the app and is only read, so a cold worker loads it instead
+# of re-parsing index.html. Templates missing from the bundle (or stale) are
+# compiled on first use and kept in TEMPLATE_CACHE_DIR for the other workers
+# of a warm instance (Vercel allows writes to /tmp only).
+TEMPLATE_DIR = "templates"
+TEMPLATE_BUNDLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template_bytecode")
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "magnus-jinja"))
+
+# Rendered fragments of sections that are the same for every visitor (ranking
+# rows, month header). Callers key them by month and the data shown, so a stale
+# entry is never served; the size bound only evicts old months.
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "32"))
+
+_fragments = OrderedDict()
+
+
+def _bytecode_cache(directory: str, bundle_dir=None):
+    """
+    A FileSystemBytecodeCache on `directory` that reads bundle_dir first.
+    Keys depend on the template name only (not the file path, which differs
+    between the build and the runtime); Jinja still checks the source checksum
+    and Python version of what it loads.
+    """
+    import jinja2
+
+    class BytecodeCache(jinja2.FileSystemBytecodeCache):
+        def get_cache_key(self, name, filename=None):
+            return hashlib.sha1(name.encode("utf-8")).hexdigest()
+
+        def load_bytecode(self, bucket):
+            if bundle_dir:
+                try:
+                    with open(os.path.join(bundle_dir, self.pattern % bucket.key), "rb") as f:
+                        bucket.load_bytecode(f)
+                except OSError:
+                    pass
+                if bucket.code is not None:
+                    return
+            if directory:
+                super().load_bytecode(bucket)
+
+        def dump_bytecode(self, bucket):
+            if directory:
+                super().dump_bytecode(bucket)
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Template bytecode cache not writable, using the bundled one only ({e})")
+        directory = None
+    return BytecodeCache(directory or tempfile.gettempdir())
+
+
+@lru_cache(maxsize=None)
+def get_templates():
+    """Shared Jinja2Templates, created (and jinja2 imported) on the first page render."""
+    import jinja2
+    from fastapi.templating import Jinja2Templates
+
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        bytecode_cache=_bytecode_cache(TEMPLATE_CACHE_DIR, TEMPLATE_BUNDLE_DIR),
+    )
+    from static_assets import static_url
+    env.globals["static_url"] = static_url
+    return Jinja2Templates(env=env)
+
+
+def render(name: str, **context):
+    """Render a template (a partial) to Markup, for inclusion in another template."""
+    from markupsafe import Markup
+    return Markup(get_templates().get_template(name).render(context))
+
+
+def join_fragments(fragments):
+    from markupsafe import Markup
+    return Markup("\n").join(fragments)
+
+
+def get_fragment(key):
+    value = _fragments.get(key)
+    if value is not None:
+        _fragments.move_to_end(key)
+    return value
+
+
+def set_fragment(key, value):
+    _fragments[key] = value
+    _fragments.move_to_end(key)
+    while len(_fragments) > FRAGMENT_CACHE_SIZE:
+        _fragments.popitem(last=False)
+
+
+def cached_render(key, name: str, **context):
+    """render() memoized under key; the key must cover everything the output depends on."""
+    value = get_fragment((name, key))
+    if value is None:
+        value = render(name, **context)
+        set_fragment((name, key), value)
+    return value
+
+
+def precompile(directory: str = TEMPLATE_BUNDLE_DIR) -> int:
+    """Compile every template into the bundled bytecode (in the deploy build). Returns the count."""
+    import jinja2
+
+    os.makedirs(directory, exist_ok=True)
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        bytecode_cache=_bytecode_cache(directory),
+    )
+    names = env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    for name in names:
+        env.get_template(name)
+    return len(names)
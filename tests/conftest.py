@@ -0,0 +1,61 @@
+import os
+import sys
+
+# Modules live at the repository root; the app runs on the in-memory backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["ADMIN_UID"] = "admin"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import asyncio  # noqa: E402
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+import database  # noqa: E402
+import metrics  # noqa: E402
+import roster  # noqa: E402
+import member_index  # noqa: E402
+import aggregates  # noqa: E402
+import attendance_cache  # noqa: E402
+import templating  # noqa: E402
+from storage import create_repository  # noqa: E402
+from dependencies import sign_uid  # noqa: E402
+
+
+@pytest.fixture
+def repo():
+    """A fresh in-memory repository behind the app, with every process cache emptied."""
+    database.repo = metrics.instrument(create_repository("memory"))
+    roster.clear()
+    member_index.invalidate()
+    attendance_cache._days.clear()
+    attendance_cache._pending.clear()
+    aggregates._built.clear()
+    templating._fragments.clear()
+    metrics.reset()
+    yield database.repo
+    database.repo = None
+
+
+@pytest.fixture
+def call(repo):
+    """
+    call(method, path, uid=None, **kwargs) -> httpx.Response, against the app
+    in one request's event loop, signed in as uid.
+    """
+    import main
+
+    def call(method, path, uid=None, **kwargs):
+        async def request():
+            transport = httpx.ASGITransport(app=main.app, client=("127.0.0.1", 123))
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                if uid:
+                    client.cookies.set("user_uid", sign_uid(uid))
+                return await client.request(method, path, **kwargs)
+
+        return asyncio.run(request())
+
+    return call
+
+
+def run(coro):
+    return asyncio.run(coro)
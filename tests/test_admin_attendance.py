@@ -0,0 +1,70 @@
+import aggregates
+from conftest import run
+
+XHR = {"X-Requested-With": "XMLHttpRequest"}
+
+
+def add_members(repo, count):
+    async def create():
+        await repo.create_user("admin", {"uid": "admin", "nickname": "Admin", "is_auth": "approved"})
+        for i in range(count):
+            await repo.create_user(f"u{i}", {"uid": f"u{i}", "nickname": f"Member {i}", "is_auth": "approved"})
+    run(create())
+
+
+def test_batch_edit_of_unbuilt_month_rebuilds_its_leaderboard(repo, call):
+    add_members(repo, 3)
+    # Records from before the leaderboard existed: raw attendance, no leaderboards/2025-02 doc
+    for uid, date, status in [("u0", "2025-02-01", "present"), ("u1", "2025-02-01", "late"), ("u0", "2025-02-08", "present")]:
+        repo.attendance[(uid, date)] = {"user_id": uid, "date": date, "status": status}
+    assert run(repo.get_leaderboard("2025-02")) is None
+
+    response = call("POST", "/admin/api/attendance/batch", uid="admin", headers=XHR,
+                    json={"date": "2025-02-08", "user_ids": ["u2"], "status": "late"})
+    assert response.status_code == 200
+    assert response.json()["counts"]["created"] == 1
+
+    # Every member of the month, not only the one just edited
+    assert run(repo.get_leaderboard("2025-02")) == {
+        "u0": {"present": 2, "late": 0},
+        "u1": {"present": 0, "late": 1},
+        "u2": {"present": 0, "late": 1},
+    }
+    assert run(aggregates.rebuild_leaderboard(repo, "2025-02", write=False)) == {}
+
+
+def test_batch_edit_of_built_month_applies_deltas(repo, call):
+    add_members(repo, 2)
+    run(repo.set_leaderboard("2025-03", {"u0": {"present": 1, "late": 0}}))
+    repo.attendance[("u0", "2025-03-01")] = {"user_id": "u0", "date": "2025-03-01", "status": "present"}
+
+    response = call("POST", "/admin/api/attendance/batch", uid="admin", headers=XHR,
+                    json={"date": "2025-03-08", "user_ids": ["u0", "u1"], "status": "present"})
+    assert response.status_code == 200
+    assert run(repo.get_leaderboard("2025-03")) == {"u0": {"present": 2, "late": 0}, "u1": {"present": 1}}
+
+
+def test_batch_rejects_malformed_date_before_writing(repo, call):
+    add_members(repo, 1)
+    response = call("POST", "/admin/api/attendance/batch", uid="admin", headers=XHR,
+                    json={"date": "2025-13-45", "user_ids": ["u0"], "status": "present"})
+    assert response.status_code == 400
+    assert repo.attendance == {}
+    assert repo.leaderboards == {}
+
+
+def test_batch_reports_stale_summaries(repo, call, monkeypatch):
+    add_members(repo, 1)
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("summary write failed")
+    monkeypatch.setattr(aggregates, "apply_changes", fail)
+
+    response = call("POST", "/admin/api/attendance/batch", uid="admin", headers=XHR,
+                    json={"date": "2025-03-08", "user_ids": ["u0"], "status": "present"})
+    assert response.status_code == 200
+    assert response.json()["summaries_stale"] is True
+    assert "backfill-summary" in response.json()["message"]
+    # Attendance and the leaderboard stay committed
+    assert repo.attendance[("u0", "2025-03-08")]["status"] == "present"
+    assert run(repo.get_leaderboard("2025-03"))["u0"]["present"] == 1
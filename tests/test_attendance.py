@@ -0,0 +1,38 @@
+from datetime import datetime
+import pytest
+import logic
+from routers import attendance
+from conftest import run
+
+XHR = {"X-Requested-With": "XMLHttpRequest"}
+
+
+@pytest.fixture
+def session_open(monkeypatch):
+    """Check-in window open on 2025-02-15 12:55 KST."""
+    now = logic.KST.localize(datetime(2025, 2, 15, 12, 55))
+    monkeypatch.setattr(attendance, "get_current_kst_time", lambda: now)
+    monkeypatch.setattr(attendance, "check_attendance_time", lambda: ("open", "출석 가능"))
+
+
+def test_first_checkin_of_unbuilt_month_builds_its_leaderboard(repo, call, session_open):
+    run(repo.create_user("u2", {"uid": "u2", "nickname": "Member", "is_auth": "approved"}))
+    # Records from before the leaderboard existed: raw attendance, no leaderboards/2025-02 doc
+    for uid, date in [("u0", "2025-02-01"), ("u1", "2025-02-08")]:
+        repo.attendance[(uid, date)] = {"user_id": uid, "date": date, "status": "present"}
+
+    response = call("POST", "/attendance", uid="u2", headers=XHR)
+    assert response.status_code == 200
+
+    assert run(repo.get_leaderboard("2025-02")) == {
+        "u0": {"present": 1, "late": 0},
+        "u1": {"present": 1, "late": 0},
+        "u2": {"present": 1},
+    }
+
+
+def test_first_checkin_of_new_month_starts_its_leaderboard(repo, call, session_open):
+    run(repo.create_user("u2", {"uid": "u2", "nickname": "Member", "is_auth": "approved"}))
+
+    assert call("POST", "/attendance", uid="u2", headers=XHR).status_code == 200
+    assert run(repo.get_leaderboard("2025-02")) == {"u2": {"present": 1}}
@@ -0,0 +1,42 @@
+from datetime import date
+import attendance_import
+from conftest import run
+
+CSV = "uid,date,status\nu0,2025-02-01,present\nu0,2025-02-08,late\nu1,2025-02-08,present\n"
+
+
+def seed(repo):
+    async def create():
+        for uid in ("u0", "u1"):
+            await repo.create_user(uid, {"uid": uid, "nickname": uid, "is_auth": "approved"})
+    run(create())
+
+
+def test_dry_run_notes_per_date_commits(repo):
+    seed(repo)
+    result = run(attendance_import.run(repo, CSV, date(2025, 3, 1), dry_run=True))
+    assert result["dates"] == 2
+    assert "committed separately" in result["message"]
+    assert repo.attendance == {}
+
+
+def test_failed_date_is_reported_and_earlier_dates_stay_saved(repo, monkeypatch):
+    seed(repo)
+    apply = repo._repo.apply_attendance_changes
+
+    async def fail_second_date(date_str, changes):
+        if date_str == "2025-02-08":
+            return {uid: False for uid in changes}
+        return await apply(date_str, changes)
+    monkeypatch.setattr(repo._repo, "apply_attendance_changes", fail_second_date)
+
+    result = run(attendance_import.run(repo, CSV, date(2025, 3, 1)))
+    assert result["failed_dates"] == ["2025-02-08"]
+    assert result["counts"]["created"] == 1 and result["counts"]["failed"] == 2
+    assert set(repo.attendance) == {("u0", "2025-02-01")}
+
+    # Re-running the file writes only what is missing
+    monkeypatch.undo()
+    result = run(attendance_import.run(repo, CSV, date(2025, 3, 1)))
+    assert result["counts"] == {"created": 2, "updated": 0, "deleted": 0, "unchanged": 1, "failed": 0}
+    assert "failed_dates" not in result
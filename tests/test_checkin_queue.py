@@ -0,0 +1,81 @@
+"""Write-behind check-in queue (CHECKIN_SURGE_MODE)."""
+import json
+from datetime import datetime
+import pytest
+import attendance_cache
+import checkin_queue
+from storage import create_repository
+from conftest import run
+
+AT = datetime.fromisoformat("2025-03-08T12:55:00+09:00")
+
+
+class PoisonRepository:
+    """Fails every batch that contains `poison`, like a record the datastore rejects."""
+
+    def __init__(self, poison: str):
+        self._repo = create_repository("memory")
+        self.poison = poison
+        self.down = False
+
+    async def record_checkins(self, records):
+        if self.down:
+            raise ConnectionError("down")
+        if any(record["user_id"] == self.poison for record in records):
+            raise ValueError("rejected")
+        return await self._repo.record_checkins(records)
+
+    def __getattr__(self, name):
+        return getattr(self._repo, name)
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkin_queue, "SPILL_PATH", str(tmp_path / "spill.jsonl"))
+    monkeypatch.setattr(checkin_queue, "DEAD_LETTER_PATH", str(tmp_path / "dead.jsonl"))
+    monkeypatch.setattr(checkin_queue, "MAX_ATTEMPTS", 2)
+    checkin_queue._pending.clear()
+    checkin_queue._attempts.clear()
+    attendance_cache._days.clear()
+    yield checkin_queue
+    checkin_queue._pending.clear()
+    checkin_queue._attempts.clear()
+
+
+def test_poison_record_does_not_block_the_queue(queue):
+    repo = PoisonRepository("bad")
+    queue._repo = repo
+    for uid in ("a", "bad", "b"):
+        assert run(queue.accept(repo, uid, "2025-03-08", "present", AT))
+
+    with pytest.raises(RuntimeError):
+        run(queue.flush())
+    # The others are stored; the bad one waits for another attempt
+    assert run(repo.get_attendance("a", "2025-03-08")) is not None
+    assert run(repo.get_attendance("b", "2025-03-08")) is not None
+    assert [record["user_id"] for record in queue._pending] == ["bad"]
+
+    assert run(queue.accept(repo, "c", "2025-03-08", "present", AT))
+    run(queue.flush())
+
+    assert queue._pending == []
+    assert run(repo.get_attendance("c", "2025-03-08")) is not None
+    assert run(repo.get_attendance("bad", "2025-03-08")) is None
+    assert attendance_cache.get_status("bad", "2025-03-08") is None
+    with open(queue.DEAD_LETTER_PATH, encoding="utf-8") as f:
+        dead = [json.loads(line) for line in f]
+    assert [(record["user_id"], record["error"]) for record in dead] == [("bad", "ValueError('rejected')")]
+
+
+def test_failure_of_every_record_blames_none(queue):
+    repo = PoisonRepository("bad")
+    queue._repo = repo
+    for uid in ("bad", "bad2"):
+        run(queue.accept(repo, uid, "2025-03-08", "present", AT))
+    repo.down = True
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            run(queue.flush())
+    assert len(queue._pending) == 2
+    assert queue._attempts == {}
@@ -0,0 +1,53 @@
+from google.cloud.firestore_v1 import _helpers
+from google.cloud.firestore_v1.field_path import FieldPath
+from storage.firestore import add_leaderboard_changes
+
+
+class RecordingBatch:
+    def __init__(self):
+        self.writes = []
+
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref, data, merge))
+
+
+class FakeDB:
+    def collection(self, name):
+        return self
+
+    def document(self, key):
+        return key
+
+
+def merge_paths(data):
+    """The field paths a Firestore merge-set of data replaces."""
+    extractor = _helpers.DocumentExtractorForMerge(data)
+    extractor.apply_merge(True)
+    return extractor.data_merge
+
+
+def test_counter_deltas_merge_per_member():
+    batch = RecordingBatch()
+    add_leaderboard_changes(batch, FakeDB(), "2025-03-08", {"u1": (None, "present"), "u2": ("present", "late")})
+
+    [(ref, data, merge)] = batch.writes
+    assert ref == "2025-03" and merge
+    # Only the members' counters are touched, not the whole counts map
+    assert FieldPath("counts") not in merge_paths(data)
+    assert set(data["counts"]) == {"u1", "u2"}
+
+
+def test_zero_deltas_do_not_replace_counts():
+    batch = RecordingBatch()
+    add_leaderboard_changes(batch, FakeDB(), "2025-03-08", {"u1": ("present", "present"), "u2": ("sick", None)})
+
+    [(ref, data, merge)] = batch.writes
+    assert "counts" not in data
+    assert FieldPath("counts") not in merge_paths(data)
+    assert merge_paths(data) == []  # transforms only: the version increment
+
+
+def test_no_changes_no_write():
+    batch = RecordingBatch()
+    add_leaderboard_changes(batch, FakeDB(), "2025-03-08", {})
+    assert batch.writes == []
@@ -0,0 +1,66 @@
+import httpx
+import pytest
+import aggregates
+import kakao
+from conftest import run
+
+PROFILE = {"image": "https://k.kakaocdn.net/dn/a.jpg"}
+
+
+@pytest.fixture
+def kakao_stub(monkeypatch):
+    """Kakao OAuth answering for member 42 with the profile image in PROFILE."""
+    monkeypatch.setenv("KAKAO_CLIENT_ID", "test")
+
+    def handler(request):
+        if request.url.path == "/oauth/token":
+            return httpx.Response(200, json={"access_token": "token"})
+        return httpx.Response(200, json={
+            "id": 42,
+            "kakao_account": {"profile": {"nickname": "Kakao Name", "profile_image_url": PROFILE["image"]}},
+        })
+
+    kakao.use_transport(httpx.MockTransport(handler))
+    yield
+    kakao.use_transport(None)
+
+
+def members_version(repo):
+    return run(repo.get_versions([aggregates.MEMBERS_VERSION]))[aggregates.MEMBERS_VERSION]
+
+
+def login(call):
+    response = call("GET", "/auth/kakao/callback", params={"code": "abc"}, follow_redirects=False)
+    assert response.status_code == 307
+    return response
+
+
+def test_repeat_login_keeps_the_members_version(repo, call, kakao_stub):
+    login(call)
+    assert run(repo.get_user("42"))["is_auth"] == "pending"
+    version = members_version(repo)
+
+    repo.users["42"]["last_login"] = "earlier"
+    response = login(call)
+    assert members_version(repo) == version
+    assert "writes=1" in response.headers["server-timing"]
+    # last_login is still recorded on every login
+    assert run(repo.get_user("42"))["last_login"] != "earlier"
+
+
+def test_login_with_new_profile_image_updates_it(repo, call, kakao_stub, monkeypatch):
+    login(call)
+    version = members_version(repo)
+
+    monkeypatch.setitem(PROFILE, "image", "https://k.kakaocdn.net/dn/b.jpg")
+    login(call)
+    assert run(repo.get_user("42"))["profile_image"] == "https://k.kakaocdn.net/dn/b.jpg"
+    assert members_version(repo) > version
+
+
+def test_withdrawn_member_logging_in_needs_approval_again(repo, call, kakao_stub):
+    login(call)
+    run(repo.update_user("42", {"is_auth": "withdrawn"}))
+
+    login(call)
+    assert run(repo.get_user("42"))["is_auth"] == "pending"
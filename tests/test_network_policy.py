@@ -0,0 +1,50 @@
+import os
+import pytest
+import network_policy
+
+VERCEL_EDGE = "76.76.21.21"
+GYM = "211.1.2.3"
+
+
+def test_trust_all_follows_a_public_edge_proxy():
+    policy = network_policy.build_policy(["211.1.2.0/28"], network_policy._valid(network_policy._split("*")))
+
+    client = network_policy.client_ip(VERCEL_EDGE, GYM, policy)
+    assert client == GYM
+    assert network_policy.is_allowed(client, policy)
+    # The leftmost address, as the platform reports it
+    assert network_policy.client_ip(VERCEL_EDGE, f"{GYM}, 10.0.0.1", policy) == GYM
+
+
+@pytest.mark.skipif("TRUSTED_PROXIES" in os.environ, reason="TRUSTED_PROXIES is set")
+def test_default_trusts_only_private_proxies():
+    policy = network_policy.get_policy()
+    assert network_policy.parse_address("10.0.0.5") in policy.trusted_proxies
+    assert network_policy.parse_address(VERCEL_EDGE) not in policy.trusted_proxies
+    # Reached directly, a client cannot claim the gym's address
+    assert network_policy.client_ip("8.8.8.8", GYM, policy) == "8.8.8.8"
+
+
+@pytest.mark.parametrize("trusted", [["*"], ["10.0.0.0/8", "127.0.0.0/8"]])
+def test_forwarded_loopback_needs_a_loopback_peer(trusted):
+    policy = network_policy.build_policy([], network_policy._valid(trusted))
+
+    assert network_policy.client_ip("10.0.0.5", "127.0.0.1", policy) == "10.0.0.5"
+    assert not network_policy.is_allowed(network_policy.client_ip("10.0.0.5", "::1, 127.0.0.1", policy), policy)
+    # A proxy on the same host may report a local client
+    assert network_policy.client_ip("127.0.0.1", "127.0.0.1", policy) == "127.0.0.1"
+
+
+def test_listed_proxies_ignore_forged_headers():
+    policy = network_policy.build_policy(["211.1.2.0/28"], ["10.0.0.0/8"])
+
+    # Reached directly: a public peer cannot claim the gym's address
+    assert network_policy.client_ip("8.8.8.8", GYM, policy) == "8.8.8.8"
+    assert not network_policy.is_allowed(network_policy.client_ip("8.8.8.8", GYM, policy), policy)
+    # Through the server's own proxy the header is believed
+    assert network_policy.client_ip("10.0.0.5", GYM, policy) == GYM
+
+
+def test_chain_walk_stops_at_first_untrusted_hop():
+    policy = network_policy.build_policy([], ["10.0.0.0/8"])
+    assert network_policy.client_ip("10.0.0.5", f"{GYM}, 9.9.9.9, 10.1.1.1", policy) == "9.9.9.9"
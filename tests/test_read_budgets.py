@@ -0,0 +1,66 @@
+"""
+Datastore read budgets for the busiest pages (see metrics.check_read_budget).
+Reads must not grow with the number of members: a lookup per member (N+1)
+fails here before it reaches Firestore's bill.
+"""
+import pytest
+from logic import get_current_kst_time
+from metrics import check_read_budget
+from storage import SERVER_TIMESTAMP
+from conftest import run
+
+# (fixed reads, queries) per request on cold process caches. Listings bill a
+# read per document, so members listed or ranked add one read each on top.
+BUDGETS = {
+    "/": (3, 4),
+    "/api/ranking": (3, 4),
+    "/admin": (3, 2),
+    "/admin/api/members": (3, 2),
+    "/admin/api/members/summary": (3, 2),
+}
+
+
+def seed(repo, members: int):
+    """Approved members, some with check-ins on the first days of the current month."""
+    month = get_current_kst_time().strftime("%Y-%m")
+
+    async def create():
+        await repo.create_user("admin", {"uid": "admin", "nickname": "Admin", "is_auth": "approved"})
+        for i in range(members):
+            uid = f"u{i:03d}"
+            await repo.create_user(uid, {
+                "uid": uid, "nickname": f"Member {i:03d}", "is_auth": "approved",
+                "profile_image": f"https://k.kakaocdn.net/{uid}.jpg",
+            })
+            for day in range(1, 1 + i % 4):
+                await repo.record_checkin({
+                    "user_id": uid, "date": f"{month}-{day:02d}",
+                    "timestamp": SERVER_TIMESTAMP, "status": "late" if day == 2 else "present",
+                })
+    run(create())
+
+
+@pytest.mark.parametrize("members", [5, 60])
+@pytest.mark.parametrize("path, uid", [
+    ("/", "u001"),
+    ("/api/ranking", "u001"),
+    ("/admin", "admin"),
+    ("/admin/api/members", "admin"),
+    ("/admin/api/members/summary", "admin"),
+])
+def test_read_budget(repo, call, path, uid, members):
+    seed(repo, members)
+    now = get_current_kst_time()
+    params = {"year": now.year, "month": now.month} if path == "/api/ranking" else None
+    response = call("GET", path, uid=uid, params=params)
+    assert response.status_code == 200
+
+    fixed_reads, queries = BUDGETS[path]
+    check_read_budget(response, fixed_reads + members, max_queries=queries)
+
+
+def test_ranking_reads_do_not_grow_with_repeat_visits(repo, call):
+    seed(repo, 60)
+    check_read_budget(call("GET", "/", uid="u001"), 3 + 60, max_queries=4)
+    # Members are now in the roster cache: only the month's counters and the viewer are read
+    check_read_budget(call("GET", "/", uid="u002"), 4, max_queries=4)
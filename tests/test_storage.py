@@ -0,0 +1,31 @@
+"""Behaviour every local storage backend shares (Firestore follows the same rules)."""
+import pytest
+from storage import SERVER_TIMESTAMP
+from storage.memory import MemoryRepository
+from storage.sqlite import SQLiteRepository
+from conftest import run
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request):
+    return MemoryRepository() if request.param == "memory" else SQLiteRepository(":memory:")
+
+
+def checkin(uid, date_str, status="present"):
+    return {"user_id": uid, "date": date_str, "timestamp": SERVER_TIMESTAMP, "status": status}
+
+
+def test_checkin_of_unknown_member_creates_no_users_doc(backend):
+    assert run(backend.record_checkin(checkin("ghost", "2025-03-08")))
+
+    assert run(backend.get_attendance("ghost", "2025-03-08"))["status"] == "present"
+    assert run(backend.get_user("ghost")) is None
+    assert run(backend.list_users()) == []
+
+
+def test_checkin_updates_an_existing_members_summary(backend):
+    run(backend.create_user("u1", {"uid": "u1", "nickname": "Member"}))
+    assert run(backend.record_checkins([checkin("u1", "2025-03-08"), checkin("ghost", "2025-03-08")])) == 2
+
+    assert run(backend.get_user("u1"))["attendance_summary"]["total"] == 1
+    assert [uid for uid, _ in run(backend.list_users())] == ["u1"]
@@ -0,0 +1,27 @@
+import os
+import templating
+
+
+def test_bundled_bytecode_is_loaded_without_compiling(tmp_path, monkeypatch):
+    bundle, cache = tmp_path / "bundle", tmp_path / "cache"
+    assert templating.precompile(str(bundle)) == len(os.listdir(bundle)) > 0
+
+    import jinja2
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(templating.TEMPLATE_DIR),
+        autoescape=True,
+        bytecode_cache=templating._bytecode_cache(str(cache), str(bundle)),
+    )
+    compiled = []
+    compile_source = env.compile
+
+    def compile(source, *args, **kwargs):
+        compiled.append(source)
+        return compile_source(source, *args, **kwargs)
+
+    monkeypatch.setattr(env, "compile", compile)
+    env.get_template("index.html")
+
+    assert compiled == []
+    # Nothing to write back: the bundle is read-only
+    assert os.listdir(cache) == []
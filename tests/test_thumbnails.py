@@ -0,0 +1,46 @@
+import httpx
+import pytest
+import kakao
+import thumbnails
+from conftest import run
+
+SOURCE = "https://k.kakaocdn.net/dn/a.jpg"
+
+
+@pytest.fixture
+def upstream():
+    """Routes the source fetch through a handler set by the test."""
+    routes = {}
+
+    def handler(request):
+        return routes[str(request.url)]()
+
+    kakao.use_transport(httpx.MockTransport(handler))
+    yield routes
+    kakao.use_transport(None)
+
+
+def test_redirect_within_allowed_hosts_is_followed(upstream):
+    upstream[SOURCE] = lambda: httpx.Response(302, headers={"location": "https://img1.kakaocdn.net/a.jpg"})
+    upstream["https://img1.kakaocdn.net/a.jpg"] = lambda: httpx.Response(200, content=b"image")
+
+    assert run(thumbnails._default_fetch(SOURCE)) == b"image"
+
+
+def test_redirect_off_the_allowed_hosts_is_not_followed(upstream):
+    upstream[SOURCE] = lambda: httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data"})
+
+    with pytest.raises(thumbnails.ThumbnailError, match="redirected"):
+        run(thumbnails._default_fetch(SOURCE))
+
+
+def test_oversized_source_is_cut_off_while_streaming(upstream):
+    async def chunks():
+        while True:
+            yield b"x" * 65536
+
+    # No Content-Length: the limit has to hold on the body itself
+    upstream[SOURCE] = lambda: httpx.Response(200, content=chunks())
+
+    with pytest.raises(thumbnails.ThumbnailError, match="too large"):
+        run(thumbnails._default_fetch(SOURCE))
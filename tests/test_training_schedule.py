@@ -0,0 +1,31 @@
+import json
+from datetime import date
+import pytest
+import training_schedule
+
+
+def load(tmp_path, monkeypatch, content: str):
+    path = tmp_path / "schedule.json"
+    path.write_text(content, encoding="utf-8")
+    monkeypatch.setattr(training_schedule, "SCHEDULE_FILE", str(path))
+    return training_schedule._load_overrides()
+
+
+def test_overrides_are_loaded(tmp_path, monkeypatch):
+    holidays, extra = load(tmp_path, monkeypatch, json.dumps({
+        "holidays": ["2025-05-03"],
+        "extra_sessions": [{"date": "2025-05-05", "open": "09:45", "on_time": "10:16", "late": "12:00"}],
+    }))
+    assert holidays == {date(2025, 5, 3)}
+    assert list(extra) == [date(2025, 5, 5)]
+
+
+@pytest.mark.parametrize("content", [
+    "{not json",
+    "[]",
+    json.dumps({"holidays": ["2025-13-01"]}),
+    json.dumps({"extra_sessions": [{"date": "2025-05-05", "open": "09:45", "late": "12:00"}]}),
+    json.dumps({"extra_sessions": [{"date": "2025-05-05", "open": "9시", "on_time": "10:16", "late": "12:00"}]}),
+])
+def test_malformed_file_falls_back_to_regular_sessions(tmp_path, monkeypatch, content):
+    assert load(tmp_path, monkeypatch, content) == (set(), {})
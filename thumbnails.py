@@ -0,0 +1,268 @@
+import os
+import asyncio
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import importlib.util
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlsplit
+import anyio
+
+logger = logging.getLogger(__name__)
+
+# Avatar-sized copies of members' Kakao profile images, served from
+# /img/profile/{uid}. Each source image is fetched once, resized and kept in a
+# size-bounded LRU cache on disk (Vercel allows writes to /tmp only). Entries
+# are keyed by the source URL, so a new profile_image recorded at login is
+# picked up by itself; the old entries age out of the LRU.
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "96"))  # px, 2x the largest avatar
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "magnus-thumbnails"))
+THUMBNAIL_CACHE_BYTES = int(os.getenv("THUMBNAIL_CACHE_MB", "50")) * 1024 * 1024
+THUMBNAIL_MAX_AGE = int(os.getenv("THUMBNAIL_MAX_AGE", "604800"))  # seconds, for URLs with the current ?v=
+# Only images on these hosts (and their subdomains) are fetched
+SOURCE_HOSTS = tuple(host.strip().lower() for host in os.getenv("THUMBNAIL_SOURCE_HOSTS", "kakaocdn.net").split(",") if host.strip())
+MAX_SOURCE_BYTES = 5 * 1024 * 1024
+MAX_REDIRECTS = 3  # each hop must stay on SOURCE_HOSTS
+RETRY_AFTER = 300  # seconds before a source that failed is fetched again
+QUALITY = 80
+
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+_fetcher = None
+_cache = None
+_inflight = {}  # cache key -> asyncio.Task, so concurrent misses share one fetch
+_failed = {}    # source URL -> time of the last failure
+
+
+class ThumbnailError(Exception):
+    """The source image could not be fetched or decoded."""
+
+
+@lru_cache(maxsize=None)
+def available() -> bool:
+    """Resizing needs the optional Pillow package; without it callers fall back to the source URL."""
+    return importlib.util.find_spec("PIL") is not None
+
+
+def version(source_url: str) -> str:
+    return hashlib.sha256(source_url.encode()).hexdigest()[:12]
+
+
+def profile_url(uid: str, source_url: str) -> str:
+    """
+    URL to show for a member's profile image: the thumbnail endpoint, with a
+    ?v= that changes with the source, or the source itself when it cannot be
+    thumbnailed ("" without a profile image).
+    """
+    if not source_url or not available() or not is_allowed_source(source_url):
+        return source_url
+    return f"/img/profile/{uid}?v={version(source_url)}"
+
+
+def choose_format(accept: str) -> str:
+    return "webp" if "image/webp" in accept and _webp_supported() else "jpeg"
+
+
+@lru_cache(maxsize=None)
+def _webp_supported() -> bool:
+    from PIL import features
+    return features.check("webp")
+
+
+def is_allowed_source(source_url: str) -> bool:
+    parts = urlsplit(source_url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        return False
+    return any(host == allowed or host.endswith("." + allowed) for allowed in SOURCE_HOSTS)
+
+
+async def _default_fetch(source_url: str) -> bytes:
+    # The app's shared keep-alive client (see kakao.py)
+    import kakao
+
+    url = source_url
+    for _ in range(MAX_REDIRECTS + 1):
+        async with kakao.get_client().stream("GET", url) as response:
+            if response.is_redirect:
+                # Followed by hand so a redirect cannot leave the allowed hosts
+                url = str(response.url.join(response.headers["location"]))
+                if not is_allowed_source(url):
+                    raise ThumbnailError(f"Source redirected off the allowed hosts: {url}")
+                continue
+            if response.status_code != 200:
+                raise ThumbnailError(f"Source returned {response.status_code}")
+            if int(response.headers.get("content-length") or 0) > MAX_SOURCE_BYTES:
+                raise ThumbnailError(f"Source image too large ({response.headers['content-length']} bytes)")
+            # Read no more than MAX_SOURCE_BYTES, whatever the headers claim
+            data = bytearray()
+            async for chunk in response.aiter_bytes():
+                data += chunk
+                if len(data) > MAX_SOURCE_BYTES:
+                    raise ThumbnailError(f"Source image too large (over {MAX_SOURCE_BYTES} bytes)")
+            return bytes(data)
+    raise ThumbnailError(f"Too many redirects from {source_url}")
+
+
+def use_fetcher(fetcher):
+    """Replace the upstream fetch: an async callable (url) -> image bytes, e.g. a local stub in tests."""
+    global _fetcher
+    _fetcher = fetcher
+
+
+class DiskCache:
+    """
+    Bytes on disk under hex keys, evicted least recently used beyond max_bytes.
+    Blocking; callers on the event loop go through asyncio.to_thread, so the
+    index is guarded by a lock.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = None  # key -> size, least recently used first
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Entries left by an earlier process, oldest access first
+        found = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name, stat.st_size))
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(found))
+        self._size = sum(self._entries.values())
+
+    def get(self, key: str):
+        with self._lock:
+            self._load()
+            if key not in self._entries:
+                return None
+            path = os.path.join(self.directory, key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                # Recency survives restarts through the mtime (see _load)
+                os.utime(path)
+            except OSError:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            self._load()
+            path = os.path.join(self.directory, key)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        self._size -= self._entries.pop(key, 0)
+        try:
+            os.remove(os.path.join(self.directory, key))
+        except OSError:
+            pass
+
+    def discard_prefix(self, prefix: str):
+        with self._lock:
+            self._load()
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._drop(key)
+
+
+def get_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_BYTES)
+    return _cache
+
+
+def _key(source_url: str, fmt: str) -> str:
+    return f"{version(source_url)}-{THUMBNAIL_SIZE}.{fmt}"
+
+
+def etag(source_url: str, fmt: str) -> str:
+    return f'"{_key(source_url, fmt)}"'
+
+
+def _resize(data: bytes, fmt: str) -> bytes:
+    import io
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            # Center crop to a square, as the avatars are shown with object-cover
+            image = ImageOps.fit(image, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, format=fmt.upper(), quality=QUALITY)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ThumbnailError(f"Cannot decode source image ({e})") from e
+    return buffer.getvalue()
+
+
+async def _build(source_url: str, fmt: str) -> bytes:
+    data = await (_fetcher or _default_fetch)(source_url)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ThumbnailError(f"Source image too large ({len(data)} bytes)")
+    thumbnail = await anyio.to_thread.run_sync(_resize, data, fmt)
+    try:
+        await asyncio.to_thread(get_cache().put, _key(source_url, fmt), thumbnail)
+    except OSError as e:
+        logger.warning(f"Thumbnail not cached ({e})")
+    logger.info(f"Thumbnail cached for {source_url} ({len(data)} -> {len(thumbnail)} bytes)")
+    return thumbnail
+
+
+async def get_thumbnail(source_url: str, fmt: str) -> bytes:
+    """Thumbnail bytes, from the cache or fetched and resized. Raises ThumbnailError."""
+    if not is_allowed_source(source_url):
+        raise ThumbnailError(f"Source not allowed: {source_url}")
+
+    key = _key(source_url, fmt)
+    cached = await asyncio.to_thread(get_cache().get, key)
+    if cached is not None:
+        return cached
+    failed_at = _failed.get(source_url)
+    if failed_at is not None and time.monotonic() - failed_at < RETRY_AFTER:
+        raise ThumbnailError(f"Source failed recently: {source_url}")
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_build(source_url, fmt))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    try:
+        return await asyncio.shield(task)
+    except ThumbnailError:
+        _failed[source_url] = time.monotonic()
+        raise
+    except Exception as e:
+        _failed[source_url] = time.monotonic()
+        raise ThumbnailError(f"Fetching {source_url} failed ({e!r})") from e
+
+
+async def forget(source_url: str):
+    """Drop the cached thumbnails of a source replaced by a new profile image."""
+    if source_url:
+        await asyncio.to_thread(get_cache().discard_prefix, version(source_url) + "-")
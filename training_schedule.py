@@ -0,0 +1,148 @@
+import os
+import json
+import bisect
+import logging
+import calendar
+from datetime import datetime, date, time, timedelta
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Training schedule as data.
+# Regular sessions by weekday (Monday=0, Sunday=6), times in KST:
+#   open:    attendance opens (15 minutes before the session)
+#   on_time: last moment counted as on time (inclusive)
+#   late:    last moment a late check-in is accepted (inclusive)
+REGULAR_SESSIONS = {
+    5: {"open": "12:45", "on_time": "13:16", "late": "15:00"},  # Saturday 13:00
+    6: {"open": "15:45", "on_time": "16:16", "late": "18:00"},  # Sunday 16:00
+}
+
+# Optional JSON file with one-off changes:
+#   {"holidays": ["2025-05-03"],
+#    "extra_sessions": [{"date": "2025-05-05", "open": "09:45", "on_time": "10:16", "late": "12:00"}]}
+SCHEDULE_FILE = os.getenv("SCHEDULE_FILE", "")
+
+
+class Session(NamedTuple):
+    opens: datetime     # naive KST
+    on_time: datetime
+    late: datetime
+
+
+def _parse_time(value: str) -> time:
+    return datetime.strptime(value, "%H:%M").time()
+
+
+def _read_overrides(path: str):
+    """(holidays, {date: [spec]}) from the file. Raises ValueError (or OSError) on anything malformed."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must hold a JSON object")
+
+    holidays = {date.fromisoformat(d) for d in data.get("holidays", [])}
+    extra = {}
+    for spec in data.get("extra_sessions", []):
+        try:
+            day = date.fromisoformat(spec["date"])
+            for key in ("open", "on_time", "late"):
+                _parse_time(spec[key])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid extra session {spec!r}: {e!r}") from e
+        extra.setdefault(day, []).append(spec)
+    return holidays, extra
+
+
+def _load_overrides():
+    """Holidays and extra sessions from SCHEDULE_FILE; none (regular sessions only) if it is malformed."""
+    if not SCHEDULE_FILE or not os.path.exists(SCHEDULE_FILE):
+        return set(), {}
+    try:
+        holidays, extra = _read_overrides(SCHEDULE_FILE)
+    except (OSError, TypeError, ValueError) as e:
+        logger.error(f"Schedule overrides not loaded, using the regular sessions only: {e}")
+        return set(), {}
+    logger.info(f"Loaded schedule overrides from {SCHEDULE_FILE}: {len(holidays)} holidays, {len(extra)} extra days")
+    return holidays, extra
+
+
+HOLIDAYS, EXTRA_SESSIONS = _load_overrides()
+
+
+def _session(day: date, spec: dict) -> Session:
+    return Session(
+        opens=datetime.combine(day, _parse_time(spec["open"])),
+        on_time=datetime.combine(day, _parse_time(spec["on_time"])),
+        late=datetime.combine(day, _parse_time(spec["late"])),
+    )
+
+
+@lru_cache(maxsize=64)
+def month_index(year: int, month: int):
+    """
+    Sorted sessions of a month and their opening times (for bisect).
+    Built once per month and cached.
+    """
+    sessions = []
+    last_day = calendar.monthrange(year, month)[1]
+    for day_num in range(1, last_day + 1):
+        day = date(year, month, day_num)
+        if day not in HOLIDAYS and day.weekday() in REGULAR_SESSIONS:
+            sessions.append(_session(day, REGULAR_SESSIONS[day.weekday()]))
+        for spec in EXTRA_SESSIONS.get(day, []):
+            sessions.append(_session(day, spec))
+
+    sessions.sort()
+    opens = [s.opens for s in sessions]
+    days = sorted({s.opens.date() for s in sessions})
+    return sessions, opens, days
+
+
+def _naive(now: datetime) -> datetime:
+    return now.replace(tzinfo=None)
+
+
+def current_session(now: datetime) -> Optional[Session]:
+    """The latest session today that has already opened, if any."""
+    now = _naive(now)
+    sessions, opens, _ = month_index(now.year, now.month)
+    i = bisect.bisect_right(opens, now)
+    if i and sessions[i - 1].opens.date() == now.date():
+        return sessions[i - 1]
+    return None
+
+
+def is_class_day(day) -> bool:
+    """Whether a session is held on the given date."""
+    if isinstance(day, datetime):
+        day = day.date()
+    _, _, days = month_index(day.year, day.month)
+    i = bisect.bisect_left(days, day)
+    return i < len(days) and days[i] == day
+
+
+def window_state(now: datetime):
+    """
+    Attendance window state at `now` (KST).
+    Returns:
+        status (str): "open", "late", "closed"
+        message (str): Description
+    """
+    if not is_class_day(now):
+        return "closed", "오늘은 훈련일이 아닙니다."
+
+    session = current_session(now)
+    naive_now = _naive(now)
+    if session and naive_now <= session.on_time:
+        return "open", "출석 가능"
+    if session and naive_now <= session.late:
+        return "late", "지각"
+    return "closed", "출석 시간이 아닙니다."
+
+
+def valid_session_count(year: int, month: int, now: datetime) -> int:
+    """Number of sessions in a month whose attendance window has opened by `now`."""
+    _, opens, _ = month_index(year, month)
+    return bisect.bisect_right(opens, _naive(now))